@@ -0,0 +1,186 @@
+"""Vectorized price and cost computations over the period calendar."""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from .const import CONF_TARIFF, TIMEZONE
+from .fixed_cost import entry_fixed_terms
+from .period_calendar import HOURS_PER_DAY, PERIODS, entry_prices
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Mapping, Sequence
+
+    from .period_calendar import PeriodCalendar, TariffIndex
+    from .price_file import PriceFile
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+PRICES_CHUNK_DAYS = 31
+
+
+def utc_offsets(base: int, hours: int) -> np.ndarray:
+    """Return the UTC offset in seconds of Europe/Madrid for each hour from the base timestamp.
+
+    The offset is only resolved twice per day, hour by hour only on the days with a DST change.
+    """
+    offsets = np.empty(hours, dtype=np.int64)
+    for first in range(0, hours, HOURS_PER_DAY):
+        last = min(first + HOURS_PER_DAY, hours) - 1
+        first_offset = _utc_offset(base + first * SECONDS_PER_HOUR)
+        if first_offset == _utc_offset(base + last * SECONDS_PER_HOUR):
+            offsets[first : last + 1] = first_offset
+        else:
+            for hour in range(first, last + 1):
+                offsets[hour] = _utc_offset(base + hour * SECONDS_PER_HOUR)
+    return offsets
+
+
+def _utc_offset(timestamp: int) -> int:
+    offset = datetime.fromtimestamp(timestamp, TIMEZONE).utcoffset() or timedelta()
+    return int(offset.total_seconds())
+
+
+def local_seconds(timestamps: np.ndarray) -> np.ndarray:
+    """Return the UTC timestamps shifted to Europe/Madrid wall-clock seconds."""
+    if not timestamps.size:
+        return np.empty(0, dtype=np.int64)
+
+    base = int(timestamps.min()) // SECONDS_PER_HOUR * SECONDS_PER_HOUR
+    hours = (timestamps.astype(np.int64) - base) // SECONDS_PER_HOUR
+    return timestamps.astype(np.int64) + utc_offsets(base, int(hours.max()) + 1)[hours]
+
+
+def period_indexes(calendar: PeriodCalendar, timestamps: np.ndarray) -> np.ndarray:
+    """Return the period index of each UTC timestamp."""
+    return local_period_indexes(calendar, local_seconds(timestamps))
+
+
+def local_period_indexes(calendar: PeriodCalendar, local: np.ndarray) -> np.ndarray:
+    """Return the period index of each wall-clock timestamp."""
+    if not local.size:
+        return np.empty(0, dtype=np.uint8)
+
+    ordinals = local // SECONDS_PER_DAY + UNIX_EPOCH_ORDINAL
+    first = int(ordinals.min())
+    span = calendar.span(date.fromordinal(first), date.fromordinal(int(ordinals.max())))
+    slots = (ordinals - first) * HOURS_PER_DAY + local % SECONDS_PER_DAY // SECONDS_PER_HOUR
+    return np.frombuffer(span, dtype=np.uint8)[slots]
+
+
+def period_prices(tariff: TariffIndex, timestamps: np.ndarray, indexes: np.ndarray) -> np.ndarray:
+    """Return the price of each UTC timestamp with the prices in force at it, its period index already known.
+
+    The prices of the price file win over the period prices, like in the lookups of the entities.
+    """
+    if (history := tariff.history) is None:
+        prices = np.asarray(tariff.prices, dtype=np.float64)[indexes]
+    else:
+        # One row of prices per price set, the row of each timestamp is found with a vectorized bisect of the starts
+        table = np.zeros((len(history), len(PERIODS)), dtype=np.float64)
+        for row, price_set in enumerate(history.sets):
+            table[row, : len(price_set.prices)] = price_set.prices
+        rows = np.maximum(np.searchsorted(np.asarray(history.starts, dtype=np.float64), timestamps, side="right") - 1, 0)
+        prices = table[rows, indexes]
+    return prices if (price_file := tariff.price_file) is None else file_prices(price_file, timestamps, prices)
+
+
+def file_prices(price_file: PriceFile, timestamps: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """Return the prices with the ones of the file where it has a price for the timestamp."""
+    starts, ends, values = (np.frombuffer(column, dtype=np.float64) for column in price_file.index)
+    if not starts.size:
+        return prices
+    rows = np.searchsorted(starts, timestamps, side="right") - 1
+    clipped = np.maximum(rows, 0)
+    return np.where((rows >= 0) & (timestamps < ends[clipped]), values[clipped], prices)
+
+
+def hourly_costs(tariff: TariffIndex, timestamps: np.ndarray, energy: np.ndarray) -> np.ndarray:
+    """Return the cost of the energy consumed on each hour starting at the timestamps."""
+    return np.nan_to_num(energy) * period_prices(tariff, timestamps, period_indexes(tariff.calendar, timestamps))
+
+
+def iter_prices(tariff: TariffIndex, start: int, end: int, step: int) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield the timestamps, period indexes and prices from start to end, in chunks of a month."""
+    chunk = PRICES_CHUNK_DAYS * SECONDS_PER_DAY
+    for first in range(start, end, chunk):
+        timestamps = np.arange(first, min(first + chunk, end), step, dtype=np.int64)
+        indexes = period_indexes(tariff.calendar, timestamps)
+        yield timestamps, indexes, period_prices(tariff, timestamps, indexes)
+
+
+def local_months(local: np.ndarray) -> np.ndarray:
+    """Return the month (months since 1970) of each wall-clock timestamp."""
+    return local.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+
+
+def month_days(start: int, end: int) -> tuple[int, np.ndarray, np.ndarray]:
+    """Return the first month, and per month the local days touched by the range and their fraction of a year."""
+    days_local = np.unique(local_seconds(np.arange(start, end, SECONDS_PER_HOUR, dtype=np.int64)) // SECONDS_PER_DAY)
+    days_months = local_months(days_local * SECONDS_PER_DAY)
+    first_month = int(days_months[0])
+    month_count = int(days_months[-1]) - first_month + 1
+    days = np.bincount(days_months - first_month, minlength=month_count)
+    # The power terms are per year, divided by the days of the year of each day
+    years = days_local.astype("datetime64[D]").astype("datetime64[Y]")
+    inverse_year_days = 1 / ((years + 1).astype("datetime64[D]") - years.astype("datetime64[D]")).astype(np.float64)
+    return first_month, days, np.bincount(days_months - first_month, weights=inverse_year_days, minlength=month_count)
+
+
+def offer_costs(
+    offer: Mapping[str, Any], usage: np.ndarray, days: np.ndarray, month_year_fraction: np.ndarray, labels: list[str]
+) -> dict[str, Any]:
+    """Return the total, per period and per month cost of an offer for the energy of each month and period."""
+    offer_prices = entry_prices(offer)
+    prices = np.zeros(len(PERIODS))
+    prices[: len(offer_prices)] = offer_prices
+    terms = entry_fixed_terms(offer)
+
+    period_costs = usage * prices
+    fixed_costs = month_year_fraction * terms.power_cost + days * terms.day_cost
+    month_costs = period_costs.sum(axis=1) + fixed_costs
+    return {
+        "total": float(month_costs.sum()),
+        "energy_cost": float(period_costs.sum()),
+        "fixed_cost": float(fixed_costs.sum()),
+        "periods": dict(zip(PERIODS, period_costs.sum(axis=0)[: len(offer_prices)].tolist(), strict=False)),
+        "months": dict(zip(labels, month_costs.tolist(), strict=True)),
+    }
+
+
+def compare_offers(
+    calendars: Mapping[str, PeriodCalendar],
+    timestamps: np.ndarray,
+    energy: np.ndarray,
+    span: tuple[int, int],
+    offers: Sequence[Mapping[str, Any]],
+) -> dict[str, Any]:
+    """Return the total, per period and per month cost of each offer for the hourly energy of the span.
+
+    The energy is grouped by month and period once per tariff type, then each offer is only a product with its prices.
+    """
+    # The fixed cost is paid every local day touched by the span
+    first_month, days, month_year_fraction = month_days(*span)
+    month_count = len(days)
+
+    local = local_seconds(timestamps)
+    month_slots = local_months(local) - first_month
+    energy = np.nan_to_num(energy)
+
+    usage: dict[str, np.ndarray] = {}
+    for tariff_type in {offer[CONF_TARIFF] for offer in offers}:
+        slots = month_slots * len(PERIODS) + local_period_indexes(calendars[tariff_type], local)
+        usage[tariff_type] = np.bincount(slots, weights=energy, minlength=month_count * len(PERIODS)).reshape(month_count, len(PERIODS))
+
+    labels = [str(np.datetime64(first_month + month, "M")) for month in range(month_count)]
+    return {
+        "energy": float(energy.sum()),
+        "hours": len(timestamps),
+        "days": int(days.sum()),
+        "offers": [offer_costs(offer, usage[offer[CONF_TARIFF]], days, month_year_fraction, labels) for offer in offers],
+    }
@@ -0,0 +1,81 @@
+"""Create and add binary sensors to Home Assistant."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from typing_extensions import override
+
+from homeassistant.components.binary_sensor import BinarySensorEntity, BinarySensorEntityDescription
+
+from .const import DATA_CLOCK, DOMAIN, TIMEZONE
+from .coordinator import HOUR
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+    from .cheapest import CheapestWindow
+    from .coordinator import TariffClock
+    from .tariff_cache import EntryTariff
+
+CHEAP_NOW_DESCRIPTION = BinarySensorEntityDescription(
+    key="hora_barata",
+    icon="mdi:cash-clock",
+    name="Hora Barata",
+)
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
+    """Configure and add binary sensors to Home Assistant."""
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    if entry_data.window is not None:
+        clock = hass.data[DOMAIN][DATA_CLOCK]
+        async_add_entities([CheapNowBinarySensor(CHEAP_NOW_DESCRIPTION, entry_data.tariff, entry_data.window, clock, entry.entry_id)])
+
+
+class CheapNowBinarySensor(BinarySensorEntity):
+    """On while the current hour is inside the cheapest window."""
+
+    def __init__(
+        self,
+        description: BinarySensorEntityDescription,
+        tariff: EntryTariff,
+        window: CheapestWindow,
+        clock: TariffClock,
+        unique: str,
+    ) -> None:
+        """Initialise values."""
+        super().__init__()
+        self._state = False
+        self._attr_name = description.name
+        self._attr_unique_id = f"{unique}-{description.key}"
+        self.entity_description = description
+        self._tariff = tariff
+        self._window = window
+        self._clock = clock
+
+    @property
+    @override
+    def is_on(self) -> bool:
+        return self._state
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(self._clock.async_add_listener(HOUR, self.update_window))
+        self.async_on_remove(self._tariff.async_add_listener(self.update_window))
+        self.update_window()
+
+    @property
+    @override
+    def should_poll(self) -> bool:
+        return False
+
+    def update_window(self, now: datetime | None = None) -> None:
+        """Check each hour if it is inside the cheapest window."""
+        now = now or datetime.now(tz=TIMEZONE)
+        self._window.update(now)
+        self._state = self._window.is_cheap(now)
+        self.async_write_ha_state()
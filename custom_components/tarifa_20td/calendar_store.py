@@ -0,0 +1,146 @@
+"""Period calendars persisted in .storage, so they are not resolved again on every start."""
+
+from __future__ import annotations
+
+import asyncio
+from importlib.metadata import PackageNotFoundError, version
+import logging
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import DATA_CALENDAR_STORE, DATA_CALENDARS, DATA_CLOCK, DOMAIN, TIMEZONE
+from .coordinator import DAY
+from .period_calendar import PeriodCalendar, build_calendar, decode_year, encode_year
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    from homeassistant.core import Event, HomeAssistant
+
+STORAGE_KEY = f"{DOMAIN}.calendars"
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# The periods change with the rules of tariff-td and with the holidays it reads from holidays
+STAMP_PACKAGES = ("tariff-td", "holidays")
+
+
+def calendar_stamp() -> str:
+    """Return the installed versions of the packages that resolve the periods."""
+    versions = []
+    for package in STAMP_PACKAGES:
+        try:
+            versions.append(f"{package} {version(package)}")
+        except PackageNotFoundError:
+            versions.append(f"{package} -")
+    return ", ".join(versions)
+
+
+async def async_get_calendar(hass: HomeAssistant, tariff_type: str) -> PeriodCalendar:
+    """Return the calendar of a tariff type shared by every entry, concurrent callers await the same task."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_CALENDAR_STORE not in domain_data:
+        domain_data[DATA_CALENDAR_STORE] = CalendarStore(hass)
+    calendars = domain_data.setdefault(DATA_CALENDARS, {})
+    if tariff_type not in calendars:
+        calendars[tariff_type] = hass.async_create_task(domain_data[DATA_CALENDAR_STORE].async_get_calendar(tariff_type))
+    return await calendars[tariff_type]
+
+
+class CalendarStore:
+    """Resolved years of each tariff type, discarded when tariff-td or holidays is upgraded."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialise values."""
+        self._hass = hass
+        self._store: Store[dict[str, Any]] = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._stamp = ""
+        self._cached: dict[str, dict[str, str]] = {}
+        self._calendars: dict[str, PeriodCalendar] = {}
+        self._building: set[tuple[str, int]] = set()
+        self._lock = asyncio.Lock()
+        self._loaded = False
+
+    async def _async_load(self) -> None:
+        """Read the stored calendars once, ignoring them if the stamp does not match."""
+        self._stamp = await self._hass.async_add_executor_job(calendar_stamp)
+        if not (data := await self._store.async_load()):
+            return
+        if data.get("stamp") != self._stamp:
+            _LOGGER.debug("Discarding calendars resolved with %s", data.get("stamp", data.get("tariff_td")))
+            return
+        self._cached = data.get("calendars", {})
+
+    async def async_get_calendar(self, tariff_type: str) -> PeriodCalendar:
+        """Return the calendar of a tariff type, only resolving the years missing in the store."""
+        async with self._lock:
+            if not self._loaded:
+                await self._async_load()
+                self._loaded = True
+
+        years = {}
+        for year, packed in self._cached.get(tariff_type, {}).items():
+            if (periods := decode_year(int(year), packed)) is not None:
+                years[int(year)] = periods
+
+        current = dt_util.now(TIMEZONE).year
+        if current in years and current + 1 in years:
+            calendar = PeriodCalendar(tariff_type, years)
+        else:
+            calendar = await self._hass.async_add_executor_job(build_calendar, tariff_type, years)
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+        self._calendars[tariff_type] = calendar
+        self._async_track_next_year(calendar)
+        return calendar
+
+    @callback
+    def _async_track_next_year(self, calendar: PeriodCalendar) -> None:
+        """Resolve the next year of the calendar in the executor on each day boundary, once for all the entries using it."""
+        if (clock := self._hass.data[DOMAIN].get(DATA_CLOCK)) is None:
+            return
+
+        @callback
+        def _async_day(now: datetime) -> None:
+            self.async_prebuild(calendar, now.year + 1)
+
+        # Lives as long as the calendar, which is kept for the entries set up again, until Home Assistant stops
+        unsub = clock.async_add_listener(DAY, _async_day)
+
+        @callback
+        def _async_stop(_event: Event) -> None:
+            unsub()
+
+        self._hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_stop)
+
+    @callback
+    def async_prebuild(self, calendar: PeriodCalendar, year: int) -> None:
+        """Resolve a year of the calendar in the executor if it is missing, so it is never built in the event loop."""
+        key = (calendar.tariff_type, year)
+        if year in calendar.years or key in self._building:
+            return
+        self._building.add(key)
+        self._hass.async_create_background_task(self._async_build_year(calendar, year), f"{DOMAIN} calendar {year}")
+
+    async def _async_build_year(self, calendar: PeriodCalendar, year: int) -> None:
+        """Resolve a year and save it with the other calendars."""
+        try:
+            await self._hass.async_add_executor_job(calendar.year, year)
+        finally:
+            self._building.discard((calendar.tariff_type, year))
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the packed years of every calendar."""
+        calendars = {tariff_type: dict(packed) for tariff_type, packed in self._cached.items()}
+        for tariff_type, calendar in self._calendars.items():
+            calendars.setdefault(tariff_type, {}).update(
+                {str(year): encode_year(periods) for year, periods in list(calendar.years.items())}
+            )
+        return {"stamp": self._stamp, "calendars": calendars}
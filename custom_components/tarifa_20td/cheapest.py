@@ -0,0 +1,110 @@
+"""Cheapest hours of a Tariff TD over a horizon."""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import UTC, date, datetime, time, timedelta
+import heapq
+from typing import TYPE_CHECKING
+
+from .const import TIMEZONE
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from .period_calendar import TariffIndex
+
+ONE_HOUR = timedelta(hours=1)
+
+
+def hourly_horizon(tariff: TariffIndex, start: datetime, hours: int) -> tuple[list[datetime], list[float]]:
+    """Return the UTC start and the price of each real hour from the start, DST changes included."""
+    first = start.astimezone(UTC).replace(minute=0, second=0, microsecond=0)
+    starts = [first + ONE_HOUR * hour for hour in range(hours)]
+    return starts, [tariff.get_price(hour.astimezone(TIMEZONE)) for hour in starts]
+
+
+def window_sums(prices: Sequence[float], length: int) -> list[float]:
+    """Return the sum of each window of length slots, computed with a sliding window."""
+    if not 0 < length <= len(prices):
+        return []
+    total = sum(prices[:length])
+    sums = [round(total, 9)]
+    for first in range(1, len(prices) - length + 1):
+        total += prices[first + length - 1] - prices[first - 1]
+        # Rounded so equal windows tie despite the accumulated float error
+        sums.append(round(total, 9))
+    return sums
+
+
+def cheapest_window(prices: Sequence[float], length: int) -> int | None:
+    """Return the first slot of the cheapest contiguous window, the earliest one on ties."""
+    sums = window_sums(prices, length)
+    return min(range(len(sums)), key=sums.__getitem__) if sums else None
+
+
+def cheapest_slots(prices: Sequence[float], count: int) -> list[int]:
+    """Return the sorted slots of the count cheapest non-contiguous slots, the earliest ones on ties."""
+    return sorted(heapq.nsmallest(count, range(len(prices)), key=prices.__getitem__))
+
+
+class CheapestWindow:
+    """Cheapest contiguous window of today and tomorrow, the candidates are rebuilt once per day."""
+
+    def __init__(self, tariff: TariffIndex, hours: int) -> None:
+        """Initialise values."""
+        self._tariff = tariff
+        self._hours = hours
+        self._day: date | None = None
+        self._version = 0
+        self._starts: list[datetime] = []
+        self._best: list[int] = []
+        self._window: tuple[datetime, datetime] | None = None
+
+    @property
+    def hours(self) -> int:
+        """Return the length of the window in hours."""
+        return self._hours
+
+    @property
+    def window(self) -> tuple[datetime, datetime] | None:
+        """Return the UTC start and end of the current or next cheapest window."""
+        return self._window
+
+    def is_cheap(self, now: datetime) -> bool:
+        """Return if the time is inside the cheapest window."""
+        return self._window is not None and self._window[0] <= now < self._window[1]
+
+    def _rebuild(self, today: date) -> None:
+        """Compute the window sums of today and tomorrow and the cheapest start from each slot."""
+        midnight = datetime.combine(today, time(), TIMEZONE)
+        end = datetime.combine(today + timedelta(days=2), time(), TIMEZONE)
+        hours = int((end.astimezone(UTC) - midnight.astimezone(UTC)) / ONE_HOUR)
+        self._starts, prices = hourly_horizon(self._tariff, midnight, hours)
+
+        # best[slot] is the cheapest window starting at or after slot
+        sums = window_sums(prices, self._hours)
+        best = [0] * len(sums)
+        for slot in range(len(sums) - 1, -1, -1):
+            best[slot] = slot if slot == len(sums) - 1 or sums[slot] <= sums[best[slot + 1]] else best[slot + 1]
+        self._best = best
+        self._day = today
+        self._version = self._tariff.version
+
+    def update(self, now: datetime) -> None:
+        """Keep the current window until it ends, then move to the next cheapest one."""
+        if self._tariff.version != self._version:
+            # New prices, the current window is no longer valid
+            self._window = None
+            self._day = None
+        if (today := now.astimezone(TIMEZONE).date()) != self._day:
+            self._rebuild(today)
+        if self._window is not None and now < self._window[1]:
+            return
+
+        slot = bisect_right(self._starts, now) - 1
+        if 0 <= slot < len(self._best):
+            start = self._starts[self._best[slot]]
+            self._window = (start, start + ONE_HOUR * self._hours)
+        else:
+            self._window = None
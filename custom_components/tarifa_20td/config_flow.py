@@ -9,36 +9,82 @@ from typing_extensions import override
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.components.sensor import SensorDeviceClass
 from homeassistant.core import callback
 from homeassistant.helpers.selector import (
+    BooleanSelector,
+    EntitySelector,
+    EntitySelectorConfig,
     NumberSelector,
     NumberSelectorConfig,
     NumberSelectorMode,
     SelectOptionDict,
     SelectSelector,
     SelectSelectorConfig,
+    TextSelector,
 )
 
 from .const import (
     CONF_DIARY_COST,
+    CONF_ENERGY_ENTITY,
+    CONF_METER_RENTAL,
     CONF_P1,
     CONF_P2,
     CONF_P3,
     CONF_P4,
     CONF_P5,
     CONF_P6,
+    CONF_POWER_ENTITY,
+    CONF_PRICE_FILE,
+    CONF_PRORATED,
+    CONF_QUARTER_HOUR,
+    CONF_SOCIAL_BONUS,
     CONF_TARIFF,
+    CONF_WINDOW_HOURS,
     DOMAIN,
     TARIFF_20,
     TARIFF_30,
 )
+from .fixed_cost import POWER_KEYS, POWER_PERIODS, POWER_TERM_KEYS
 
 if TYPE_CHECKING:
+    from collections.abc import Mapping
+
     from homeassistant.config_entries import ConfigEntry
     from homeassistant.data_entry_flow import FlowResult
 
 _LOGGER = logging.getLogger(__name__)
 
+# Optional fields left empty in the options form are not submitted
+CLEARABLE_KEYS = (CONF_ENERGY_ENTITY, CONF_POWER_ENTITY, CONF_PRICE_FILE)
+
+
+def _fixed_cost_schema(power_periods: int, data: Mapping[str, Any]) -> dict[vol.Marker, NumberSelector]:
+    """Return the fields of the contracted power and the other fixed costs, with the values of the data as defaults."""
+    units = [
+        *((key, "kW") for key in POWER_KEYS[:power_periods]),
+        *((key, "€/kW año") for key in POWER_TERM_KEYS[:power_periods]),
+        (CONF_METER_RENTAL, "€/día"),
+        (CONF_SOCIAL_BONUS, "€/día"),
+        (CONF_DIARY_COST, "€/día"),
+    ]
+    return {
+        vol.Optional(key, default=data.get(key, 0)): NumberSelector(
+            NumberSelectorConfig(
+                min=0,
+                step="any",
+                unit_of_measurement=unit,
+                mode=NumberSelectorMode.BOX,
+            )
+        )
+        for key, unit in units
+    }
+
+
+def _with_cleared(user_input: dict[str, Any]) -> dict[str, Any]:
+    """Return the options with the empty optional fields set to None, so they replace the previous values of the entry."""
+    return {**dict.fromkeys(CLEARABLE_KEYS), **user_input}
+
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Config flow for Tariff TD."""
@@ -86,14 +132,6 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             return self.async_create_entry(data=user_input, title="Tarifa TD")
 
         schema = {
-            vol.Required(CONF_DIARY_COST): NumberSelector(
-                NumberSelectorConfig(
-                    min=0,
-                    step="any",
-                    unit_of_measurement="€",
-                    mode=NumberSelectorMode.BOX,
-                )
-            ),
             vol.Required(CONF_P1): NumberSelector(
                 NumberSelectorConfig(
                     min=0,
@@ -121,6 +159,25 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     mode=NumberSelectorMode.BOX,
                 )
             ),
+            **_fixed_cost_schema(POWER_PERIODS[TARIFF_20], {}),
+            vol.Optional(CONF_ENERGY_ENTITY): EntitySelector(
+                EntitySelectorConfig(
+                    domain="sensor",
+                    device_class=SensorDeviceClass.ENERGY,
+                )
+            ),
+            vol.Optional(CONF_QUARTER_HOUR, default=False): BooleanSelector(),
+            vol.Optional(CONF_WINDOW_HOURS, default=0): NumberSelector(
+                NumberSelectorConfig(
+                    min=0,
+                    max=12,
+                    step=1,
+                    unit_of_measurement="h",
+                    mode=NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Optional(CONF_PRORATED, default=False): BooleanSelector(),
+            vol.Optional(CONF_PRICE_FILE): TextSelector(),
         }
 
         return self.async_show_form(step_id="tariff20", data_schema=vol.Schema(schema))
@@ -132,14 +189,6 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             return self.async_create_entry(data=user_input, title="Tarifa TD")
 
         schema = {
-            vol.Required(CONF_DIARY_COST): NumberSelector(
-                NumberSelectorConfig(
-                    min=0,
-                    step="any",
-                    unit_of_measurement="€",
-                    mode=NumberSelectorMode.BOX,
-                )
-            ),
             vol.Required(CONF_P1): NumberSelector(
                 NumberSelectorConfig(
                     min=0,
@@ -194,6 +243,31 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     mode=NumberSelectorMode.BOX,
                 )
             ),
+            **_fixed_cost_schema(POWER_PERIODS[TARIFF_30], {}),
+            vol.Optional(CONF_ENERGY_ENTITY): EntitySelector(
+                EntitySelectorConfig(
+                    domain="sensor",
+                    device_class=SensorDeviceClass.ENERGY,
+                )
+            ),
+            vol.Optional(CONF_POWER_ENTITY): EntitySelector(
+                EntitySelectorConfig(
+                    domain="sensor",
+                    device_class=SensorDeviceClass.POWER,
+                )
+            ),
+            vol.Optional(CONF_QUARTER_HOUR, default=False): BooleanSelector(),
+            vol.Optional(CONF_WINDOW_HOURS, default=0): NumberSelector(
+                NumberSelectorConfig(
+                    min=0,
+                    max=12,
+                    step=1,
+                    unit_of_measurement="h",
+                    mode=NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Optional(CONF_PRORATED, default=False): BooleanSelector(),
+            vol.Optional(CONF_PRICE_FILE): TextSelector(),
         }
 
         return self.async_show_form(step_id="tariff30", data_schema=vol.Schema(schema))
@@ -237,22 +311,18 @@ class OptionFlowHandler(config_entries.OptionsFlow):
         """Form configuration for Tariff 2.0 TD."""
         if user_input is not None:
             user_input[CONF_TARIFF] = self.tariff
-            return self.async_create_entry(data=user_input, title="Tarifa TD")
+            return self.async_create_entry(data=_with_cleared(user_input), title="Tarifa TD")
 
         p1 = self.config_entry.data.get(CONF_P1, 0)
         p2 = self.config_entry.data.get(CONF_P2, 0)
         p3 = self.config_entry.data.get(CONF_P3, 0)
-        diary = self.config_entry.data.get(CONF_DIARY_COST, 0)
+        energy = self.config_entry.data.get(CONF_ENERGY_ENTITY)
+        price_file = self.config_entry.data.get(CONF_PRICE_FILE)
+        prorated = self.config_entry.data.get(CONF_PRORATED, False)
+        window_hours = self.config_entry.data.get(CONF_WINDOW_HOURS, 0)
+        quarter_hour = self.config_entry.data.get(CONF_QUARTER_HOUR, False)
 
         schema = {
-            vol.Required(CONF_DIARY_COST, default=diary): NumberSelector(
-                NumberSelectorConfig(
-                    min=0,
-                    step="any",
-                    unit_of_measurement="€",
-                    mode=NumberSelectorMode.BOX,
-                )
-            ),
             vol.Required(CONF_P1, default=p1): NumberSelector(
                 NumberSelectorConfig(
                     min=0,
@@ -280,6 +350,25 @@ class OptionFlowHandler(config_entries.OptionsFlow):
                     mode=NumberSelectorMode.BOX,
                 )
             ),
+            **_fixed_cost_schema(POWER_PERIODS[TARIFF_20], self.config_entry.data),
+            vol.Optional(CONF_ENERGY_ENTITY, description={"suggested_value": energy}): EntitySelector(
+                EntitySelectorConfig(
+                    domain="sensor",
+                    device_class=SensorDeviceClass.ENERGY,
+                )
+            ),
+            vol.Optional(CONF_QUARTER_HOUR, default=quarter_hour): BooleanSelector(),
+            vol.Optional(CONF_WINDOW_HOURS, default=window_hours): NumberSelector(
+                NumberSelectorConfig(
+                    min=0,
+                    max=12,
+                    step=1,
+                    unit_of_measurement="h",
+                    mode=NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Optional(CONF_PRORATED, default=prorated): BooleanSelector(),
+            vol.Optional(CONF_PRICE_FILE, description={"suggested_value": price_file}): TextSelector(),
         }
 
         return self.async_show_form(step_id="tariff20", data_schema=vol.Schema(schema))
@@ -288,7 +377,7 @@ class OptionFlowHandler(config_entries.OptionsFlow):
         """Form configuration for Tariff 3.0 TD."""
         if user_input is not None:
             user_input[CONF_TARIFF] = self.tariff
-            return self.async_create_entry(data=user_input, title="Tarifa TD")
+            return self.async_create_entry(data=_with_cleared(user_input), title="Tarifa TD")
 
         p1 = self.config_entry.data.get(CONF_P1, 0)
         p2 = self.config_entry.data.get(CONF_P2, 0)
@@ -296,17 +385,14 @@ class OptionFlowHandler(config_entries.OptionsFlow):
         p4 = self.config_entry.data.get(CONF_P4, 0)
         p5 = self.config_entry.data.get(CONF_P5, 0)
         p6 = self.config_entry.data.get(CONF_P6, 0)
-        diary = self.config_entry.data.get(CONF_DIARY_COST, 0)
+        energy = self.config_entry.data.get(CONF_ENERGY_ENTITY)
+        power = self.config_entry.data.get(CONF_POWER_ENTITY)
+        price_file = self.config_entry.data.get(CONF_PRICE_FILE)
+        prorated = self.config_entry.data.get(CONF_PRORATED, False)
+        window_hours = self.config_entry.data.get(CONF_WINDOW_HOURS, 0)
+        quarter_hour = self.config_entry.data.get(CONF_QUARTER_HOUR, False)
 
         schema = {
-            vol.Required(CONF_DIARY_COST, default=diary): NumberSelector(
-                NumberSelectorConfig(
-                    min=0,
-                    step="any",
-                    unit_of_measurement="€",
-                    mode=NumberSelectorMode.BOX,
-                )
-            ),
             vol.Required(CONF_P1, default=p1): NumberSelector(
                 NumberSelectorConfig(
                     min=0,
@@ -361,6 +447,31 @@ class OptionFlowHandler(config_entries.OptionsFlow):
                     mode=NumberSelectorMode.BOX,
                 )
             ),
+            **_fixed_cost_schema(POWER_PERIODS[TARIFF_30], self.config_entry.data),
+            vol.Optional(CONF_ENERGY_ENTITY, description={"suggested_value": energy}): EntitySelector(
+                EntitySelectorConfig(
+                    domain="sensor",
+                    device_class=SensorDeviceClass.ENERGY,
+                )
+            ),
+            vol.Optional(CONF_POWER_ENTITY, description={"suggested_value": power}): EntitySelector(
+                EntitySelectorConfig(
+                    domain="sensor",
+                    device_class=SensorDeviceClass.POWER,
+                )
+            ),
+            vol.Optional(CONF_QUARTER_HOUR, default=quarter_hour): BooleanSelector(),
+            vol.Optional(CONF_WINDOW_HOURS, default=window_hours): NumberSelector(
+                NumberSelectorConfig(
+                    min=0,
+                    max=12,
+                    step=1,
+                    unit_of_measurement="h",
+                    mode=NumberSelectorMode.BOX,
+                )
+            ),
+            vol.Optional(CONF_PRORATED, default=prorated): BooleanSelector(),
+            vol.Optional(CONF_PRICE_FILE, description={"suggested_value": price_file}): TextSelector(),
         }
 
         return self.async_show_form(step_id="tariff30", data_schema=vol.Schema(schema))
@@ -1,5 +1,7 @@
 """Constants for Tarifa 2.0 TD."""
 
+from zoneinfo import ZoneInfo
+
 DOMAIN = "tarifa_20td"
 
 CONF_P1 = "P1"
@@ -10,7 +12,38 @@ CONF_P5 = "P5"
 CONF_P6 = "P6"
 
 CONF_DIARY_COST = "diary_cost"
+CONF_POWER_P1 = "power_P1"
+CONF_POWER_P2 = "power_P2"
+CONF_POWER_P3 = "power_P3"
+CONF_POWER_P4 = "power_P4"
+CONF_POWER_P5 = "power_P5"
+CONF_POWER_P6 = "power_P6"
+CONF_POWER_TERM_P1 = "power_term_P1"
+CONF_POWER_TERM_P2 = "power_term_P2"
+CONF_POWER_TERM_P3 = "power_term_P3"
+CONF_POWER_TERM_P4 = "power_term_P4"
+CONF_POWER_TERM_P5 = "power_term_P5"
+CONF_POWER_TERM_P6 = "power_term_P6"
+CONF_METER_RENTAL = "meter_rental"
+CONF_SOCIAL_BONUS = "social_bonus"
+CONF_PRORATED = "prorated"
+CONF_ENERGY_ENTITY = "energy_entity"
+CONF_POWER_ENTITY = "power_entity"
+CONF_QUARTER_HOUR = "quarter_hour"
+CONF_WINDOW_HOURS = "window_hours"
+CONF_PRICE_FILE = "price_file"
 
 CONF_TARIFF = "tariff"
 TARIFF_20 = "TARIFF_20"
 TARIFF_30 = "TARIFF_30"
+
+TIMEZONE = ZoneInfo("Europe/Madrid")
+
+# Not in homeassistant.const of the supported versions
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+
+DATA_CLOCK = "clock"
+DATA_CALENDARS = "calendars"
+DATA_CALENDAR_STORE = "calendar_store"
+DATA_TARIFFS = "tariffs"
+DATA_HISTORY_STORE = "history_store"
@@ -0,0 +1,133 @@
+"""Shared clock driving every Tariff TD entity."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.util import dt as dt_util
+
+from .const import TIMEZONE
+from .metrics import EntryMetrics, LatencyStats
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from homeassistant.core import CALLBACK_TYPE, HomeAssistant
+
+    from .cheapest import CheapestWindow
+    from .demand import DemandTracker
+    from .meter import MeterTracker
+    from .tariff_cache import EntryTariff
+    from .upcoming import UpcomingPeriods
+
+QUARTER = "quarter"
+HOUR = "hour"
+DAY = "day"
+
+QUARTER_MINUTES = 15
+
+
+@dataclass
+class TariffEntryData:
+    """Runtime objects of a config entry."""
+
+    tariff: EntryTariff
+    upcoming: UpcomingPeriods
+    window: CheapestWindow | None = None
+    meter: MeterTracker | None = None
+    demand: DemandTracker | None = None
+    metrics: EntryMetrics = field(default_factory=EntryMetrics)
+    # Configuration the runtime objects were built with
+    config: dict[str, Any] = field(default_factory=dict)
+
+
+def next_quarter(time: datetime) -> datetime:
+    """Return the first quarter-hour boundary after the time."""
+    minute = time.minute - time.minute % QUARTER_MINUTES
+    return time.replace(minute=minute, second=0, microsecond=0) + timedelta(minutes=QUARTER_MINUTES)
+
+
+class TariffClock:
+    """Single wall-clock aligned timer firing quarter-hour, hour and day boundaries to every entry."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialise values."""
+        self._hass = hass
+        self._listeners: dict[str, list[Callable[[datetime], None]]] = {QUARTER: [], HOUR: [], DAY: []}
+        self._unsub: CALLBACK_TYPE | None = None
+        self._next_fire: datetime | None = None
+        self._drift = timedelta()
+        self._drifts = {QUARTER: LatencyStats(), HOUR: LatencyStats(), DAY: LatencyStats()}
+
+    @property
+    def next_fire(self) -> datetime | None:
+        """Return the UTC time of the next scheduled boundary."""
+        return self._next_fire
+
+    @property
+    def drift(self) -> timedelta:
+        """Return the delay between the planned and the actual time of the last fire."""
+        return self._drift
+
+    @property
+    def drifts(self) -> dict[str, LatencyStats]:
+        """Return the stats of the delay of each boundary."""
+        return self._drifts
+
+    @callback
+    def async_add_listener(self, boundary: str, action: Callable[[datetime], None]) -> CALLBACK_TYPE:
+        """Call the action with the local time on each boundary, return a callback to remove it."""
+        listeners = self._listeners[boundary]
+        listeners.append(action)
+        if self._unsub is None:
+            self._schedule(dt_util.utcnow())
+
+        @callback
+        def remove_listener() -> None:
+            listeners.remove(action)
+            if self._unsub is not None and not any(self._listeners.values()):
+                self._unsub()
+                self._unsub = None
+                self._next_fire = None
+
+        return remove_listener
+
+    def _schedule(self, now: datetime) -> None:
+        """Program the timer for the next quarter-hour."""
+        self._next_fire = next_quarter(now)
+        self._unsub = async_track_point_in_utc_time(self._hass, self._async_fire, self._next_fire)
+
+    @callback
+    def _async_fire(self, planned: datetime) -> None:
+        """Fan out the boundary to the listeners, all of them write their state in this same tick.
+
+        A fire late by more than a quarter-hour first sends the hour and day boundaries it has skipped, in order.
+        """
+        now = dt_util.utcnow()
+        self._drift = now - planned
+        self._schedule(max(now, planned))
+
+        step = timedelta(minutes=QUARTER_MINUTES)
+        skipped = max(int((now - planned) / step), 0)
+        for quarter in range(skipped):
+            self._fan_out(planned + step * quarter, now, skipped=True)
+        self._fan_out(planned + step * skipped, now, skipped=False)
+
+    def _fan_out(self, boundary_time: datetime, now: datetime, skipped: bool) -> None:
+        """Call the listeners of the boundaries of a quarter-hour, only the hour and day ones if it was skipped."""
+        local = boundary_time.astimezone(TIMEZONE)
+        boundaries = [] if skipped else [QUARTER]
+        if local.minute == 0:
+            boundaries.append(HOUR)
+            if local.hour == 0:
+                boundaries.append(DAY)
+
+        drift = (now - boundary_time).total_seconds()
+        for boundary in boundaries:
+            self._drifts[boundary].add(drift)
+            for action in list(self._listeners[boundary]):
+                action(local)
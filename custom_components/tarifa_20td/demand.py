@@ -0,0 +1,288 @@
+"""Quarter-hour demand of a 3.0 TD supply, its monthly maximum per period and the excess power penalty."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+import math
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN, UnitOfPower
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .const import TIMEZONE
+from .coordinator import QUARTER
+from .period_calendar import PERIODS
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping
+
+    from homeassistant.core import CALLBACK_TYPE, Event, EventStateChangedData, HomeAssistant
+
+    from .coordinator import TariffClock
+    from .meter import MeterTracker
+    from .tariff_cache import EntryTariff
+
+QUARTER_SECONDS = 900
+SECONDS_PER_HOUR = 3600
+
+# One-minute buckets of the rolling quarter-hour
+BUCKETS = 15
+
+# Excess power of 3.0 TD with quarter-hour metering (Circular 3/2020 of the CNMC), for each period:
+# Kp * tep * sqrt(sum of (Pd - Pc)^2 of the quarter-hours whose demand Pd exceeds the contracted power Pc)
+EXCESS_TERM = 1.4064
+EXCESS_COEFFICIENTS = (1.0, 0.5147, 0.3705, 0.2911, 0.0447, 0.0447)
+
+POWER_FACTORS = {
+    UnitOfPower.WATT: 0.001,
+    UnitOfPower.KILO_WATT: 1.0,
+}
+
+
+def read_power(value: str, attributes: Mapping[str, Any]) -> float | None:
+    """Return the power in kW, or None if the sensor has no valid value."""
+    if value in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+        return None
+    try:
+        return float(value) * POWER_FACTORS.get(attributes.get("unit_of_measurement"), 1.0)
+    except ValueError:
+        return None
+
+
+def month_number(timestamp: float) -> int:
+    """Return the local month of the timestamp, counted from the year 0."""
+    local = datetime.fromtimestamp(timestamp, TIMEZONE)
+    return local.year * 12 + local.month - 1
+
+
+class RollingDemand:
+    """Energy of the last quarter-hour in a ring of one-minute buckets, each update is O(1) and no sample is kept."""
+
+    def __init__(self, window: int = QUARTER_SECONDS, buckets: int = BUCKETS) -> None:
+        """Initialise an empty ring."""
+        self._window = window
+        self._width = window // buckets
+        self._ring = [0.0] * buckets
+        self._total = 0.0
+        self._slot: int | None = None
+
+    def _advance(self, slot: int) -> bool:
+        """Empty the buckets that leave the window, return if the newest bucket has changed."""
+        if self._slot is None:
+            self._slot = slot
+            return True
+        if slot <= self._slot:
+            return False
+        size = len(self._ring)
+        for step in range(1, min(slot - self._slot, size) + 1):
+            index = (self._slot + step) % size
+            self._total -= self._ring[index]
+            self._ring[index] = 0.0
+        self._slot = slot
+        if slot % size == 0:
+            # The rounding errors of the running sum are dropped once per window
+            self._total = sum(self._ring)
+        return True
+
+    def add(self, start: float, end: float, energy: float) -> bool:
+        """Spread the energy of a span over its buckets, return if the newest bucket has changed."""
+        first = max(start, end - self._window)
+        if end <= first:
+            changed = self._advance(int(end // self._width))
+            self._ring[self._slot % len(self._ring)] += energy
+            self._total += energy
+            return changed
+
+        changed = False
+        moment = first
+        while moment < end:
+            slot = int(moment // self._width)
+            bucket_end = min((slot + 1) * self._width, end)
+            changed = self._advance(slot) or changed
+            part = energy * (bucket_end - moment) / (end - start)
+            self._ring[self._slot % len(self._ring)] += part
+            self._total += part
+            moment = bucket_end
+        return changed
+
+    def demand(self, timestamp: float) -> float:
+        """Return the mean power of the last quarter-hour (kW)."""
+        slot = int(timestamp // self._width)
+        self._advance(slot)
+        # The oldest buckets are whole minutes and the newest one is still filling
+        covered = (len(self._ring) - 1) * self._width + timestamp - slot * self._width
+        return max(self._total, 0.0) * SECONDS_PER_HOUR / covered
+
+
+@dataclass
+class PeriodDemand:
+    """Maximum quarter-hour demand and squared excess of a period in the month."""
+
+    maximum: float = 0.0
+    squared_excess: float = 0.0
+
+
+class DemandTracker:
+    """Quarter-hour demand of a power sensor, or of the energy meter, and its monthly maximum per period.
+
+    A power sensor is integrated holding each value until the next one, so sensors reporting every second only cost a few
+    additions per update.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        tariff: EntryTariff,
+        clock: TariffClock,
+        meter: MeterTracker | None = None,
+        power_entity: str | None = None,
+    ) -> None:
+        """Initialise values."""
+        self._hass = hass
+        self._tariff = tariff
+        self._clock = clock
+        self._meter = meter
+        self._power_entity = power_entity
+        self._rolling = RollingDemand()
+        self._quarter: float | None = None
+        self._quarter_energy = 0.0
+        self._power: float | None = None
+        self._power_time = 0.0
+        self._month = 0
+        self.periods = [PeriodDemand() for _ in PERIODS]
+        self.last_demand: float | None = None
+        self._listeners: list[Callable[[], None]] = []
+        self._unsubs: list[CALLBACK_TYPE] = []
+
+    @property
+    def month(self) -> int:
+        """Return the month of the maximums."""
+        return self._month
+
+    def rolling_demand(self, timestamp: float) -> float:
+        """Return the mean power of the last quarter-hour, with the current power held until the timestamp."""
+        self._hold(timestamp)
+        return self._rolling.demand(timestamp)
+
+    def excess_cost(self) -> float:
+        """Return the excess power penalty of the month."""
+        return sum(
+            coefficient * EXCESS_TERM * math.sqrt(period.squared_excess)
+            for coefficient, period in zip(EXCESS_COEFFICIENTS, self.periods, strict=True)
+        )
+
+    def restore(self, index: int, month: int, maximum: float, squared_excess: float) -> None:
+        """Restore the maximum of a period stored before a restart, if it is of the current month."""
+        if self._month == 0:
+            self._month = month_number(datetime.now(tz=TIMEZONE).timestamp())
+        if month == self._month:
+            self.periods[index] = PeriodDemand(maximum, squared_excess)
+            self._notify()
+
+    @callback
+    def async_add_listener(self, action: Callable[[], None]) -> CALLBACK_TYPE:
+        """Call the action when a quarter-hour ends or the rolling demand moves to a new minute."""
+        self._listeners.append(action)
+        if not self._unsubs:
+            self._unsubs.append(self._clock.async_add_listener(QUARTER, self._async_quarter))
+            if self._power_entity is not None:
+                self._unsubs.append(async_track_state_change_event(self._hass, self._power_entity, self._async_power_changed))
+            elif self._meter is not None:
+                self._unsubs.append(self._meter.async_add_listener(self._async_energy))
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(action)
+            if not self._listeners:
+                for unsub in self._unsubs:
+                    unsub()
+                self._unsubs.clear()
+
+        return remove_listener
+
+    @callback
+    def _async_power_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Integrate the previous power up to the new value."""
+        if (new_state := event.data["new_state"]) is None:
+            return
+        if self.add_power(new_state.last_updated.timestamp(), read_power(new_state.state, new_state.attributes)):
+            self._notify()
+
+    @callback
+    def _async_energy(self, energy: float, _index: int, updated: datetime) -> None:
+        """Add the energy of a meter reading."""
+        timestamp = updated.timestamp()
+        if self._add(timestamp, timestamp, energy):
+            self._notify()
+
+    @callback
+    def _async_quarter(self, now: datetime) -> None:
+        """Close the quarter-hour that has just ended."""
+        self._hold(now.timestamp())
+        self._close(now.timestamp())
+        self._notify()
+
+    def add_power(self, timestamp: float, power: float | None) -> bool:
+        """Integrate the held power up to the timestamp and hold the new one, return if the listeners must be called."""
+        changed = self._hold(timestamp)
+        self._power = power
+        self._power_time = max(timestamp, self._power_time)
+        return changed
+
+    def _hold(self, timestamp: float) -> bool:
+        """Add the energy of the held power up to the timestamp."""
+        if self._power is None or timestamp <= self._power_time:
+            return False
+        start, self._power_time = self._power_time, timestamp
+        return self._add(start, timestamp, self._power * (timestamp - start) / SECONDS_PER_HOUR)
+
+    def _add(self, start: float, end: float, energy: float) -> bool:
+        """Add the energy of a span, split at the quarter-hour boundaries."""
+        changed = False
+        while True:
+            boundary = (start // QUARTER_SECONDS + 1) * QUARTER_SECONDS
+            if end <= boundary:
+                break
+            part = energy * (boundary - start) / (end - start)
+            changed = self._accumulate(start, boundary, part) or changed
+            start, energy = boundary, energy - part
+        return self._accumulate(start, end, energy) or changed
+
+    def _accumulate(self, start: float, end: float, energy: float) -> bool:
+        """Add the energy of a span within a quarter-hour."""
+        quarter = (end if start == end else start) // QUARTER_SECONDS * QUARTER_SECONDS
+        changed = False
+        if self._quarter is None:
+            self._quarter = quarter
+        elif quarter > self._quarter:
+            changed = self._close(quarter)
+        self._quarter_energy += energy
+        return self._rolling.add(start, end, energy) or changed
+
+    def _close(self, now: float) -> bool:
+        """End the current quarter-hour if now is after it, and update the maximum of its period."""
+        quarter = self._quarter
+        if quarter is None or now < quarter + QUARTER_SECONDS:
+            return False
+
+        demand = self._quarter_energy * SECONDS_PER_HOUR / QUARTER_SECONDS
+        self._quarter = now // QUARTER_SECONDS * QUARTER_SECONDS
+        self._quarter_energy = 0.0
+        self.last_demand = demand
+
+        if (month := month_number(quarter)) != self._month:
+            self._month = month
+            self.periods = [PeriodDemand() for _ in PERIODS]
+        index = self._tariff.calendar.period_index(datetime.fromtimestamp(quarter, TIMEZONE))
+        period = self.periods[index]
+        period.maximum = max(period.maximum, demand)
+        powers = self._tariff.history.at(quarter).fixed.powers
+        if index < len(powers) and powers[index] > 0 and demand > powers[index]:
+            period.squared_excess += (demand - powers[index]) ** 2
+        return True
+
+    def _notify(self) -> None:
+        for action in list(self._listeners):
+            action()
@@ -0,0 +1,27 @@
+"""Diagnostics support for Tariff TD."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from .const import DATA_CLOCK, DOMAIN
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return the configuration, the price history and the runtime metrics of a config entry."""
+    clock = hass.data[DOMAIN][DATA_CLOCK]
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "data": dict(entry.data),
+        "price_history": entry_data.tariff.history.as_list(),
+        "metrics": entry_data.metrics.as_dict(),
+        "clock": {
+            "next_fire": clock.next_fire,
+            "drift_ms": clock.drift.total_seconds() * 1000,
+            "drifts": {boundary: stats.as_dict() for boundary, stats in clock.drifts.items()},
+        },
+    }
@@ -0,0 +1,171 @@
+"""Fixed costs of a supply: contracted power, meter rental, social bonus and other daily costs."""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+from typing import TYPE_CHECKING, Any
+
+from .const import (
+    CONF_DIARY_COST,
+    CONF_METER_RENTAL,
+    CONF_POWER_P1,
+    CONF_POWER_P2,
+    CONF_POWER_P3,
+    CONF_POWER_P4,
+    CONF_POWER_P5,
+    CONF_POWER_P6,
+    CONF_POWER_TERM_P1,
+    CONF_POWER_TERM_P2,
+    CONF_POWER_TERM_P3,
+    CONF_POWER_TERM_P4,
+    CONF_POWER_TERM_P5,
+    CONF_POWER_TERM_P6,
+    CONF_SOCIAL_BONUS,
+    CONF_TARIFF,
+    TARIFF_20,
+    TARIFF_30,
+    TIMEZONE,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from .price_history import PriceHistory
+
+POWER_KEYS = (CONF_POWER_P1, CONF_POWER_P2, CONF_POWER_P3, CONF_POWER_P4, CONF_POWER_P5, CONF_POWER_P6)
+POWER_TERM_KEYS = (CONF_POWER_TERM_P1, CONF_POWER_TERM_P2, CONF_POWER_TERM_P3, CONF_POWER_TERM_P4, CONF_POWER_TERM_P5, CONF_POWER_TERM_P6)
+FIXED_COST_KEYS = (*POWER_KEYS, *POWER_TERM_KEYS, CONF_METER_RENTAL, CONF_SOCIAL_BONUS, CONF_DIARY_COST)
+
+# 2.0 TD only has two power periods, P1 (punta y llana) and P2 (valle)
+POWER_PERIODS = {TARIFF_20: 2, TARIFF_30: 6}
+
+
+@dataclass(frozen=True)
+class FixedTerms:
+    """Terms of the fixed costs, the power terms are €/kW per year and the others € per day."""
+
+    powers: tuple[float, ...] = ()
+    power_terms: tuple[float, ...] = ()
+    meter_rental: float = 0.0
+    social_bonus: float = 0.0
+    other: float = 0.0
+
+    @property
+    def power_cost(self) -> float:
+        """Return the cost of the contracted power for a whole year."""
+        return sum(power * term for power, term in zip(self.powers, self.power_terms, strict=False))
+
+    @property
+    def day_cost(self) -> float:
+        """Return the costs charged per day, the same every day."""
+        return self.meter_rental + self.social_bonus + self.other
+
+    def daily_cost(self, days_in_year: int) -> float:
+        """Return the fixed cost of a day of a year with the given number of days."""
+        return self.power_cost / days_in_year + self.day_cost
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the terms with the config entry keys."""
+        return {
+            **dict(zip(POWER_KEYS, self.powers, strict=False)),
+            **dict(zip(POWER_TERM_KEYS, self.power_terms, strict=False)),
+            CONF_METER_RENTAL: self.meter_rental,
+            CONF_SOCIAL_BONUS: self.social_bonus,
+            CONF_DIARY_COST: self.other,
+        }
+
+
+def fixed_terms(data: Mapping[str, Any], power_periods: int) -> FixedTerms:
+    """Return the fixed terms of a dict with the config entry keys."""
+    return FixedTerms(
+        tuple(float(data.get(key, 0)) for key in POWER_KEYS[:power_periods]),
+        tuple(float(data.get(key, 0)) for key in POWER_TERM_KEYS[:power_periods]),
+        float(data.get(CONF_METER_RENTAL, 0)),
+        float(data.get(CONF_SOCIAL_BONUS, 0)),
+        float(data.get(CONF_DIARY_COST, 0)),
+    )
+
+
+def entry_fixed_terms(data: Mapping[str, Any]) -> FixedTerms:
+    """Return the fixed terms of a config entry."""
+    return fixed_terms(data, POWER_PERIODS.get(data.get(CONF_TARIFF, TARIFF_20), 2))
+
+
+def year_days(year: int) -> int:
+    """Return the days of the year, 366 on leap years."""
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+def _midnight(day: date) -> float:
+    return datetime.combine(day, time(), TIMEZONE).timestamp()
+
+
+def year_fixed_costs(history: PriceHistory, year: int) -> array[float]:
+    """Return the fixed cost of each day of the year, a day is charged with the terms in force at its start."""
+    days = year_days(year)
+    first = date(year, 1, 1)
+    midnights = [_midnight(first + timedelta(days=day)) for day in range(days + 1)]
+    costs = array("d", bytes(8 * days))
+    for begin, end, price_set in history.between(midnights[0], midnights[-1]):
+        # Days starting within the span of the price set
+        start, stop = bisect_left(midnights, begin), bisect_left(midnights, end)
+        costs[start:stop] = array("d", [price_set.fixed.daily_cost(days)]) * (stop - start)
+    return costs
+
+
+class FixedCosts:
+    """Fixed cost of each day of a price history, computed a whole year at a time."""
+
+    def __init__(self, history: PriceHistory) -> None:
+        """Initialise values."""
+        self._history = history
+        self._years: dict[int, array[float]] = {}
+        self._sums: dict[int, array[float]] = {}
+
+    def year(self, year: int) -> array[float]:
+        """Return the fixed cost of each day of the year."""
+        if (costs := self._years.get(year)) is None:
+            costs = self._years[year] = year_fixed_costs(self._history, year)
+        return costs
+
+    def _year_sums(self, year: int) -> array[float]:
+        """Return the cost of the days of the year before each day, with the whole year last."""
+        if (sums := self._sums.get(year)) is None:
+            sums = self._sums[year] = array("d", accumulate(self.year(year), initial=0.0))
+        return sums
+
+    def day(self, day: date) -> float:
+        """Return the fixed cost of a day."""
+        return self.year(day.year)[day.timetuple().tm_yday - 1]
+
+    def total(self, first: date, end: date) -> float:
+        """Return the fixed cost of the days from first to end, end excluded, with two lookups per year."""
+        total = 0.0
+        for year in range(first.year, end.year + 1):
+            sums = self._year_sums(year)
+            start = first.timetuple().tm_yday - 1 if year == first.year else 0
+            stop = end.timetuple().tm_yday - 1 if year == end.year else len(sums) - 1
+            total += sums[stop] - sums[start] if stop > start else 0.0
+        return total
+
+    def accrued(self, start: datetime, end: datetime, prorated: bool) -> float:
+        """Return the fixed cost from start to end.
+
+        Each day is charged when it ends, or in proportion to the elapsed part of its real length (23 or 25 hours when DST
+        changes) when prorated.
+        """
+        if end <= start:
+            return 0.0
+        first = start.astimezone(TIMEZONE).date()
+        last = end.astimezone(TIMEZONE).date()
+        if not prorated:
+            return self.total(first, last)
+
+        # The whole days from the first to the last one, less the part of the first before the start and of the last after the end
+        before = (start.timestamp() - _midnight(first)) / (_midnight(first + timedelta(days=1)) - _midnight(first))
+        after = (_midnight(last + timedelta(days=1)) - end.timestamp()) / (_midnight(last + timedelta(days=1)) - _midnight(last))
+        return self.total(first, last + timedelta(days=1)) - before * self.day(first) - after * self.day(last)
@@ -0,0 +1,73 @@
+"""Price history of each config entry persisted in .storage."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.helpers.storage import Store
+
+from .const import DATA_HISTORY_STORE, DOMAIN
+from .price_history import PriceHistory
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+STORAGE_KEY = f"{DOMAIN}.price_history"
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_get_history_store(hass: HomeAssistant) -> HistoryStore:
+    """Return the price history store shared by every entry, loaded once."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_HISTORY_STORE not in domain_data:
+        domain_data[DATA_HISTORY_STORE] = HistoryStore(hass)
+    store: HistoryStore = domain_data[DATA_HISTORY_STORE]
+    await store.async_load()
+    return store
+
+
+class HistoryStore:
+    """Price sets of each config entry, keyed by the entry id."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialise values."""
+        self._store: Store[dict[str, Any]] = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._histories: dict[str, PriceHistory] = {}
+        self._lock = asyncio.Lock()
+        self._loaded = False
+
+    async def async_load(self) -> None:
+        """Read the stored histories once, the invalid ones are dropped."""
+        async with self._lock:
+            if self._loaded:
+                return
+            data = await self._store.async_load() or {}
+            for entry_id, price_sets in data.get("entries", {}).items():
+                try:
+                    self._histories[entry_id] = PriceHistory.from_list(price_sets)
+                except (KeyError, TypeError, ValueError) as error:
+                    _LOGGER.warning("Discarding the price history of %s: %s", entry_id, error)
+            self._loaded = True
+
+    def get(self, entry_id: str) -> PriceHistory | None:
+        """Return the price history of a config entry."""
+        return self._histories.get(entry_id)
+
+    def async_set(self, entry_id: str, history: PriceHistory) -> None:
+        """Replace the price history of a config entry."""
+        self._histories[entry_id] = history
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def async_remove(self, entry_id: str) -> None:
+        """Forget the price history of a removed config entry."""
+        if self._histories.pop(entry_id, None) is not None:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the price sets of every entry."""
+        return {"entries": {entry_id: history.as_list() for entry_id, history in self._histories.items()}}
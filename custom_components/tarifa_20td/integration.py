@@ -0,0 +1,172 @@
+"""Set up the Tariff TD config entries in Home Assistant."""
+
+from __future__ import annotations
+
+from datetime import timedelta
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from homeassistant.const import Platform
+from homeassistant.helpers import config_validation as cv, entity_registry as er
+
+from .cheapest import CheapestWindow
+from .const import (
+    CONF_DIARY_COST,
+    CONF_ENERGY_ENTITY,
+    CONF_P1,
+    CONF_P2,
+    CONF_P3,
+    CONF_P4,
+    CONF_P5,
+    CONF_P6,
+    CONF_POWER_ENTITY,
+    CONF_QUARTER_HOUR,
+    CONF_TARIFF,
+    CONF_WINDOW_HOURS,
+    DATA_CLOCK,
+    DOMAIN,
+    TARIFF_20,
+    TARIFF_30,
+)
+from .coordinator import QUARTER_MINUTES, TariffClock, TariffEntryData
+from .demand import DemandTracker
+from .fixed_cost import FIXED_COST_KEYS
+from .history_store import async_get_history_store
+from .meter import MeterTracker
+from .price_history import entry_price_set, record_prices
+from .services import async_setup_services
+from .tariff_cache import async_acquire_tariff, async_create_entry_tariff, async_release_tariff
+from .upcoming import UpcomingPeriods
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.typing import ConfigType
+
+PLATFORMS: list[Platform] = [Platform.BINARY_SENSOR, Platform.SENSOR]
+
+# Options applied without reloading the entry
+HOT_OPTIONS = frozenset({CONF_P1, CONF_P2, CONF_P3, CONF_P4, CONF_P5, CONF_P6, *FIXED_COST_KEYS})
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup(hass: HomeAssistant, _config: ConfigType) -> bool:
+    """Set up the services of Tariff TD."""
+    async_setup_services(hass)
+    return True
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Set up sensors handler."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_CLOCK not in domain_data:
+        domain_data[DATA_CLOCK] = TariffClock(hass)
+
+    # Prices changed while the entry was not loaded take effect now
+    store = await async_get_history_store(hass)
+    history = record_prices(store.get(entry.entry_id), entry_price_set(entry.data, time.time()))
+    if history is not store.get(entry.entry_id):
+        store.async_set(entry.entry_id, history)
+
+    # Entries with the same tariff type, prices and price file share the index
+    start = time.monotonic()
+    tariff = await async_create_entry_tariff(hass, entry.data, history)
+    tariff_build = time.monotonic() - start
+    window_hours = int(entry.data.get(CONF_WINDOW_HOURS, 0))
+    energy_entity = entry.data.get(CONF_ENERGY_ENTITY)
+    step = timedelta(minutes=QUARTER_MINUTES) if entry.data.get(CONF_QUARTER_HOUR, False) else timedelta(hours=1)
+    meter = MeterTracker(hass, tariff, energy_entity) if energy_entity else None
+    # The maximum demand is only billed on 3.0 TD, from a power sensor or else the energy meter
+    power_entity = entry.data.get(CONF_POWER_ENTITY)
+    demand = None
+    if entry.data[CONF_TARIFF] == TARIFF_30 and (power_entity or meter is not None):
+        demand = DemandTracker(hass, tariff, domain_data[DATA_CLOCK], meter, power_entity)
+    domain_data[entry.entry_id] = TariffEntryData(
+        tariff,
+        UpcomingPeriods(tariff, step),
+        CheapestWindow(tariff, window_hours) if window_hours else None,
+        meter,
+        demand,
+        config=dict(entry.data),
+    )
+    domain_data[entry.entry_id].metrics.tariff_build = tariff_build
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    entry.async_on_unload(entry.add_update_listener(_async_update_options))
+    return True
+
+
+async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
+    """Unload a config entry."""
+    if unload_ok := await hass.config_entries.async_unload_platforms(config_entry, PLATFORMS):
+        entry_data = hass.data[DOMAIN].pop(config_entry.entry_id)
+        async_release_tariff(hass, entry_data.tariff.shared)
+    return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Forget the price history of a removed entry."""
+    (await async_get_history_store(hass)).async_remove(entry.entry_id)
+
+
+async def _async_update_options(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    """Handle options update."""
+    # update entry replacing data with new options
+    data = {**config_entry.data, **config_entry.options}
+    hass.config_entries.async_update_entry(config_entry, data=data)
+
+    entry_data = hass.data[DOMAIN].get(config_entry.entry_id)
+    if entry_data is None:
+        return
+    changed = {key for key in data.keys() | entry_data.config.keys() if data.get(key) != entry_data.config.get(key)}
+    if not changed:
+        return
+    if not changed <= HOT_OPTIONS:
+        # The tariff type and the other options change the entities
+        await hass.config_entries.async_reload(config_entry.entry_id)
+        return
+
+    # Prices and diary cost are swapped in place, each entity writes its state once
+    entry_data.config = dict(data)
+    tariff = entry_data.tariff
+    previous = tariff.shared
+    # The new prices take effect now, the past keeps the previous ones
+    history = record_prices(tariff.history, entry_price_set(data, time.time()))
+    if history is not tariff.history:
+        (await async_get_history_store(hass)).async_set(config_entry.entry_id, history)
+    tariff.async_swap(await async_acquire_tariff(hass, data), history)
+    async_release_tariff(hass, previous)
+
+
+async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
+    """Migration scripts."""
+    version = config_entry.version
+
+    if version == 1:
+        data = {
+            CONF_P4: 0.0,
+            CONF_P5: 0.0,
+            CONF_P6: 0.0,
+            CONF_TARIFF: TARIFF_20,
+            CONF_P1: config_entry.data["precio_punta"],
+            CONF_P2: config_entry.data["precio_llana"],
+            CONF_P3: config_entry.data["precio_valle"],
+            CONF_DIARY_COST: config_entry.data["coste_dia"],
+        }
+
+        hass.config_entries.async_update_entry(config_entry, data=data)
+
+        def _async_migrator(entity_entry: er.RegistryEntry) -> dict[str, str]:
+            old_unique_id = entity_entry.unique_id
+            new_unique_id = f"{entity_entry.config_entry_id}-{old_unique_id}"
+            _LOGGER.debug("Updating unique_id from %s to %s", old_unique_id, new_unique_id)
+            return {"new_unique_id": new_unique_id}
+
+        await er.async_migrate_entries(hass, config_entry.entry_id, _async_migrator)
+        config_entry.version = 3
+
+    return True
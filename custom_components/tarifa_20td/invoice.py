@@ -0,0 +1,279 @@
+"""Offline invoice of consumption CSV exports, without Home Assistant.
+
+The rows are streamed through generators, so the memory does not depend on the size of the file.
+
+    tarifa-20td-invoice consumo.csv --tariff 2.0 --p1 0.25 --p2 0.18 --p3 0.12 --power 4.6 4.6 --power-term 26.93 0.69
+
+With `--history precios.json`, a list of `{"start", "P1", ..., "power_P1", ..., "power_term_P1", ...}` objects, each reading is
+priced with the prices in force at it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+from dataclasses import dataclass, replace
+from datetime import UTC, date, datetime, time, timedelta
+import json
+import sys
+from typing import TYPE_CHECKING, Any, TextIO
+
+from .const import (
+    CONF_DIARY_COST,
+    CONF_METER_RENTAL,
+    CONF_P1,
+    CONF_P2,
+    CONF_P3,
+    CONF_P4,
+    CONF_P5,
+    CONF_P6,
+    CONF_SOCIAL_BONUS,
+    CONF_TARIFF,
+    TARIFF_20,
+    TARIFF_30,
+    TIMEZONE,
+)
+from .fixed_cost import POWER_KEYS, POWER_TERM_KEYS, FixedCosts
+from .period_calendar import PERIODS, PeriodCalendar, TariffIndex, entry_prices
+from .price_history import PriceHistory, entry_price_set
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Mapping, Sequence
+
+# Lowercase column names of the distributor exports and of generic files
+CUPS_COLUMNS = ("cups",)
+DATE_COLUMNS = ("fecha", "date", "datetime", "timestamp", "start")
+HOUR_COLUMNS = ("hora", "hour")
+ENERGY_COLUMNS = ("consumo_kwh", "consumo", "ae_kwh", "ae", "kwh", "energy", "energia")
+
+TARIFF_TYPES = {"2.0": TARIFF_20, "3.0": TARIFF_30}
+
+
+@dataclass
+class Reading:
+    """Energy consumed in the interval starting at a local time."""
+
+    cups: str
+    start: datetime
+    energy: float
+
+
+@dataclass
+class Invoice:
+    """Energy and cost of each period of a supply point."""
+
+    cups: str
+    energy: list[float]
+    cost: list[float]
+    fixed_costs: FixedCosts
+    first_day: date | None = None
+    last_day: date | None = None
+    readings: int = 0
+
+    @property
+    def days(self) -> int:
+        """Return the days from the first to the last reading."""
+        return (self.last_day - self.first_day).days + 1 if self.first_day and self.last_day else 0
+
+    @property
+    def fixed_cost(self) -> float:
+        """Return the fixed cost of the days, each one with the terms in force at its start."""
+        if self.first_day is None:
+            return 0.0
+        return self.fixed_costs.total(self.first_day, self.first_day + timedelta(days=self.days))
+
+    @property
+    def total(self) -> float:
+        """Return the energy and the fixed cost."""
+        return sum(self.cost) + self.fixed_cost
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the invoice."""
+        return {
+            "cups": self.cups,
+            "first_day": self.first_day.isoformat() if self.first_day else None,
+            "last_day": self.last_day.isoformat() if self.last_day else None,
+            "days": self.days,
+            "readings": self.readings,
+            "periods": {
+                period: {"energy": energy, "cost": cost} for period, energy, cost in zip(PERIODS, self.energy, self.cost, strict=False)
+            },
+            "energy": sum(self.energy),
+            "energy_cost": sum(self.cost),
+            "fixed_cost": self.fixed_cost,
+            "total": self.total,
+        }
+
+
+def _column(header: Sequence[str], names: Sequence[str]) -> int | None:
+    """Return the index of the first column with one of the names."""
+    lowered = [name.strip().lower() for name in header]
+    return next((lowered.index(name) for name in names if name in lowered), None)
+
+
+def _parse_float(value: str) -> float:
+    return float(value.strip().replace(",", "."))
+
+
+def _parse_day(value: str) -> date:
+    """Return the date of a `dd/mm/yyyy` or ISO 8601 text."""
+    value = value.strip()
+    if "/" in value:
+        day, month, year = value.split("/")
+        return date(int(year), int(month), int(day))
+    return date.fromisoformat(value[:10])
+
+
+def _parse_start(day_value: str, hour_value: str | None) -> datetime:
+    """Return the local start of the interval of a row.
+
+    Distributor exports number the hours from 1 to 24 (25 on the day DST ends) as the hour ending, they are counted in real hours
+    from midnight. Otherwise the hour is the `HH:MM` start, or the date column is a full ISO 8601 date.
+    """
+    if hour_value is None:
+        start = datetime.fromisoformat(day_value.strip())
+        return start.replace(tzinfo=TIMEZONE) if start.tzinfo is None else start.astimezone(TIMEZONE)
+
+    day = _parse_day(day_value)
+    hour_value = hour_value.strip()
+    if ":" in hour_value:
+        hour, minute = hour_value.split(":")[:2]
+        return datetime.combine(day, time(int(hour) % 24, int(minute)), TIMEZONE)
+    midnight = datetime.combine(day, time(), TIMEZONE).astimezone(UTC)
+    return (midnight + timedelta(hours=int(hour_value) - 1)).astimezone(TIMEZONE)
+
+
+def read_csv(lines: Iterable[str], default_cups: str = "") -> Iterator[Reading]:
+    """Yield the readings of a CSV with a header, `;` or `,` separated, rows that can not be parsed are skipped."""
+    lines = iter(lines)
+    header_line = next(lines, "")
+    delimiter = ";" if header_line.count(";") >= header_line.count(",") else ","
+    header = next(csv.reader([header_line], delimiter=delimiter), [])
+
+    date_column = _column(header, DATE_COLUMNS)
+    energy_column = _column(header, ENERGY_COLUMNS)
+    if date_column is None or energy_column is None:
+        raise ValueError(f"Date or energy column not found in the header: {header_line.strip()}")
+    hour_column = _column(header, HOUR_COLUMNS)
+    cups_column = _column(header, CUPS_COLUMNS)
+
+    for row in csv.reader(lines, delimiter=delimiter):
+        try:
+            yield Reading(
+                row[cups_column].strip() if cups_column is not None else default_cups,
+                _parse_start(row[date_column], row[hour_column] if hour_column is not None else None),
+                _parse_float(row[energy_column]),
+            )
+        except (IndexError, ValueError):
+            continue
+
+
+def compute_invoices(readings: Iterable[Reading], tariff: TariffIndex, fixed_costs: FixedCosts) -> dict[str, Invoice]:
+    """Accumulate the energy and the cost of each period of each supply point."""
+    invoices: dict[str, Invoice] = {}
+    calendar = tariff.calendar
+    for reading in readings:
+        if (invoice := invoices.get(reading.cups)) is None:
+            size = len(tariff.prices)
+            invoice = invoices[reading.cups] = Invoice(reading.cups, [0.0] * size, [0.0] * size, fixed_costs)
+
+        index = calendar.period_index(reading.start)
+        invoice.energy[index] += reading.energy
+        invoice.cost[index] += reading.energy * tariff.get_period_price(index, reading.start)
+        invoice.readings += 1
+
+        day = reading.start.date()
+        if invoice.first_day is None or day < invoice.first_day:
+            invoice.first_day = day
+        if invoice.last_day is None or day > invoice.last_day:
+            invoice.last_day = day
+    return invoices
+
+
+def create_tariff_index(data: Mapping[str, Any], history: PriceHistory | None = None) -> TariffIndex:
+    """Create the tariff of config entry like data, the years are resolved when the readings need them."""
+    return TariffIndex(PeriodCalendar(data[CONF_TARIFF]), entry_prices(data), history)
+
+
+def read_history(path: str, size: int) -> PriceHistory:
+    """Read a JSON list of price sets, the prices of the periods that the tariff does not have are dropped."""
+    with open(path, encoding="utf-8") as file:
+        history = PriceHistory.from_list(json.load(file))
+    if any(len(price_set.prices) < size for price_set in history.sets):
+        raise ValueError(f"Every price set of {path} needs the prices of P1 to P{size}")
+    return PriceHistory(replace(price_set, prices=price_set.prices[:size]) for price_set in history.sets)
+
+
+def format_invoice(invoice: Invoice) -> str:
+    """Return the invoice as a text table."""
+    lines = [
+        f"CUPS {invoice.cups or '-'}: {invoice.first_day} - {invoice.last_day} ({invoice.days} días, {invoice.readings} lecturas)",
+        f"{'Periodo':<8}{'kWh':>14}{'€':>14}",
+    ]
+    lines.extend(
+        f"{period:<8}{energy:>14.3f}{cost:>14.2f}" for period, energy, cost in zip(PERIODS, invoice.energy, invoice.cost, strict=False)
+    )
+    lines.append(f"{'Energía':<8}{sum(invoice.energy):>14.3f}{sum(invoice.cost):>14.2f}")
+    lines.append(f"{'Fijo':<8}{'':>14}{invoice.fixed_cost:>14.2f}")
+    lines.append(f"{'Total':<8}{'':>14}{invoice.total:>14.2f}")
+    return "\n".join(lines)
+
+
+def main(argv: Sequence[str] | None = None, output: TextIO = sys.stdout) -> int:
+    """Compute the invoices of the CSV files given in the command line."""
+    parser = argparse.ArgumentParser(description="Calcula el coste de la energía de exportaciones CSV de consumo horario o cuartohorario.")
+    parser.add_argument("files", nargs="+", help="ficheros CSV, - para la entrada estándar")
+    parser.add_argument("--tariff", choices=TARIFF_TYPES, default="2.0", help="tipo de tarifa")
+    for period in PERIODS:
+        parser.add_argument(f"--{period.lower()}", type=float, default=0.0, help=f"precio de {period} (€/kWh)")
+    parser.add_argument("--power", type=float, nargs="+", default=[], help="potencia contratada de cada periodo, P1 primero (kW)")
+    parser.add_argument("--power-term", type=float, nargs="+", default=[], help="término de potencia de cada periodo (€/kW año)")
+    parser.add_argument("--meter-rental", type=float, default=0.0, help="alquiler del contador (€/día)")
+    parser.add_argument("--social-bonus", type=float, default=0.0, help="financiación del bono social (€/día)")
+    parser.add_argument("--diary-cost", type=float, default=0.0, help="otros costes fijos (€/día)")
+    parser.add_argument("--history", help="fichero JSON con los precios en vigor desde cada fecha, en lugar de los anteriores")
+    parser.add_argument("--encoding", default="utf-8-sig", help="codificación de los ficheros")
+    parser.add_argument("--json", action="store_true", help="salida en JSON")
+    args = parser.parse_args(argv)
+
+    data = {
+        CONF_TARIFF: TARIFF_TYPES[args.tariff],
+        CONF_P1: args.p1,
+        CONF_P2: args.p2,
+        CONF_P3: args.p3,
+        CONF_P4: args.p4,
+        CONF_P5: args.p5,
+        CONF_P6: args.p6,
+        **dict(zip(POWER_KEYS, args.power, strict=False)),
+        **dict(zip(POWER_TERM_KEYS, args.power_term, strict=False)),
+        CONF_METER_RENTAL: args.meter_rental,
+        CONF_SOCIAL_BONUS: args.social_bonus,
+        CONF_DIARY_COST: args.diary_cost,
+    }
+    if args.history:
+        history = read_history(args.history, len(entry_prices(data)))
+        data.update(zip(PERIODS, history.current.prices, strict=False))
+        tariff = create_tariff_index(data, history)
+    else:
+        history = PriceHistory([entry_price_set(data, 0.0)])
+        tariff = create_tariff_index(data)
+    fixed_costs = FixedCosts(history)
+
+    invoices: list[Invoice] = []
+    for path in args.files:
+        if path == "-":
+            invoices.extend(compute_invoices(read_csv(sys.stdin, path), tariff, fixed_costs).values())
+            continue
+        with open(path, encoding=args.encoding, newline="") as file:
+            invoices.extend(compute_invoices(read_csv(file, path), tariff, fixed_costs).values())
+
+    if args.json:
+        json.dump([invoice.as_dict() for invoice in invoices], output, indent=2)
+        output.write("\n")
+    else:
+        output.write("\n\n".join(format_invoice(invoice) for invoice in invoices) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
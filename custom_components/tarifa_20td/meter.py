@@ -0,0 +1,110 @@
+"""Single listener on the energy meter of a config entry."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN, UnitOfEnergy
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .const import TIMEZONE
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping
+    from datetime import datetime
+
+    from homeassistant.core import CALLBACK_TYPE, Event, EventStateChangedData, HomeAssistant, State
+
+    from .period_calendar import TariffIndex
+
+ENERGY_FACTORS = {
+    UnitOfEnergy.WATT_HOUR: 0.001,
+    UnitOfEnergy.KILO_WATT_HOUR: 1.0,
+    UnitOfEnergy.MEGA_WATT_HOUR: 1000.0,
+}
+
+
+def read_energy(value: str, attributes: Mapping[str, Any]) -> float | None:
+    """Return the reading in kWh, or None if the meter has no valid value."""
+    if value in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+        return None
+    try:
+        return float(value) * ENERGY_FACTORS.get(attributes.get("unit_of_measurement"), 1.0)
+    except ValueError:
+        return None
+
+
+class MeterTracker:
+    """Turn the readings of a cumulative meter into kWh per period and fan them out to the entities."""
+
+    def __init__(self, hass: HomeAssistant, tariff: TariffIndex, entity_id: str) -> None:
+        """Initialise values."""
+        self._hass = hass
+        self._tariff = tariff
+        self._entity_id = entity_id
+        self._listeners: list[Callable[[float, int, datetime], None]] = []
+        self._unsub: CALLBACK_TYPE | None = None
+        self.last_reading: float | None = None
+        self.last_updated: datetime | None = None
+
+    @property
+    def entity_id(self) -> str:
+        """Return the meter entity."""
+        return self._entity_id
+
+    def restore(self, reading: float | None, updated: datetime | None) -> None:
+        """Restore the last reading processed before a restart, the most recent one wins."""
+        if reading is None or updated is None:
+            return
+        if self.last_updated is None or updated > self.last_updated:
+            self.last_reading = reading
+            self.last_updated = updated
+
+    @callback
+    def async_add_listener(self, action: Callable[[float, int, datetime], None]) -> CALLBACK_TYPE:
+        """Call the action with the kWh, the period index and the time of each reading."""
+        self._listeners.append(action)
+        if self._unsub is None:
+            self._unsub = async_track_state_change_event(self._hass, self._entity_id, self._async_state_changed)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(action)
+            if not self._listeners and self._unsub is not None:
+                self._unsub()
+                self._unsub = None
+
+        return remove_listener
+
+    def _read(self, state: State | None) -> float | None:
+        return None if state is None else read_energy(state.state, state.attributes)
+
+    @callback
+    def _async_state_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Compute the consumed energy since the last reading."""
+        new_state = event.data["new_state"]
+        if new_state is None or (reading := self._read(new_state)) is None:
+            return
+
+        updated = new_state.last_updated
+        if self.last_updated is not None and updated <= self.last_updated:
+            # Out-of-order update, already accounted
+            return
+
+        last_reading = self.last_reading
+        if last_reading is None:
+            last_reading = self._read(event.data["old_state"])
+        self.last_reading = reading
+        self.last_updated = updated
+        if last_reading is None:
+            return
+
+        # A lower reading means that the meter has been reset
+        delta = reading - last_reading if reading >= last_reading else reading
+        if delta == 0:
+            return
+
+        index = self._tariff.calendar.period_index(updated.astimezone(TIMEZONE))
+        for action in self._listeners:
+            action(delta, index, updated)
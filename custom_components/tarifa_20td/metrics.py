@@ -0,0 +1,72 @@
+"""Cheap runtime counters of the hot paths."""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Any
+
+SAMPLES = 256
+
+
+class LatencyStats:
+    """Count and mean of a duration, p99 over the last samples."""
+
+    __slots__ = ("_samples", "count", "total")
+
+    def __init__(self) -> None:
+        """Initialise values."""
+        self.count = 0
+        self.total = 0.0
+        self._samples: deque[float] = deque(maxlen=SAMPLES)
+
+    def add(self, seconds: float) -> None:
+        """Record a duration."""
+        self.count += 1
+        self.total += seconds
+        self._samples.append(seconds)
+
+    @property
+    def mean(self) -> float:
+        """Return the mean of every duration."""
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def p99(self) -> float:
+        """Return the 99th percentile of the last durations, only sorted when read."""
+        if not self._samples:
+            return 0.0
+        samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the stats in milliseconds."""
+        return {"count": self.count, "mean_ms": self.mean * 1000, "p99_ms": self.p99 * 1000}
+
+
+class EntryMetrics:
+    """Runtime metrics of a config entry, the writes and attributes are the ones of its price sensor."""
+
+    def __init__(self) -> None:
+        """Initialise values."""
+        self.price_writes = 0
+        self.attribute_bytes = 0
+        self.attribute_bytes_total = 0
+        self.update_price = LatencyStats()
+        self.update_attributes = LatencyStats()
+        self.tariff_build = 0.0
+
+    def add_price_write(self) -> None:
+        """Count a state write of the price sensor with the current attribute payload."""
+        self.price_writes += 1
+        self.attribute_bytes_total += self.attribute_bytes
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics."""
+        return {
+            "price_writes": self.price_writes,
+            "attribute_bytes": self.attribute_bytes,
+            "attribute_bytes_per_write": self.attribute_bytes_total / self.price_writes if self.price_writes else 0,
+            "update_price": self.update_price.as_dict(),
+            "update_attributes": self.update_attributes.as_dict(),
+            "tariff_build_ms": self.tariff_build * 1000,
+        }
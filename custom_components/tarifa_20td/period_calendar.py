@@ -0,0 +1,219 @@
+"""Precomputed period calendar for spanish Tariff TD."""
+
+from __future__ import annotations
+
+import base64
+from datetime import date, datetime, time, timedelta
+from typing import TYPE_CHECKING, Any
+import zlib
+
+from .const import CONF_P1, CONF_P2, CONF_P3, CONF_P4, CONF_P5, CONF_P6, CONF_TARIFF, TARIFF_20, TIMEZONE
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping, Sequence
+
+    from tariff_td import TariffTD
+
+    from .price_file import PriceFile
+    from .price_history import PriceHistory
+
+# Same names as tariff_td, which is only imported when a calendar is built
+PERIODS = ("P1", "P2", "P3", "P4", "P5", "P6")
+
+HOURS_PER_DAY = 24
+QUARTERS_PER_HOUR = 4
+
+_PERIOD_INDEX = {period: index for index, period in enumerate(PERIODS)}
+
+
+class PeriodCalendar:
+    """Period index (one byte per hour) of a whole year, resolved with the holidays of a Tariff TD."""
+
+    def __init__(self, tariff_type: str, years: Mapping[int, bytearray] | None = None) -> None:
+        """Initialise the calendar with the already resolved years, the others are built on demand."""
+        self._tariff_type = tariff_type
+        self._tariff: TariffTD | None = None
+        self._years: dict[int, bytearray] = dict(years or {})
+        self._year = 0
+        self._start = 0
+        self._periods = bytearray()
+
+    @property
+    def tariff_type(self) -> str:
+        """Return the tariff type of the calendar."""
+        return self._tariff_type
+
+    @property
+    def tariff(self) -> TariffTD:
+        """Return the tariff used to resolve the periods, only created when a year has to be built."""
+        if self._tariff is None:
+            self._tariff = create_tariff(self._tariff_type)
+        return self._tariff
+
+    @property
+    def years(self) -> dict[int, bytearray]:
+        """Return the period indexes of each resolved year."""
+        return self._years
+
+    def year(self, year: int) -> bytearray:
+        """Return the period indexes of every hour of the year, building them if needed."""
+        if (periods := self._years.get(year)) is None:
+            periods = self._years[year] = self._build(year)
+        return periods
+
+    def _build(self, year: int) -> bytearray:
+        """Resolve the period of every hour of the year."""
+        start = date(year, 1, 1)
+        days = (date(year + 1, 1, 1) - start).days
+        periods = bytearray(days * HOURS_PER_DAY)
+        get_period = self.tariff.get_period
+        for day in range(days):
+            midnight = datetime.combine(start + timedelta(days=day), time())
+            offset = day * HOURS_PER_DAY
+            for hour in range(HOURS_PER_DAY):
+                periods[offset + hour] = _PERIOD_INDEX[get_period(midnight.replace(hour=hour))]
+        return periods
+
+    def span(self, start: date, end: date) -> bytes:
+        """Return the period indexes of each hour from the start day to the end day, both included."""
+        chunks = []
+        for year in range(start.year, end.year + 1):
+            periods = self.year(year)
+            first_day = date(year, 1, 1).toordinal()
+            first = (start.toordinal() - first_day) * HOURS_PER_DAY if year == start.year else 0
+            last = (end.toordinal() - first_day + 1) * HOURS_PER_DAY if year == end.year else len(periods)
+            chunks.append(periods[first:last])
+        return b"".join(chunks)
+
+    def slot(self, moment: datetime) -> int:
+        """Return the hour of the year of the moment, switching the active year if it has rolled over."""
+        if moment.year != self._year:
+            self._periods = self.year(moment.year)
+            self._start = datetime(moment.year, 1, 1).toordinal()
+            self._year = moment.year
+        return (moment.toordinal() - self._start) * HOURS_PER_DAY + moment.hour
+
+    def period_index(self, moment: datetime) -> int:
+        """Return the index of the period of the moment."""
+        slot = self.slot(moment)
+        return self._periods[slot]
+
+    def day_periods(self, moment: datetime) -> bytearray:
+        """Return the period indexes of each hour of the day."""
+        slot = self.slot(moment.replace(hour=0))
+        return self._periods[slot : slot + HOURS_PER_DAY]
+
+
+class TariffIndex:
+    """Tariff TD lookups backed by a period calendar and the price vector of a config entry."""
+
+    def __init__(self, calendar: PeriodCalendar, prices: Sequence[float], history: PriceHistory | None = None) -> None:
+        """Initialise values, the prices of the history are used for the dates before the last price set."""
+        self._calendar = calendar
+        self._prices = tuple(prices)
+        self._history = history
+        # Last day prices of each resolution, keyed by day and version
+        self._day_cache: dict[int, tuple[tuple[date, int], list[float]]] = {}
+
+    @property
+    def calendar(self) -> PeriodCalendar:
+        """Return the period calendar."""
+        return self._calendar
+
+    @property
+    def prices(self) -> tuple[float, ...]:
+        """Return the price of each period, P1 first."""
+        return self._prices
+
+    @property
+    def history(self) -> PriceHistory | None:
+        """Return the prices in force over time, None if the prices have always been the same."""
+        return self._history
+
+    @property
+    def price_file(self) -> PriceFile | None:
+        """Return the file with the real prices, None if only the period prices are used."""
+        return None
+
+    @property
+    def version(self) -> int:
+        """Return a number that changes each time the prices change."""
+        return 0
+
+    def get_period(self, moment: datetime) -> str:
+        """Return the period at the moment."""
+        return PERIODS[self._calendar.period_index(moment)]
+
+    def get_price(self, moment: datetime) -> float:
+        """Return the electricity price at the moment."""
+        return self.get_period_price(self._calendar.period_index(moment), moment)
+
+    def get_period_price(self, index: int, moment: datetime) -> float:
+        """Return the electricity price at a moment whose period index is already known."""
+        if self._history is None:
+            return self._prices[index]
+        return self._history.at(moment.timestamp()).prices[index]
+
+    def get_day_prices(self, moment: datetime) -> list[float]:
+        """Return the electricity prices for each hour of the day of the moment, the list is shared and must not be modified."""
+        return self._cached_day(moment, 1, self._day_prices)
+
+    def get_day_quarter_prices(self, moment: datetime) -> list[float]:
+        """Return the electricity prices for each quarter-hour of the day of the moment, the list is shared and must not be modified."""
+        return self._cached_day(moment, QUARTERS_PER_HOUR, self._day_quarter_prices)
+
+    def _cached_day(self, moment: datetime, slots: int, build: Callable[[datetime], list[float]]) -> list[float]:
+        """Return the cached prices of the day, every entry sharing the index reuses them."""
+        key = (moment.date(), self.version)
+        cached = self._day_cache.get(slots)
+        if cached is None or cached[0] != key:
+            cached = self._day_cache[slots] = (key, build(moment))
+        return cached[1]
+
+    def _day_prices(self, moment: datetime) -> list[float]:
+        prices = self._prices
+        return [prices[index] for index in self._calendar.day_periods(moment)]
+
+    def _day_quarter_prices(self, moment: datetime) -> list[float]:
+        prices = self._prices
+        return [prices[index] for index in self._calendar.day_periods(moment) for _ in range(QUARTERS_PER_HOUR)]
+
+
+def create_tariff(tariff_type: str) -> TariffTD:
+    """Create the Tariff TD of a tariff type, prices are not used to resolve the periods."""
+    from tariff_td import Tariff20TD, Tariff30TD  # pylint: disable=import-outside-toplevel
+
+    return Tariff20TD(0, 0, 0) if tariff_type == TARIFF_20 else Tariff30TD(0, 0, 0, 0, 0, 0)
+
+
+def build_calendar(tariff_type: str, years: Mapping[int, bytearray] | None = None) -> PeriodCalendar:
+    """Create the period calendar of a tariff type with the current and the next year resolved."""
+    calendar = PeriodCalendar(tariff_type, years)
+    year = datetime.now(tz=TIMEZONE).year
+    calendar.year(year)
+    # Tomorrow prices of the last day of the year
+    calendar.year(year + 1)
+    return calendar
+
+
+def encode_year(periods: bytes) -> str:
+    """Pack the period indexes of a year into a compressed base64 string."""
+    return base64.b64encode(zlib.compress(periods, 9)).decode("ascii")
+
+
+def decode_year(year: int, packed: str) -> bytearray | None:
+    """Unpack the period indexes of a year, None if they are not valid."""
+    try:
+        periods = bytearray(zlib.decompress(base64.b64decode(packed, validate=True)))
+    except (ValueError, zlib.error):
+        return None
+    days = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+    if len(periods) != days * HOURS_PER_DAY or max(periods) >= len(PERIODS):
+        return None
+    return periods
+
+
+def entry_prices(data: Mapping[str, Any]) -> list[float]:
+    """Return the price of each period of a config entry, P1 first."""
+    prices = [float(data.get(key, 0)) for key in (CONF_P1, CONF_P2, CONF_P3, CONF_P4, CONF_P5, CONF_P6)]
+    return prices[:3] if data[CONF_TARIFF] == TARIFF_20 else prices
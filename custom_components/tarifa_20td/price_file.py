@@ -0,0 +1,261 @@
+"""Hourly or quarter-hourly prices read from a local CSV or JSON file."""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from datetime import datetime, time
+from itertools import pairwise
+import json
+import logging
+import os
+from typing import TYPE_CHECKING, Any
+
+from typing_extensions import override
+
+from .const import TIMEZONE
+from .period_calendar import HOURS_PER_DAY, QUARTERS_PER_HOUR, TariffIndex
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+    from .period_calendar import PeriodCalendar
+
+HOUR_SECONDS = 3600
+QUARTER_SECONDS = 900
+
+# Bytes before the parsed offset compared to tell an append from a rewrite
+FINGERPRINT_SIZE = 64
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_timestamp(value: Any) -> float:
+    """Return the UTC timestamp of an epoch number or an ISO 8601 date, local time if it has no offset."""
+    if isinstance(value, int | float):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=TIMEZONE)
+    return moment.timestamp()
+
+
+def parse_price(value: Any) -> float:
+    """Return the price of a number or a text, decimal comma allowed."""
+    return float(value) if isinstance(value, int | float) else float(str(value).strip().replace(",", "."))
+
+
+def parse_csv_lines(lines: Iterable[str]) -> tuple[list[float], list[float]]:
+    """Return the timestamps and prices of `timestamp,price` or `timestamp;price` lines, other lines are skipped."""
+    timestamps: list[float] = []
+    prices: list[float] = []
+    for line in lines:
+        if not (line := line.strip()) or line.startswith("#"):
+            continue
+        separator = ";" if ";" in line else ","
+        fields = line.split(separator)
+        if len(fields) < 2:
+            continue
+        try:
+            timestamp, price = parse_timestamp(fields[0]), parse_price(fields[1])
+        except ValueError:
+            # Header
+            continue
+        timestamps.append(timestamp)
+        prices.append(price)
+    return timestamps, prices
+
+
+def parse_json(data: Any) -> tuple[list[float], list[float]]:
+    """Return the timestamps and prices of a `{timestamp: price}` object or a list of `{"start", "price"}` objects."""
+    items = data.items() if isinstance(data, dict) else ((item["start"], item["price"]) for item in data)
+    timestamps: list[float] = []
+    prices: list[float] = []
+    for timestamp, price in items:
+        timestamps.append(parse_timestamp(timestamp))
+        prices.append(parse_price(price))
+    return timestamps, prices
+
+
+class PriceFile:
+    """Prices of a file indexed by their start timestamp, appended rows of a CSV are parsed alone."""
+
+    def __init__(self, path: str) -> None:
+        """Initialise an empty index, the file is read by refresh."""
+        self._path = path
+        self._json = path.lower().endswith(".json")
+        # Swapped as a whole, lookups in the event loop never see a half updated index
+        self._index = (array("d"), array("d"), array("d"))
+        self._mtime = 0.0
+        self._offset = 0
+        self._fingerprint = b""
+        self.version = 0
+
+    @property
+    def path(self) -> str:
+        """Return the path of the file."""
+        return self._path
+
+    @property
+    def index(self) -> tuple[array[float], array[float], array[float]]:
+        """Return the start, end and price of each row, sorted by start."""
+        return self._index
+
+    def __len__(self) -> int:
+        """Return the number of prices."""
+        return len(self._index[0])
+
+    def refresh(self) -> bool:
+        """Read the changes of the file if its mtime has changed, return if the prices have changed."""
+        try:
+            stat = os.stat(self._path)
+            if stat.st_mtime == self._mtime:
+                return False
+            changed = self._read_json() if self._json else self._read_csv(stat.st_size)
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            _LOGGER.warning("Unable to read the prices of %s: %s", self._path, error)
+            return False
+        self._mtime = stat.st_mtime
+        if changed:
+            self.version += 1
+        return changed
+
+    def _read_json(self) -> bool:
+        """Parse the whole file, JSON has no appendable rows."""
+        with open(self._path, encoding="utf-8") as file:
+            timestamps, prices = parse_json(json.load(file))
+        self._replace(timestamps, prices)
+        return True
+
+    def _read_csv(self, size: int) -> bool:
+        """Parse the rows after the last parsed offset, or the whole file if it has been rewritten."""
+        with open(self._path, "rb") as file:
+            offset = self._offset
+            if offset:
+                start = max(0, offset - FINGERPRINT_SIZE)
+                file.seek(start)
+                if size < offset or file.read(offset - start) != self._fingerprint:
+                    offset = 0
+            file.seek(offset)
+            chunk = file.read()
+
+        # Only complete lines, a row being written is parsed on the next change
+        end = chunk.rfind(b"\n") + 1
+        timestamps, prices = parse_csv_lines(chunk[:end].decode("utf-8-sig" if offset == 0 else "utf-8").splitlines())
+        if offset == 0:
+            self._replace(timestamps, prices)
+        else:
+            self._append(timestamps, prices)
+
+        self._offset = offset + end
+        self._fingerprint = ((self._fingerprint if offset else b"") + chunk[:end])[-FINGERPRINT_SIZE:]
+        return offset == 0 or bool(timestamps)
+
+    def _replace(self, timestamps: Sequence[float], prices: Sequence[float]) -> None:
+        """Index the prices, sorted by timestamp, the last price of a repeated timestamp wins."""
+        rows = dict(zip(timestamps, prices, strict=True))
+        ordered = sorted(rows)
+        self._swap(array("d", ordered), array("d", (rows[timestamp] for timestamp in ordered)))
+
+    def _append(self, timestamps: Sequence[float], prices: Sequence[float]) -> None:
+        """Add the new rows, only sorting again if they are not after the indexed ones."""
+        if not timestamps:
+            return
+        indexed, _, indexed_prices = self._index
+        if (not indexed or timestamps[0] > indexed[-1]) and all(first < second for first, second in pairwise(timestamps)):
+            self._swap(indexed + array("d", timestamps), indexed_prices + array("d", prices))
+        else:
+            self._replace([*indexed, *timestamps], [*indexed_prices, *prices])
+
+    def _swap(self, timestamps: array[float], prices: array[float]) -> None:
+        """Publish the new index, each price lasts until the next one, an hour at most.
+
+        The last price lasts as long as the one before it, so a file can move from hourly to quarter-hour prices.
+        """
+        ends = array("d", (min(second, first + HOUR_SECONDS) for first, second in pairwise(timestamps)))
+        if timestamps:
+            ends.append(timestamps[-1] + (ends[-1] - timestamps[-2] if ends else HOUR_SECONDS))
+        self._index = (timestamps, ends, prices)
+
+    def get(self, timestamp: float) -> float | None:
+        """Return the price in force at the timestamp, None if the file has no price for it."""
+        timestamps, ends, prices = self._index
+        index = bisect_right(timestamps, timestamp) - 1
+        if index < 0 or timestamp >= ends[index]:
+            return None
+        return prices[index]
+
+    def average(self, start: float, seconds: int) -> float | None:
+        """Return the mean of the prices of a span weighted by their duration, None if any part of it has no price."""
+        timestamps, ends, prices = self._index
+        end = start + seconds
+        index = bisect_right(timestamps, start) - 1
+        if seconds <= 0 or index < 0:
+            return None
+        total = 0.0
+        moment = start
+        while moment < end:
+            if index >= len(timestamps) or timestamps[index] > moment or ends[index] <= moment:
+                return None
+            until = min(ends[index], end)
+            total += prices[index] * (until - moment)
+            moment = until
+            index += 1
+        return total / seconds
+
+
+class PriceFileIndex(TariffIndex):
+    """Tariff TD lookups with the prices of a file, the fixed period prices are used where the file has none."""
+
+    def __init__(self, calendar: PeriodCalendar, prices: Sequence[float], price_file: PriceFile) -> None:
+        """Initialise values."""
+        super().__init__(calendar, prices)
+        self._price_file = price_file
+
+    @property
+    @override
+    def price_file(self) -> PriceFile:
+        """Return the price file."""
+        return self._price_file
+
+    @property
+    @override
+    def version(self) -> int:
+        """Return a number that changes each time the prices of the file change."""
+        return self._price_file.version
+
+    @override
+    def get_period_price(self, index: int, moment: datetime) -> float:
+        """Return the electricity price at a moment whose period index is already known."""
+        price = self._price_file.get(moment.timestamp())
+        return super().get_period_price(index, moment) if price is None else price
+
+    @override
+    def _day_prices(self, moment: datetime) -> list[float]:
+        """Return the prices of each hour of the file, the mean of its quarters if needed."""
+        fixed = super()._day_prices(moment)
+        prices = []
+        for hour in range(HOURS_PER_DAY):
+            price = self._price_file.average(_local_timestamp(moment, hour), HOUR_SECONDS)
+            prices.append(fixed[hour] if price is None else price)
+        return prices
+
+    @override
+    def _day_quarter_prices(self, moment: datetime) -> list[float]:
+        """Return the prices of each quarter-hour of the file."""
+        fixed = super()._day_quarter_prices(moment)
+        prices = []
+        for quarter in range(HOURS_PER_DAY * QUARTERS_PER_HOUR):
+            start = _local_timestamp(moment, quarter // QUARTERS_PER_HOUR) + quarter % QUARTERS_PER_HOUR * QUARTER_SECONDS
+            price = self._price_file.get(start)
+            prices.append(fixed[quarter] if price is None else price)
+        return prices
+
+
+def _local_timestamp(moment: datetime, hour: int) -> float:
+    """Return the timestamp of a wall-clock hour of the day of the moment."""
+    return datetime.combine(moment.date(), time(hour), TIMEZONE).timestamp()
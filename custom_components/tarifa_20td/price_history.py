@@ -0,0 +1,119 @@
+"""Prices of a config entry over time, each price set tagged by the date it took effect."""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field, replace
+from datetime import UTC, datetime
+from itertools import pairwise
+from typing import TYPE_CHECKING, Any
+
+from .const import TARIFF_20, TARIFF_30, TIMEZONE
+from .fixed_cost import POWER_PERIODS, FixedTerms, entry_fixed_terms, fixed_terms
+from .period_calendar import PERIODS, entry_prices
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping, Sequence
+
+
+@dataclass(frozen=True)
+class PriceSet:
+    """Price of each period and fixed terms in force from a UTC timestamp."""
+
+    start: float
+    prices: tuple[float, ...]
+    fixed: FixedTerms = field(default_factory=FixedTerms)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the price set with the period names as keys."""
+        return {
+            "start": datetime.fromtimestamp(self.start, UTC).isoformat(),
+            **dict(zip(PERIODS, self.prices, strict=False)),
+            **self.fixed.as_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> PriceSet:
+        """Return the price set of a dict, a start without offset is local time."""
+        start = datetime.fromisoformat(str(data["start"]))
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=TIMEZONE)
+        prices = tuple(float(data[period]) for period in PERIODS if period in data)
+        # 2.0 TD has 3 energy periods and 2 power periods
+        return cls(start.timestamp(), prices, fixed_terms(data, POWER_PERIODS[TARIFF_20 if len(prices) == 3 else TARIFF_30]))
+
+
+class PriceHistory:
+    """Price sets sorted by the date they took effect, looked up with a bisect of their starts.
+
+    It is immutable, adding a price set returns a new history, so lookups from the executor never see it half updated.
+    """
+
+    def __init__(self, price_sets: Iterable[PriceSet]) -> None:
+        """Sort the price sets, the last one of a repeated start wins."""
+        by_start = {price_set.start: price_set for price_set in price_sets}
+        if not by_start:
+            raise ValueError("A price history needs at least one price set")
+        self._sets = tuple(by_start[start] for start in sorted(by_start))
+        self._starts = tuple(price_set.start for price_set in self._sets)
+
+    @property
+    def sets(self) -> tuple[PriceSet, ...]:
+        """Return the price sets, the oldest first."""
+        return self._sets
+
+    @property
+    def starts(self) -> tuple[float, ...]:
+        """Return the timestamp each price set took effect."""
+        return self._starts
+
+    @property
+    def current(self) -> PriceSet:
+        """Return the last price set."""
+        return self._sets[-1]
+
+    def __len__(self) -> int:
+        """Return the number of price sets."""
+        return len(self._sets)
+
+    def at(self, timestamp: float) -> PriceSet:
+        """Return the price set in force at the timestamp, the oldest one before the history starts."""
+        return self._sets[max(bisect_right(self._starts, timestamp) - 1, 0)]
+
+    def between(self, start: float, end: float) -> list[tuple[float, float, PriceSet]]:
+        """Return the spans from start to end split at the price changes, with the price set of each one."""
+        if start >= end:
+            return []
+        bounds = [start, *self._starts[bisect_right(self._starts, start) : bisect_left(self._starts, end)], end]
+        return [(begin, finish, self.at(begin)) for begin, finish in pairwise(bounds)]
+
+    def add(self, price_set: PriceSet) -> PriceHistory:
+        """Return the history with the price set, it replaces the one with the same start."""
+        return PriceHistory([*self._sets, price_set])
+
+    def as_list(self) -> list[dict[str, Any]]:
+        """Return the price sets as dicts."""
+        return [price_set.as_dict() for price_set in self._sets]
+
+    @classmethod
+    def from_list(cls, data: Sequence[Mapping[str, Any]]) -> PriceHistory:
+        """Return the history of a list of price set dicts."""
+        return cls(PriceSet.from_dict(item) for item in data)
+
+
+def entry_price_set(data: Mapping[str, Any], start: float) -> PriceSet:
+    """Return the price set of a config entry taking effect at the timestamp."""
+    return PriceSet(start, tuple(entry_prices(data)), entry_fixed_terms(data))
+
+
+def record_prices(history: PriceHistory | None, price_set: PriceSet) -> PriceHistory:
+    """Return the history with the price set if the prices have changed, the same history otherwise.
+
+    A new history, or one of another tariff type whose periods do not match, starts with the price set applying to the past.
+    """
+    if history is None or len(history.current.prices) != len(price_set.prices):
+        return PriceHistory([replace(price_set, start=0.0)])
+    current = history.current
+    if current.prices == price_set.prices and current.fixed == price_set.fixed:
+        return history
+    return history.add(price_set)
@@ -2,11 +2,12 @@
 
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from typing import TYPE_CHECKING, Any, Mapping
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Mapping, Self
 
-import pytz
-from tariff_td import Tariff20TD, Tariff30TD, TariffTD
 from typing_extensions import override
 
 from homeassistant.components.sensor import (
@@ -16,19 +17,20 @@ from homeassistant.components.sensor import (
     SensorEntityDescription,
     SensorStateClass,
 )
-from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.const import EntityCategory
+from homeassistant.helpers.json import json_bytes
+from homeassistant.helpers.restore_state import ExtraStoredData
+from homeassistant.util import dt as dt_util
 
 from .const import (
-    CONF_DIARY_COST,
-    CONF_P1,
-    CONF_P2,
-    CONF_P3,
-    CONF_P4,
-    CONF_P5,
-    CONF_P6,
-    CONF_TARIFF,
-    TARIFF_20,
+    CONF_PRORATED,
+    CONF_QUARTER_HOUR,
+    DATA_CLOCK,
+    DOMAIN,
+    TIMEZONE,
 )
+from .coordinator import DAY, HOUR, QUARTER
+from .period_calendar import HOURS_PER_DAY, PERIODS
 
 if TYPE_CHECKING:
     from homeassistant.config_entries import ConfigEntry
@@ -36,7 +38,13 @@ if TYPE_CHECKING:
     from homeassistant.helpers.entity_platform import AddEntitiesCallback
     from homeassistant.helpers.typing import StateType
 
-TIMEZONE = pytz.timezone("Europe/Madrid")
+    from .cheapest import CheapestWindow
+    from .coordinator import TariffClock
+    from .demand import DemandTracker
+    from .meter import MeterTracker
+    from .metrics import EntryMetrics
+    from .tariff_cache import EntryTariff
+    from .upcoming import UpcomingPeriods
 
 TARIFF_TD_DESCRIPTION = SensorEntityDescription(
     key="precio_20td",
@@ -63,57 +71,244 @@ DUMMY_DESCRIPTION = SensorEntityDescription(
     native_unit_of_measurement="kWh",
 )
 
+ENERGY_COST_DESCRIPTION = SensorEntityDescription(
+    key="coste_energia",
+    icon="mdi:currency-eur",
+    name="Coste Energía",
+    device_class=SensorDeviceClass.MONETARY,
+    state_class=SensorStateClass.TOTAL,
+    native_unit_of_measurement="€",
+)
+
+PRICES_TODAY_DESCRIPTION = SensorEntityDescription(
+    key="precios_hoy",
+    icon="mdi:chart-bar",
+    name="Precios Hoy",
+    device_class=SensorDeviceClass.MONETARY,
+    native_unit_of_measurement="€/kWh",
+)
+
+NEXT_CHANGE_DESCRIPTION = SensorEntityDescription(
+    key="proximo_cambio_periodo",
+    icon="mdi:clock-fast",
+    name="Próximo Cambio de Periodo",
+    device_class=SensorDeviceClass.TIMESTAMP,
+)
+
+NEXT_PRICE_DESCRIPTION = SensorEntityDescription(
+    key="proximo_precio",
+    icon="mdi:currency-eur",
+    name="Próximo Precio",
+    device_class=SensorDeviceClass.MONETARY,
+    native_unit_of_measurement="€/kWh",
+)
+
+UPCOMING_PERIODS_DESCRIPTION = SensorEntityDescription(
+    key="proximos_periodos",
+    icon="mdi:timeline-clock",
+    name="Próximos Periodos",
+)
+
+# The day prices only change once per day, the recorder would store them again with each new period
+DAY_PRICE_ATTRIBUTES = frozenset({"max_price", "min_price", "prices", *(f"price_{hour:02d}h" for hour in range(HOURS_PER_DAY))})
+
+DEBUG_DESCRIPTION = SensorEntityDescription(
+    key="diagnostico",
+    icon="mdi:speedometer",
+    name="Diagnóstico",
+    entity_category=EntityCategory.DIAGNOSTIC,
+    entity_registry_enabled_default=False,
+)
+
+WINDOW_START_DESCRIPTION = SensorEntityDescription(
+    key="inicio_ventana_barata",
+    icon="mdi:clock-start",
+    name="Inicio Ventana Barata",
+    device_class=SensorDeviceClass.TIMESTAMP,
+)
+
+WINDOW_END_DESCRIPTION = SensorEntityDescription(
+    key="fin_ventana_barata",
+    icon="mdi:clock-end",
+    name="Fin Ventana Barata",
+    device_class=SensorDeviceClass.TIMESTAMP,
+)
+
+DEMAND_DESCRIPTION = SensorEntityDescription(
+    key="demanda_15min",
+    icon="mdi:flash",
+    name="Demanda 15 min",
+    device_class=SensorDeviceClass.POWER,
+    state_class=SensorStateClass.MEASUREMENT,
+    native_unit_of_measurement="kW",
+)
+
+EXCESS_DESCRIPTION = SensorEntityDescription(
+    key="exceso_potencia_mes",
+    icon="mdi:currency-eur",
+    name="Exceso Potencia Mes",
+    device_class=SensorDeviceClass.MONETARY,
+    native_unit_of_measurement="€",
+)
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
     """Configure and add sensors to Home Assistant."""
-    p1 = float(entry.data.get(CONF_P1, 0))
-    p2 = float(entry.data.get(CONF_P2, 0))
-    p3 = float(entry.data.get(CONF_P3, 0))
-    p4 = float(entry.data.get(CONF_P4, 0))
-    p5 = float(entry.data.get(CONF_P5, 0))
-    p6 = float(entry.data.get(CONF_P6, 0))
-    tariff = entry.data[CONF_TARIFF]
-    diary = float(entry.data.get(CONF_DIARY_COST, 0))
-
-    tariff_td = await (
-        hass.async_add_executor_job(Tariff20TD, p1, p2, p3)
-        if tariff == TARIFF_20
-        else hass.async_add_executor_job(Tariff30TD, p1, p2, p3, p4, p5, p6)
-    )
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    tariff_index = entry_data.tariff
 
+    clock = hass.data[DOMAIN][DATA_CLOCK]
     dummy_sensor = DummySensor(DUMMY_DESCRIPTION, entry.entry_id)
-    fixed_sensor = FixedSensor(FIXED_DESCRIPTION, diary, hass, entry.entry_id)
-    tariff_sensor = TariffTDSensor(TARIFF_TD_DESCRIPTION, tariff_td, hass, entry.entry_id)
-    async_add_entities([fixed_sensor, dummy_sensor, tariff_sensor])
+    prorated = bool(entry.data.get(CONF_PRORATED, False))
+    fixed_sensor = FixedSensor(FIXED_DESCRIPTION, tariff_index, clock, entry.entry_id, prorated)
+    quarter_hour = bool(entry.data.get(CONF_QUARTER_HOUR, False))
+    tariff_sensor = TariffTDSensor(TARIFF_TD_DESCRIPTION, tariff_index, clock, entry_data.metrics, entry.entry_id, quarter_hour)
+    prices_sensor = PricesTodaySensor(PRICES_TODAY_DESCRIPTION, tariff_index, clock, entry.entry_id, quarter_hour)
+    debug_sensor = DebugSensor(DEBUG_DESCRIPTION, entry_data.metrics, clock, entry.entry_id)
+    entities = [fixed_sensor, dummy_sensor, tariff_sensor, prices_sensor, debug_sensor]
+
+    boundary = QUARTER if quarter_hour else HOUR
+    entities.extend(
+        (
+            NextChangeSensor(NEXT_CHANGE_DESCRIPTION, tariff_index, entry_data.upcoming, clock, entry.entry_id, boundary),
+            NextPriceSensor(NEXT_PRICE_DESCRIPTION, tariff_index, entry_data.upcoming, clock, entry.entry_id, boundary),
+            UpcomingPeriodsSensor(UPCOMING_PERIODS_DESCRIPTION, tariff_index, entry_data.upcoming, clock, entry.entry_id, boundary),
+        )
+    )
+
+    if (meter := entry_data.meter) is not None:
+        entities.append(EnergyCostSensor(ENERGY_COST_DESCRIPTION, tariff_index, meter, entry.entry_id))
+        entities.extend(
+            PeriodEnergySensor(period_energy_description(period, monthly), meter, clock, entry.entry_id, index, monthly)
+            for monthly in (False, True)
+            for index, period in enumerate(PERIODS[: len(tariff_index.prices)])
+        )
+
+    if (demand := entry_data.demand) is not None:
+        entities.append(DemandSensor(DEMAND_DESCRIPTION, demand, entry.entry_id))
+        entities.extend(
+            MaxDemandSensor(max_demand_description(period), demand, entry.entry_id, index) for index, period in enumerate(PERIODS)
+        )
+        entities.append(ExcessPowerSensor(EXCESS_DESCRIPTION, demand, entry.entry_id))
+
+    if entry_data.window is not None:
+        entities.append(CheapestWindowSensor(WINDOW_START_DESCRIPTION, tariff_index, entry_data.window, clock, entry.entry_id, 0))
+        entities.append(CheapestWindowSensor(WINDOW_END_DESCRIPTION, tariff_index, entry_data.window, clock, entry.entry_id, 1))
+
+    async_add_entities(entities)
 
 
 class TariffTDSensor(SensorEntity):
     """Create a sensor with actual price per kWh and period from spanish Tariff TD."""
 
+    _unrecorded_attributes = DAY_PRICE_ATTRIBUTES
+
     def __init__(
         self,
         description: SensorEntityDescription,
-        tariff: TariffTD,
-        hass: HomeAssistant,
+        tariff: EntryTariff,
+        clock: TariffClock,
+        metrics: EntryMetrics,
         unique: str,
+        quarter_hour: bool = False,
     ) -> None:
         """Initialise values."""
         super().__init__()
         self._state = None
-        self._attrs: Mapping[str, Any] = {}
+        self._attrs: dict[str, Any] = {"Period": None}
+        self._day: date | None = None
+        self._version = 0
         self._attr_name = description.name
         self._attr_unique_id = f"{unique}-{description.key}"
         self.entity_description = description
         self._tariff = tariff
+        self._clock = clock
+        self._metrics = metrics
+        self._quarter_hour = quarter_hour
+
+    @property
+    @override
+    def native_value(self) -> StateType:
+        return self._state
+
+    @property
+    @override
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        return self._attrs
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        boundary = QUARTER if self._quarter_hour else HOUR
+        self.async_on_remove(self._clock.async_add_listener(boundary, self.update_price))
+        self.async_on_remove(self._tariff.async_add_listener(self.update_price))
+        self.update_price()
+
+    @property
+    @override
+    def should_poll(self) -> bool:
+        return False
 
-        async def update_price_and_schedule(time: datetime) -> None:
-            self.update_price()
-            next_update = time + timedelta(hours=1)
-            async_track_point_in_time(hass, update_price_and_schedule, next_update)
+    def update_price(self, now: datetime | None = None) -> None:
+        """Update the price each hour, or each quarter-hour."""
+        start = perf_counter()
+        if now is None:
+            now = datetime.now(tz=TIMEZONE)
+        self._state = self._tariff.get_price(now)
+        attributes_start = perf_counter()
+        self._update_attributes(now)
+        self._metrics.update_attributes.add(perf_counter() - attributes_start)
+        self._metrics.update_price.add(perf_counter() - start)
+        self._metrics.add_price_write()
+        self.async_write_ha_state()
+
+    def _update_attributes(self, now: datetime) -> None:
+        """Refresh the attribute snapshot, day prices are only rebuilt when the day or the prices change."""
+        attributes = self._attrs
+        attributes["Period"] = self._tariff.get_period(now)
+        if (today := now.date()) == self._day and self._tariff.version == self._version:
+            return
+
+        if self._quarter_hour:
+            # The 96 quarter-hour prices are packed in a single attribute
+            prices = self._tariff.get_day_quarter_prices(now)
+            attributes["max_price"] = max(prices)
+            attributes["min_price"] = min(prices)
+            attributes["prices"] = prices
+        else:
+            prices = self._tariff.get_day_prices(now)
+            attributes["max_price"] = max(prices)
+            attributes["min_price"] = min(prices)
+            for i, price in enumerate(prices):
+                attributes[f"price_{i:02d}h"] = price
+        self._day = today
+        self._version = self._tariff.version
+        # Only measured when the day prices change, Period keeps the same size
+        self._metrics.attribute_bytes = len(json_bytes(attributes))
+
+
+class PricesTodaySensor(SensorEntity):
+    """Mean price of today with the prices of each hour, or quarter-hour, packed in a single attribute."""
 
-        now = datetime.now(tz=TIMEZONE)
-        first_update = now.replace(minute=0, second=0) + timedelta(hours=1)
-        async_track_point_in_time(hass, update_price_and_schedule, first_update)
+    def __init__(
+        self,
+        description: SensorEntityDescription,
+        tariff: EntryTariff,
+        clock: TariffClock,
+        unique: str,
+        quarter_hour: bool = False,
+    ) -> None:
+        """Initialise values."""
+        super().__init__()
+        self._state: float | None = None
+        self._attrs: dict[str, Any] = {}
+        self._day: date | None = None
+        self._version = 0
+        self._attr_name = description.name
+        self._attr_unique_id = f"{unique}-{description.key}"
+        self.entity_description = description
+        self._tariff = tariff
+        self._clock = clock
+        self._quarter_hour = quarter_hour
 
     @property
     @override
@@ -123,81 +318,177 @@ class TariffTDSensor(SensorEntity):
     @property
     @override
     def extra_state_attributes(self) -> Mapping[str, Any] | None:
-        now = datetime.now(tz=TIMEZONE)
-        attributes = {"Period": self._tariff.get_period(now)}
-        prices = self._tariff.get_day_prices(datetime.now())
-        attributes["max_price"] = max(prices)
-        attributes["min_price"] = min(prices)
-        for i, price in enumerate(prices):
-            attributes[f"price_{i:02d}h"] = price
+        return self._attrs
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        # Checked each hour for the prices of a file, only written when they change
+        self.async_on_remove(self._clock.async_add_listener(HOUR, self.update_prices))
+        self.async_on_remove(self._tariff.async_add_listener(self.update_prices))
+        self.update_prices()
+
+    @property
+    @override
+    def should_poll(self) -> bool:
+        return False
+
+    def update_prices(self, now: datetime | None = None) -> None:
+        """Publish the prices of the day when the day or the prices change."""
+        now = now or datetime.now(tz=TIMEZONE)
+        if (today := now.date()) == self._day and self._tariff.version == self._version:
+            return
+
+        prices = self._tariff.get_day_quarter_prices(now) if self._quarter_hour else self._tariff.get_day_prices(now)
+        self._state = sum(prices) / len(prices)
+        self._attrs = {"max_price": max(prices), "min_price": min(prices), "prices": prices}
+        self._day = today
+        self._version = self._tariff.version
+        self.async_write_ha_state()
+
+
+class DebugSensor(SensorEntity):
+    """Runtime metrics of the entry, refreshed each hour."""
+
+    def __init__(
+        self,
+        description: SensorEntityDescription,
+        metrics: EntryMetrics,
+        clock: TariffClock,
+        unique: str,
+    ) -> None:
+        """Initialise values."""
+        super().__init__()
+        self._attr_name = description.name
+        self._attr_unique_id = f"{unique}-{description.key}"
+        self.entity_description = description
+        self._metrics = metrics
+        self._clock = clock
 
-        return attributes
+    @property
+    @override
+    def native_value(self) -> StateType:
+        return self._metrics.price_writes
+
+    @property
+    @override
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        return {
+            **self._metrics.as_dict(),
+            "next_fire": self._clock.next_fire,
+            "drift": {boundary: stats.as_dict() for boundary, stats in self._clock.drifts.items()},
+        }
 
     @override
     async def async_added_to_hass(self) -> None:
-        self.update_price()
+        self.async_on_remove(self._clock.async_add_listener(HOUR, self.refresh))
+        self.async_write_ha_state()
 
     @property
     @override
     def should_poll(self) -> bool:
         return False
 
-    def update_price(self) -> None:
-        """Update the price each hour."""
-        self._state = self._tariff.get_price(datetime.now(tz=TIMEZONE))
+    def refresh(self, _now: datetime | None = None) -> None:
+        """Publish the metrics."""
         self.async_write_ha_state()
 
 
+@dataclass
+class FixedExtraStoredData(ExtraStoredData):
+    """Time of the last fixed cost accrual to restore."""
+
+    last_accrued: datetime
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a dict representation of the data."""
+        return {"last_accrued": self.last_accrued.isoformat()}
+
+    @classmethod
+    def from_dict(cls, restored: dict[str, Any]) -> Self | None:
+        """Initialize the stored data from a dict."""
+        try:
+            last_accrued = dt_util.parse_datetime(restored["last_accrued"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        return cls(last_accrued) if last_accrued is not None else None
+
+
 class FixedSensor(SensorEntity, RestoreEntity):
     """Calculate the fixed cost per day and generate a sensor with total cost."""
 
     def __init__(
         self,
         description: SensorEntityDescription,
-        cost_per_day: float,
-        hass: HomeAssistant,
+        tariff: EntryTariff,
+        clock: TariffClock,
         unique: str,
+        prorated: bool = False,
     ) -> None:
         """Initialise values."""
         super().__init__()
-        self._state = 0
+        self._state = 0.0
         self._attrs: Mapping[str, Any] = {}
         self._attr_name = description.name
         self._attr_unique_id = f"{unique}-{description.key}"
         self.entity_description = description
-        self._cost_per_day = cost_per_day
-
-        async def update_cost_and_schedule(time: datetime) -> None:
-            self.update_price()
-            next_update = time + timedelta(days=1)
-            async_track_point_in_time(hass, update_cost_and_schedule, next_update)
-
-        now = datetime.now(tz=TIMEZONE)
-        first_update = now.replace(hour=0, minute=5, second=0) + timedelta(days=1)
-        async_track_point_in_time(hass, update_cost_and_schedule, first_update)
+        self._tariff = tariff
+        self._clock = clock
+        self._prorated = prorated
+        self._last_accrued = datetime.now(tz=TIMEZONE)
 
     @property
     @override
     def native_value(self) -> StateType:
         return self._state
 
+    @property
+    @override
+    def extra_restore_state_data(self) -> FixedExtraStoredData:
+        return FixedExtraStoredData(self._last_accrued)
+
     @override
     async def async_added_to_hass(self) -> None:
         await super().async_added_to_hass()
+        self.async_on_remove(self._clock.async_add_listener(HOUR if self._prorated else DAY, self.update_price))
+        self.async_on_remove(self._tariff.async_add_listener(self.update_cost))
         if (last_sensor_data := await self.async_get_last_state()) is not None:
-            self._state = last_sensor_data.state
-            self.async_write_ha_state()
+            try:
+                self._state = float(last_sensor_data.state)
+            except ValueError:
+                self._state = 0.0
+            if (last_extra_data := await self.async_get_last_extra_data()) is not None and (
+                restored := FixedExtraStoredData.from_dict(last_extra_data.as_dict())
+            ) is not None:
+                # Days missed while Home Assistant was stopped are added at once
+                self._last_accrued = restored.last_accrued
+                self.update_price()
+                return
+
+        self.async_write_ha_state()
 
     @property
     @override
     def should_poll(self) -> bool:
         return False
 
-    def update_price(self) -> None:
-        """Increase the total price each day."""
-        self._state = float(self._state) + self._cost_per_day
+    def update_price(self, now: datetime | None = None) -> None:
+        """Add the fixed cost accrued since the last update, each day or each hour when prorated."""
+        self._accrue(now or datetime.now(tz=TIMEZONE))
         self.async_write_ha_state()
 
+    def update_cost(self) -> None:
+        """Apply new fixed terms, the hours already elapsed keep the previous ones when prorated."""
+        if self._prorated:
+            self._accrue(datetime.now(tz=TIMEZONE))
+        self.async_write_ha_state()
+
+    def _accrue(self, now: datetime) -> None:
+        """Add the fixed cost since the last update, a catch-up of any length is two lookups per year."""
+        if now <= self._last_accrued:
+            return
+        self._state += self._tariff.fixed_costs.accrued(self._last_accrued, now, self._prorated)
+        self._last_accrued = now
+
 
 class DummySensor(SensorEntity):
     """Dummy Sensor for use in Energy Dashboard for calculate fixed cost."""
@@ -219,3 +510,477 @@ class DummySensor(SensorEntity):
     @override
     async def async_added_to_hass(self) -> None:
         self.async_write_ha_state()
+
+
+class CheapestWindowSensor(SensorEntity):
+    """Start or end of the current or next cheapest window of today and tomorrow."""
+
+    def __init__(
+        self,
+        description: SensorEntityDescription,
+        tariff: EntryTariff,
+        window: CheapestWindow,
+        clock: TariffClock,
+        unique: str,
+        edge: int,
+    ) -> None:
+        """Initialise values, edge is 0 for the start and 1 for the end."""
+        super().__init__()
+        self._state: datetime | None = None
+        self._attr_name = description.name
+        self._attr_unique_id = f"{unique}-{description.key}"
+        self.entity_description = description
+        self._tariff = tariff
+        self._window = window
+        self._clock = clock
+        self._edge = edge
+
+    @property
+    @override
+    def native_value(self) -> datetime | None:
+        return self._state
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(self._clock.async_add_listener(HOUR, self.update_window))
+        # New prices move the window at once
+        self.async_on_remove(self._tariff.async_add_listener(self.update_window))
+        self.update_window()
+
+    @property
+    @override
+    def should_poll(self) -> bool:
+        return False
+
+    def update_window(self, now: datetime | None = None) -> None:
+        """Update the window each hour, it is only recomputed when the previous one ends."""
+        self._window.update(now or datetime.now(tz=TIMEZONE))
+        window = self._window.window
+        self._state = window[self._edge] if window else None
+        self.async_write_ha_state()
+
+
+class UpcomingSensor(SensorEntity, ABC):
+    """Base of the sensors of the next periods, only written when the current period or price ends."""
+
+    def __init__(
+        self,
+        description: SensorEntityDescription,
+        tariff: EntryTariff,
+        upcoming: UpcomingPeriods,
+        clock: TariffClock,
+        unique: str,
+        boundary: str,
+    ) -> None:
+        """Initialise values."""
+        super().__init__()
+        self._state: StateType | datetime = None
+        self._attrs: dict[str, Any] = {}
+        self._attr_name = description.name
+        self._attr_unique_id = f"{unique}-{description.key}"
+        self.entity_description = description
+        self._tariff = tariff
+        self._upcoming = upcoming
+        self._clock = clock
+        self._boundary = boundary
+
+    @property
+    @override
+    def native_value(self) -> StateType | datetime:
+        return self._state
+
+    @property
+    @override
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        return self._attrs
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(self._clock.async_add_listener(self._boundary, self.update_upcoming))
+        # New prices change the next spans before the current one ends
+        self.async_on_remove(self._tariff.async_add_listener(self.update_upcoming))
+        self._upcoming.update(datetime.now(tz=TIMEZONE))
+        self._refresh()
+        self.async_write_ha_state()
+
+    @property
+    @override
+    def should_poll(self) -> bool:
+        return False
+
+    def update_upcoming(self, now: datetime | None = None) -> None:
+        """Refresh the state when the spans have moved, the first sensor of the tick or swap rebuilds them."""
+        self._upcoming.update(now or datetime.now(tz=TIMEZONE))
+        state, attrs = self._state, self._attrs
+        self._refresh()
+        if self._state != state or self._attrs != attrs:
+            self.async_write_ha_state()
+
+    @abstractmethod
+    def _refresh(self) -> None:
+        """Set the state and the attributes from the spans."""
+
+
+class NextChangeSensor(UpcomingSensor):
+    """Start of the next period."""
+
+    @override
+    def _refresh(self) -> None:
+        span = self._upcoming.next_change()
+        self._state = span.start if span else None
+        self._attrs = {"Period": span.period if span else None}
+
+
+class NextPriceSensor(UpcomingSensor):
+    """Next price different from the current one."""
+
+    @override
+    def _refresh(self) -> None:
+        span = self._upcoming.next_price()
+        self._state = span.price if span else None
+        self._attrs = {"start": span.start.isoformat() if span else None}
+
+
+class UpcomingPeriodsSensor(UpcomingSensor):
+    """Next period, with the start, period and price of the next spans."""
+
+    @override
+    def _refresh(self) -> None:
+        spans = self._upcoming.next_spans()
+        self._state = spans[0].period if spans else None
+        self._attrs = {"periods": [{"start": span.start.isoformat(), "period": span.period, "price": span.price} for span in spans]}
+
+
+@dataclass
+class EnergyCostExtraStoredData(ExtraStoredData):
+    """Accumulated cost and last meter reading to restore."""
+
+    total: float
+    subtotals: list[float]
+    last_reading: float | None
+    last_updated: datetime | None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a dict representation of the data."""
+        return {
+            "total": self.total,
+            "subtotals": self.subtotals,
+            "last_reading": self.last_reading,
+            "last_updated": self.last_updated.isoformat() if self.last_updated else None,
+        }
+
+    @classmethod
+    def from_dict(cls, restored: dict[str, Any]) -> Self | None:
+        """Initialize the stored data from a dict."""
+        try:
+            return cls(
+                float(restored["total"]),
+                [float(subtotal) for subtotal in restored["subtotals"]],
+                None if restored["last_reading"] is None else float(restored["last_reading"]),
+                dt_util.parse_datetime(restored["last_updated"]) if restored["last_updated"] else None,
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+class EnergyCostSensor(SensorEntity, RestoreEntity):
+    """Accumulate the cost of the energy read from a cumulative meter at the price of each period."""
+
+    def __init__(
+        self,
+        description: SensorEntityDescription,
+        tariff: EntryTariff,
+        meter: MeterTracker,
+        unique: str,
+    ) -> None:
+        """Initialise values."""
+        super().__init__()
+        self._state = 0.0
+        self._attr_name = description.name
+        self._attr_unique_id = f"{unique}-{description.key}"
+        self.entity_description = description
+        self._tariff = tariff
+        self._meter = meter
+        self._subtotals = [0.0] * len(tariff.prices)
+        self._attrs: dict[str, Any] = dict.fromkeys(PERIODS[: len(self._subtotals)], 0.0)
+
+    @property
+    @override
+    def native_value(self) -> StateType:
+        return self._state
+
+    @property
+    @override
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        return self._attrs
+
+    @property
+    @override
+    def extra_restore_state_data(self) -> EnergyCostExtraStoredData:
+        return EnergyCostExtraStoredData(self._state, self._subtotals, self._meter.last_reading, self._meter.last_updated)
+
+    @property
+    @override
+    def should_poll(self) -> bool:
+        return False
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        if (last_extra_data := await self.async_get_last_extra_data()) is not None and (
+            restored := EnergyCostExtraStoredData.from_dict(last_extra_data.as_dict())
+        ) is not None:
+            self._state = restored.total
+            for index, subtotal in enumerate(restored.subtotals[: len(self._subtotals)]):
+                self._subtotals[index] = subtotal
+                self._attrs[PERIODS[index]] = subtotal
+            self._meter.restore(restored.last_reading, restored.last_updated)
+
+        self.async_on_remove(self._meter.async_add_listener(self.add_energy))
+        self.async_write_ha_state()
+
+    def add_energy(self, energy: float, index: int, updated: datetime) -> None:
+        """Add the cost of the consumed energy at the price of its period."""
+        cost = energy * self._tariff.get_period_price(index, updated)
+        self._state += cost
+        self._subtotals[index] += cost
+        self._attrs[PERIODS[index]] = self._subtotals[index]
+        self.async_write_ha_state()
+
+
+def period_energy_description(period: str, monthly: bool) -> SensorEntityDescription:
+    """Return the description of the consumption counter of a period."""
+    return SensorEntityDescription(
+        key=f"consumo_{period.lower()}_{'mes' if monthly else 'hoy'}",
+        icon="mdi:lightning-bolt",
+        name=f"Consumo {period} {'Mes' if monthly else 'Hoy'}",
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL,
+        native_unit_of_measurement="kWh",
+    )
+
+
+class PeriodEnergySensor(SensorEntity, RestoreEntity):
+    """Energy consumed in a period during the current day or month."""
+
+    def __init__(
+        self,
+        description: SensorEntityDescription,
+        meter: MeterTracker,
+        clock: TariffClock,
+        unique: str,
+        index: int,
+        monthly: bool,
+    ) -> None:
+        """Initialise values."""
+        super().__init__()
+        self._state = 0.0
+        self._attr_name = description.name
+        self._attr_unique_id = f"{unique}-{description.key}"
+        self.entity_description = description
+        self._meter = meter
+        self._clock = clock
+        self._index = index
+        self._monthly = monthly
+
+    @property
+    @override
+    def native_value(self) -> StateType:
+        return self._state
+
+    @property
+    @override
+    def should_poll(self) -> bool:
+        return False
+
+    def _cycle_start(self, now: datetime) -> datetime:
+        """Return the start of the day or the month of the time."""
+        day = now.date().replace(day=1) if self._monthly else now.date()
+        return datetime.combine(day, time(), TIMEZONE)
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._attr_last_reset = self._cycle_start(datetime.now(tz=TIMEZONE))
+        if (
+            (last_state := await self.async_get_last_state()) is not None
+            and (last_reset := dt_util.parse_datetime(str(last_state.attributes.get("last_reset")))) is not None
+            and last_reset >= self._attr_last_reset
+        ):
+            try:
+                self._state = float(last_state.state)
+            except ValueError:
+                self._state = 0.0
+
+        self.async_on_remove(self._meter.async_add_listener(self.add_energy))
+        self.async_on_remove(self._clock.async_add_listener(DAY, self.reset_cycle))
+        self.async_write_ha_state()
+
+    def add_energy(self, energy: float, index: int, _updated: datetime) -> None:
+        """Add the energy consumed in the period of the counter."""
+        if index != self._index:
+            return
+        self._state += energy
+        self.async_write_ha_state()
+
+    def reset_cycle(self, now: datetime) -> None:
+        """Start a new day, or month on its first day."""
+        if self._monthly and now.day != 1:
+            return
+        self._state = 0.0
+        self._attr_last_reset = self._cycle_start(now)
+        self.async_write_ha_state()
+
+
+class DemandSensor(SensorEntity):
+    """Mean power of the last quarter-hour, updated each minute."""
+
+    def __init__(self, description: SensorEntityDescription, demand: DemandTracker, unique: str) -> None:
+        """Initialise values."""
+        super().__init__()
+        self._state: float | None = None
+        self._attr_name = description.name
+        self._attr_unique_id = f"{unique}-{description.key}"
+        self.entity_description = description
+        self._demand = demand
+
+    @property
+    @override
+    def native_value(self) -> StateType:
+        return self._state
+
+    @property
+    @override
+    def should_poll(self) -> bool:
+        return False
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self._demand.async_add_listener(self.update_demand))
+
+    def update_demand(self) -> None:
+        """Write the rolling demand if it has changed."""
+        state = round(self._demand.rolling_demand(datetime.now(tz=TIMEZONE).timestamp()), 3)
+        if state != self._state:
+            self._state = state
+            self.async_write_ha_state()
+
+
+def max_demand_description(period: str) -> SensorEntityDescription:
+    """Return the description of the maximum demand of a period."""
+    return SensorEntityDescription(
+        key=f"potencia_maxima_{period.lower()}_mes",
+        icon="mdi:flash-alert",
+        name=f"Potencia Máxima {period} Mes",
+        device_class=SensorDeviceClass.POWER,
+        native_unit_of_measurement="kW",
+    )
+
+
+@dataclass
+class MaxDemandExtraStoredData(ExtraStoredData):
+    """Month, maximum demand and squared excess of a period to restore."""
+
+    month: int
+    maximum: float
+    squared_excess: float
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a dict representation of the data."""
+        return {"month": self.month, "maximum": self.maximum, "squared_excess": self.squared_excess}
+
+    @classmethod
+    def from_dict(cls, restored: dict[str, Any]) -> Self | None:
+        """Initialize the stored data from a dict."""
+        try:
+            return cls(int(restored["month"]), float(restored["maximum"]), float(restored["squared_excess"]))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+class MaxDemandSensor(SensorEntity, RestoreEntity):
+    """Maximum quarter-hour demand of a period in the current month."""
+
+    def __init__(self, description: SensorEntityDescription, demand: DemandTracker, unique: str, index: int) -> None:
+        """Initialise values."""
+        super().__init__()
+        self._state = 0.0
+        self._attr_name = description.name
+        self._attr_unique_id = f"{unique}-{description.key}"
+        self.entity_description = description
+        self._demand = demand
+        self._index = index
+
+    @property
+    @override
+    def native_value(self) -> StateType:
+        return self._state
+
+    @property
+    @override
+    def extra_restore_state_data(self) -> MaxDemandExtraStoredData:
+        period = self._demand.periods[self._index]
+        return MaxDemandExtraStoredData(self._demand.month, period.maximum, period.squared_excess)
+
+    @property
+    @override
+    def should_poll(self) -> bool:
+        return False
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        if (last_extra_data := await self.async_get_last_extra_data()) is not None and (
+            restored := MaxDemandExtraStoredData.from_dict(last_extra_data.as_dict())
+        ) is not None:
+            # Only the maximum of the current month is kept
+            self._demand.restore(self._index, restored.month, restored.maximum, restored.squared_excess)
+
+        self._state = round(self._demand.periods[self._index].maximum, 3)
+        self.async_on_remove(self._demand.async_add_listener(self.update_maximum))
+        self.async_write_ha_state()
+
+    def update_maximum(self) -> None:
+        """Write the maximum if a quarter-hour has raised it or a new month has reset it."""
+        state = round(self._demand.periods[self._index].maximum, 3)
+        if state != self._state:
+            self._state = state
+            self.async_write_ha_state()
+
+
+class ExcessPowerSensor(SensorEntity):
+    """Penalty of the month for the quarter-hours over the contracted power."""
+
+    def __init__(self, description: SensorEntityDescription, demand: DemandTracker, unique: str) -> None:
+        """Initialise values."""
+        super().__init__()
+        self._state = 0.0
+        self._attr_name = description.name
+        self._attr_unique_id = f"{unique}-{description.key}"
+        self.entity_description = description
+        self._demand = demand
+
+    @property
+    @override
+    def native_value(self) -> StateType:
+        return self._state
+
+    @property
+    @override
+    def should_poll(self) -> bool:
+        return False
+
+    @override
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._state = round(self._demand.excess_cost(), 2)
+        self.async_on_remove(self._demand.async_add_listener(self.update_excess))
+        self.async_write_ha_state()
+
+    def update_excess(self) -> None:
+        """Write the penalty if it has changed."""
+        state = round(self._demand.excess_cost(), 2)
+        if state != self._state:
+            self._state = state
+            self.async_write_ha_state()
@@ -0,0 +1,380 @@
+"""Services of Tariff TD."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+import voluptuous as vol
+
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import ServiceCall, ServiceResponse, SupportsResponse, callback
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .calendar_store import async_get_calendar
+from .cheapest import ONE_HOUR, cheapest_slots, cheapest_window, hourly_horizon
+from .const import (
+    ATTR_CONFIG_ENTRY_ID,
+    CONF_P1,
+    CONF_P2,
+    CONF_P3,
+    CONF_P4,
+    CONF_P5,
+    CONF_P6,
+    CONF_TARIFF,
+    DOMAIN,
+    TARIFF_20,
+    TARIFF_30,
+    TIMEZONE,
+)
+from .coordinator import HOUR, QUARTER
+from .fixed_cost import FIXED_COST_KEYS, POWER_PERIODS, fixed_terms
+from .history_store import async_get_history_store
+from .period_calendar import PERIODS
+from .price_history import PriceSet
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from homeassistant.components.recorder.models import StatisticData
+    from homeassistant.core import HomeAssistant
+
+    from .period_calendar import PeriodCalendar, TariffIndex
+    from .tariff_cache import EntryTariff
+
+SERVICE_RECALCULATE_COSTS = "recalculate_costs"
+SERVICE_GET_PRICES = "get_prices"
+SERVICE_CHEAPEST_HOURS = "cheapest_hours"
+SERVICE_COMPARE_OFFERS = "compare_offers"
+SERVICE_ADD_PRICES = "add_prices"
+
+ATTR_STATISTIC_ID = "statistic_id"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_RESOLUTION = "resolution"
+ATTR_HOURS = "hours"
+ATTR_HORIZON = "horizon"
+ATTR_CONTIGUOUS = "contiguous"
+ATTR_OFFERS = "offers"
+ATTR_NAME = "name"
+
+STATISTICS_BATCH_SIZE = 1000
+# The recorder converts the statistics of sensors in Wh or MWh
+ENERGY_UNITS = {"energy": UnitOfEnergy.KILO_WATT_HOUR}
+
+MAX_PRICES_RANGE = timedelta(days=366)
+MAX_HORIZON_HOURS = 48
+RESOLUTION_SECONDS = {HOUR: 3600, QUARTER: 900}
+MAX_OFFERS = 50
+
+# Terms of the fixed costs, those not given keep their value
+FIXED_TERMS_SCHEMA = {vol.Optional(key): vol.Coerce(float) for key in FIXED_COST_KEYS}
+
+RECALCULATE_COSTS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_STATISTIC_ID): cv.string,
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+    }
+)
+
+GET_PRICES_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Required(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_RESOLUTION, default=HOUR): vol.In(RESOLUTION_SECONDS),
+    }
+)
+
+CHEAPEST_HOURS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_HOURS): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_HORIZON_HOURS)),
+        vol.Optional(ATTR_HORIZON, default=24): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_HORIZON_HOURS)),
+        vol.Optional(ATTR_CONTIGUOUS, default=True): cv.boolean,
+    }
+)
+
+OFFER_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_NAME): cv.string,
+        vol.Required(CONF_TARIFF): vol.In([TARIFF_20, TARIFF_30]),
+        vol.Required(CONF_P1): vol.Coerce(float),
+        vol.Required(CONF_P2): vol.Coerce(float),
+        vol.Required(CONF_P3): vol.Coerce(float),
+        vol.Optional(CONF_P4, default=0.0): vol.Coerce(float),
+        vol.Optional(CONF_P5, default=0.0): vol.Coerce(float),
+        vol.Optional(CONF_P6, default=0.0): vol.Coerce(float),
+        **FIXED_TERMS_SCHEMA,
+    }
+)
+
+ADD_PRICES_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Required(CONF_P1): vol.Coerce(float),
+        vol.Required(CONF_P2): vol.Coerce(float),
+        vol.Required(CONF_P3): vol.Coerce(float),
+        vol.Optional(CONF_P4, default=0.0): vol.Coerce(float),
+        vol.Optional(CONF_P5, default=0.0): vol.Coerce(float),
+        vol.Optional(CONF_P6, default=0.0): vol.Coerce(float),
+        **FIXED_TERMS_SCHEMA,
+    }
+)
+
+COMPARE_OFFERS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_STATISTIC_ID): cv.string,
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Required(ATTR_OFFERS): vol.All(cv.ensure_list, vol.Length(min=1, max=MAX_OFFERS), [OFFER_SCHEMA]),
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of Tariff TD."""
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RECALCULATE_COSTS,
+        partial(_async_recalculate_costs, hass),
+        schema=RECALCULATE_COSTS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_PRICES,
+        partial(_async_get_prices, hass),
+        schema=GET_PRICES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CHEAPEST_HOURS,
+        partial(_async_cheapest_hours, hass),
+        schema=CHEAPEST_HOURS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_COMPARE_OFFERS,
+        partial(_async_compare_offers, hass),
+        schema=COMPARE_OFFERS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(DOMAIN, SERVICE_ADD_PRICES, partial(_async_add_prices, hass), schema=ADD_PRICES_SCHEMA)
+
+
+async def _async_recalculate_costs(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Recompute the hourly cost of an energy statistic and store it as an external statistic."""
+    # Recorder and NumPy are only loaded when the service is used
+    from homeassistant.components.recorder import get_instance  # pylint: disable=import-outside-toplevel
+    from homeassistant.components.recorder.models import StatisticMetaData  # pylint: disable=import-outside-toplevel
+    from homeassistant.components.recorder.statistics import async_add_external_statistics  # pylint: disable=import-outside-toplevel
+
+    tariff = _get_tariff(hass, call.data[ATTR_CONFIG_ENTRY_ID])
+    statistic_id = call.data[ATTR_STATISTIC_ID]
+    cost_id = f"{DOMAIN}:{statistic_id.split('.', 1)[-1].replace(':', '_').lower()}_cost"
+
+    statistics, hours, cost = await get_instance(hass).async_add_executor_job(
+        _compute_costs, hass, tariff, statistic_id, cost_id, _time_range(call)
+    )
+
+    metadata = StatisticMetaData(
+        has_mean=False,
+        has_sum=True,
+        name=f"Coste {statistic_id}",
+        source=DOMAIN,
+        statistic_id=cost_id,
+        unit_of_measurement="€",
+    )
+    for first in range(0, len(statistics), STATISTICS_BATCH_SIZE):
+        async_add_external_statistics(hass, metadata, statistics[first : first + STATISTICS_BATCH_SIZE])
+
+    return {
+        ATTR_STATISTIC_ID: cost_id,
+        "hours": hours,
+        "cost": cost,
+    }
+
+
+async def _async_get_prices(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Return the timestamps, prices and periods of a date range."""
+    tariff = _get_tariff(hass, call.data[ATTR_CONFIG_ENTRY_ID])
+    start, end = _time_range(call, MAX_PRICES_RANGE)
+    return await hass.async_add_executor_job(_compute_prices, tariff, start, end, RESOLUTION_SECONDS[call.data[ATTR_RESOLUTION]])
+
+
+async def _async_cheapest_hours(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Return the cheapest contiguous window or the cheapest hours within the horizon from now."""
+    tariff = _get_tariff(hass, call.data[ATTR_CONFIG_ENTRY_ID])
+    hours = call.data[ATTR_HOURS]
+    if hours > call.data[ATTR_HORIZON]:
+        raise ServiceValidationError("The hours must not exceed the horizon")
+
+    starts, prices = hourly_horizon(tariff, dt_util.utcnow(), call.data[ATTR_HORIZON])
+    if call.data[ATTR_CONTIGUOUS]:
+        first = cheapest_window(prices, hours) or 0
+        slots = list(range(first, first + hours))
+    else:
+        slots = cheapest_slots(prices, hours)
+
+    return {
+        "start": starts[slots[0]].astimezone(TIMEZONE).isoformat(),
+        "end": (starts[slots[-1]] + ONE_HOUR).astimezone(TIMEZONE).isoformat(),
+        "hours": [starts[slot].astimezone(TIMEZONE).isoformat() for slot in slots],
+        "average_price": sum(prices[slot] for slot in slots) / hours,
+    }
+
+
+async def _async_compare_offers(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Return the cost of each offer for the consumption of an energy statistic."""
+    from homeassistant.components.recorder import get_instance  # pylint: disable=import-outside-toplevel
+
+    statistic_id = call.data[ATTR_STATISTIC_ID]
+    span = _time_range(call, MAX_PRICES_RANGE)
+    offers = call.data[ATTR_OFFERS]
+    calendars = {tariff_type: await async_get_calendar(hass, tariff_type) for tariff_type in {offer[CONF_TARIFF] for offer in offers}}
+    result = await get_instance(hass).async_add_executor_job(_compute_offers, hass, calendars, statistic_id, span, offers)
+    for offer, offer_result in zip(offers, result[ATTR_OFFERS], strict=True):
+        offer_result[ATTR_NAME] = offer.get(ATTR_NAME, "")
+        offer_result[CONF_TARIFF] = offer[CONF_TARIFF]
+
+    cheapest = min(range(len(offers)), key=lambda index: result[ATTR_OFFERS][index]["total"])
+    return {ATTR_STATISTIC_ID: statistic_id, **result, "cheapest": cheapest}
+
+
+async def _async_add_prices(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Record the prices that took effect at a past date, the costs after it are computed with them."""
+    entry_id = call.data[ATTR_CONFIG_ENTRY_ID]
+    tariff = _get_tariff(hass, entry_id)
+    start = dt_util.as_utc(call.data[ATTR_START])
+    if start > dt_util.utcnow():
+        raise ServiceValidationError("The prices must have already taken effect")
+
+    timestamp = start.timestamp()
+    history = tariff.history
+    keys = (CONF_P1, CONF_P2, CONF_P3, CONF_P4, CONF_P5, CONF_P6)[: len(tariff.prices)]
+    prices = tuple(call.data[key] for key in keys)
+    fixed = fixed_terms({**history.at(timestamp).fixed.as_dict(), **call.data}, POWER_PERIODS[tariff.calendar.tariff_type])
+    history = history.add(PriceSet(timestamp, prices, fixed))
+    (await async_get_history_store(hass)).async_set(entry_id, history)
+
+    tariff.async_set_history(history)
+    if history.current.start == timestamp and (entry := hass.config_entries.async_get_entry(entry_id)) is not None:
+        # The latest prices are also the ones of the entry, its update listener swaps them in place
+        changes = {**dict(zip(keys, prices, strict=True)), **fixed.as_dict()}
+        hass.config_entries.async_update_entry(entry, data={**entry.data, **changes}, options={**entry.options, **changes})
+
+
+def _time_range(call: ServiceCall, limit: timedelta | None = None) -> tuple[datetime, datetime]:
+    """Return the UTC start and end of a call, now if it has no end, checking that the range is not longer than the limit."""
+    start = dt_util.as_utc(call.data[ATTR_START])
+    end = dt_util.as_utc(call.data[ATTR_END]) if ATTR_END in call.data else dt_util.utcnow()
+    if limit is not None and not start < end <= start + limit:
+        raise ServiceValidationError(f"The end must be after the start and within {limit.days} days")
+    return start, end
+
+
+def _get_tariff(hass: HomeAssistant, entry_id: str) -> EntryTariff:
+    """Return the tariff of a loaded config entry."""
+    if (entry_data := hass.data.get(DOMAIN, {}).get(entry_id)) is None:
+        raise ServiceValidationError(f"Config entry {entry_id} is not a loaded Tariff TD entry")
+    return entry_data.tariff
+
+
+def _compute_costs(
+    hass: HomeAssistant, tariff: TariffIndex, statistic_id: str, cost_id: str, span: tuple[datetime, datetime]
+) -> tuple[list[StatisticData], int, float]:
+    """Load the hourly energy statistics of the span and compute the cost of each hour in one pass."""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    from .backfill import hourly_costs  # pylint: disable=import-outside-toplevel
+
+    start = span[0]
+    timestamps, energy = _load_energy(hass, statistic_id, span)
+    if not timestamps.size:
+        return [], 0, 0.0
+
+    costs = hourly_costs(tariff, timestamps, energy)
+    base = _cost_sum(hass, cost_id, start - timedelta(hours=1), start, 0.0)
+    sums = np.cumsum(costs) + base
+
+    statistics: list[StatisticData] = [
+        {"start": dt_util.utc_from_timestamp(timestamp), "state": total, "sum": total}
+        for timestamp, total in zip(timestamps.tolist(), sums.tolist(), strict=True)
+    ]
+    after = dt_util.utc_from_timestamp(timestamps[-1]) + timedelta(hours=1)
+    statistics.extend(_shifted_rows(hass, cost_id, after, float(sums[-1]) - _cost_sum(hass, cost_id, start, after, base)))
+    return statistics, len(timestamps), float(costs.sum())
+
+
+def _cost_sum(hass: HomeAssistant, cost_id: str, start: datetime, end: datetime, default: float) -> float:
+    """Return the sum of the last cost row stored in a range, the default if there is none."""
+    from homeassistant.components.recorder.statistics import statistics_during_period  # pylint: disable=import-outside-toplevel
+
+    rows = statistics_during_period(hass, start, end, {cost_id}, "hour", None, {"sum"}).get(cost_id, [])
+    return (rows[-1].get("sum") or 0.0) if rows else default
+
+
+def _shifted_rows(hass: HomeAssistant, cost_id: str, after: datetime, shift: float) -> list[StatisticData]:
+    """Return the cost rows from after shifted by the change of the total, so their sums keep growing from the new one."""
+    from homeassistant.components.recorder.statistics import statistics_during_period  # pylint: disable=import-outside-toplevel
+
+    statistics: list[StatisticData] = []
+    if shift:
+        for row in statistics_during_period(hass, after, None, {cost_id}, "hour", None, {"sum"}).get(cost_id, []):
+            total = (row.get("sum") or 0.0) + shift
+            statistics.append({"start": dt_util.utc_from_timestamp(row["start"]), "state": total, "sum": total})
+    return statistics
+
+
+def _compute_prices(tariff: TariffIndex, start: datetime, end: datetime, step: int) -> dict[str, Any]:
+    """Build the columns of prices of the range, a month at a time."""
+    from .backfill import iter_prices  # pylint: disable=import-outside-toplevel
+
+    timestamps: list[str] = []
+    prices: list[float] = []
+    periods: list[str] = []
+    first = int(start.timestamp()) // step * step
+    for chunk_timestamps, chunk_indexes, chunk_prices in iter_prices(tariff, first, int(end.timestamp()), step):
+        timestamps.extend(datetime.fromtimestamp(timestamp, TIMEZONE).isoformat() for timestamp in chunk_timestamps.tolist())
+        periods.extend(PERIODS[index] for index in chunk_indexes.tolist())
+        prices.extend(chunk_prices.tolist())
+
+    return {"timestamps": timestamps, "prices": prices, "periods": periods}
+
+
+def _load_energy(hass: HomeAssistant, statistic_id: str, span: tuple[datetime, datetime]) -> tuple[np.ndarray, np.ndarray]:
+    """Load the start timestamp and the energy in kWh of each hour of a statistic within the span."""
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    from homeassistant.components.recorder.statistics import statistics_during_period  # pylint: disable=import-outside-toplevel
+
+    rows: list[dict[str, Any]] = statistics_during_period(hass, *span, {statistic_id}, "hour", ENERGY_UNITS, {"change"}).get(
+        statistic_id, []
+    )
+    timestamps = np.fromiter((row["start"] for row in rows), dtype=np.float64, count=len(rows))
+    energy = np.fromiter((row.get("change") or 0.0 for row in rows), dtype=np.float64, count=len(rows))
+    return timestamps, energy
+
+
+def _compute_offers(
+    hass: HomeAssistant,
+    calendars: dict[str, PeriodCalendar],
+    statistic_id: str,
+    span: tuple[datetime, datetime],
+    offers: list[dict[str, Any]],
+) -> dict[str, Any]:
+    """Load the hourly energy statistics of the span once and compute the cost of every offer."""
+    from .backfill import compare_offers  # pylint: disable=import-outside-toplevel
+
+    timestamps, energy = _load_energy(hass, statistic_id, span)
+    return compare_offers(calendars, timestamps, energy, (int(span[0].timestamp()), int(span[1].timestamp())), offers)
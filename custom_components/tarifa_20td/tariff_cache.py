@@ -0,0 +1,208 @@
+"""Tariff indexes shared by the config entries with the same tariff."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from typing import TYPE_CHECKING, Any
+
+from typing_extensions import override
+
+from homeassistant.core import callback
+
+from .calendar_store import async_get_calendar
+from .const import CONF_PRICE_FILE, CONF_TARIFF, DATA_CLOCK, DATA_TARIFFS, DOMAIN, TIMEZONE
+from .coordinator import QUARTER
+from .fixed_cost import FixedCosts
+from .period_calendar import QUARTERS_PER_HOUR, TariffIndex, entry_prices
+from .price_file import PriceFile, PriceFileIndex
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Mapping
+
+    from homeassistant.core import CALLBACK_TYPE, HomeAssistant
+
+    from .price_history import PriceHistory
+
+TariffKey = tuple[str, tuple[float, ...], str | None]
+
+
+@dataclass
+class SharedTariff:
+    """Tariff index with the number of entries using it."""
+
+    tariff: TariffIndex
+    references: int = 0
+    unsubs: list[CALLBACK_TYPE] = field(default_factory=list)
+
+
+class EntryTariff(TariffIndex):
+    """Tariff of a config entry, the shared index behind it is swapped in place when the prices change.
+
+    The shared index has the current prices, the dates before the last price set use the prices of the history.
+    """
+
+    def __init__(self, shared: TariffIndex, history: PriceHistory) -> None:
+        """Initialise values."""
+        super().__init__(shared.calendar, shared.prices, history)
+        self._shared = shared
+        self._price_file = shared.price_file
+        self._fixed_costs = FixedCosts(history)
+        self._version = 0
+        self._shared_version = shared.version
+        self._listeners: list[Callable[[], None]] = []
+
+    @property
+    def shared(self) -> TariffIndex:
+        """Return the shared index."""
+        return self._shared
+
+    @property
+    @override
+    def price_file(self) -> PriceFile | None:
+        """Return the file with the real prices of the shared index, None if it has none."""
+        return self._price_file
+
+    @property
+    @override
+    def history(self) -> PriceHistory:
+        """Return the prices in force over time."""
+        return self._history
+
+    @property
+    def fixed_costs(self) -> FixedCosts:
+        """Return the fixed cost of each day."""
+        return self._fixed_costs
+
+    @property
+    @override
+    def version(self) -> int:
+        """Return a number that changes each time the prices of the shared index change or it is swapped."""
+        if self._shared.version != self._shared_version:
+            self._shared_version = self._shared.version
+            self._version += 1
+        return self._version
+
+    @override
+    def get_period_price(self, index: int, moment: datetime) -> float:
+        """Return the electricity price at a moment whose period index is already known, with the prices in force at it."""
+        timestamp = moment.timestamp()
+        price_set = self._history.at(timestamp)
+        if price_set is self._history.current:
+            return self._shared.get_period_price(index, moment)
+        # The file has the real prices of the past too
+        if self._price_file is not None and (price := self._price_file.get(timestamp)) is not None:
+            return price
+        return price_set.prices[index]
+
+    @override
+    def get_day_prices(self, moment: datetime) -> list[float]:
+        """Return the electricity prices for each hour of the day of the moment, cached by the shared index for current prices."""
+        if self._is_current_day(moment):
+            return self._shared.get_day_prices(moment)
+        return self._cached_day(moment, 1, lambda day: self._history_day_prices(day, 1))
+
+    @override
+    def get_day_quarter_prices(self, moment: datetime) -> list[float]:
+        """Return the electricity prices for each quarter-hour of the day of the moment, cached by the shared index for current prices."""
+        if self._is_current_day(moment):
+            return self._shared.get_day_quarter_prices(moment)
+        return self._cached_day(moment, QUARTERS_PER_HOUR, lambda day: self._history_day_prices(day, QUARTERS_PER_HOUR))
+
+    def _is_current_day(self, moment: datetime) -> bool:
+        """Return if the whole day of the moment has the current prices."""
+        return datetime.combine(moment.date(), time(), TIMEZONE).timestamp() >= self._history.current.start
+
+    def _history_day_prices(self, moment: datetime, slots: int) -> list[float]:
+        """Return the prices of each wall-clock slot of the day of the moment, with the prices in force at each slot."""
+        midnight = datetime.combine(moment.date(), time(), TIMEZONE)
+        step = timedelta(hours=1) / slots
+        indexes = [index for index in self._calendar.day_periods(moment) for _ in range(slots)]
+        return [self.get_period_price(index, midnight + step * slot) for slot, index in enumerate(indexes)]
+
+    @callback
+    def async_add_listener(self, action: Callable[[], None]) -> CALLBACK_TYPE:
+        """Call the action after the tariff is swapped, return a callback to remove it."""
+        self._listeners.append(action)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(action)
+
+        return remove_listener
+
+    @callback
+    def async_set_history(self, history: PriceHistory) -> None:
+        """Replace the price history with one that has the same current prices."""
+        self._history = history
+        self._fixed_costs = FixedCosts(history)
+        # The days before the current prices were built with the previous history
+        self._day_cache.clear()
+
+    @callback
+    def async_swap(self, shared: TariffIndex, history: PriceHistory) -> None:
+        """Replace the shared index and the price history, then let the entities refresh."""
+        self._shared = shared
+        self._price_file = shared.price_file
+        self._calendar = shared.calendar
+        self._prices = shared.prices
+        self._history = history
+        self._fixed_costs = FixedCosts(history)
+        self._shared_version = shared.version
+        self._version += 1
+        for action in list(self._listeners):
+            action()
+
+
+def tariff_key(data: Mapping[str, Any]) -> TariffKey:
+    """Return the key of the tariff of a config entry, its type, prices and price file."""
+    return data[CONF_TARIFF], tuple(entry_prices(data)), data.get(CONF_PRICE_FILE) or None
+
+
+async def async_acquire_tariff(hass: HomeAssistant, data: Mapping[str, Any]) -> TariffIndex:
+    """Return the shared tariff index of the data, the entries with the same tariff get the same one."""
+    tariffs: dict[TariffKey, SharedTariff] = hass.data[DOMAIN].setdefault(DATA_TARIFFS, {})
+    key = tariff_key(data)
+    if (shared := tariffs.get(key)) is None:
+        tariff_type, prices, path = key
+        calendar = await async_get_calendar(hass, tariff_type)
+        # Another entry may have created it while waiting for the calendar
+        if (shared := tariffs.get(key)) is None:
+            if path is None:
+                shared = tariffs[key] = SharedTariff(TariffIndex(calendar, prices))
+            else:
+                price_file = PriceFile(path)
+                shared = tariffs[key] = SharedTariff(PriceFileIndex(calendar, prices, price_file))
+                await hass.async_add_executor_job(price_file.refresh)
+                # Only a stat each quarter-hour, the file is read again when its mtime changes
+                shared.unsubs.append(
+                    hass.data[DOMAIN][DATA_CLOCK].async_add_listener(
+                        QUARTER,
+                        lambda _now: hass.async_create_background_task(_async_refresh(hass, price_file), f"{DOMAIN} price file {path}"),
+                    )
+                )
+    shared.references += 1
+    return shared.tariff
+
+
+async def _async_refresh(hass: HomeAssistant, price_file: PriceFile) -> None:
+    """Read the changes of the price file in the executor."""
+    await hass.async_add_executor_job(price_file.refresh)
+
+
+def async_release_tariff(hass: HomeAssistant, tariff: TariffIndex) -> None:
+    """Release a tariff index, it is dropped when no entry uses it."""
+    tariffs: dict[TariffKey, SharedTariff] = hass.data[DOMAIN].get(DATA_TARIFFS, {})
+    for key, shared in tariffs.items():
+        if shared.tariff is tariff:
+            shared.references -= 1
+            if shared.references <= 0:
+                for unsub in shared.unsubs:
+                    unsub()
+                del tariffs[key]
+            return
+
+
+async def async_create_entry_tariff(hass: HomeAssistant, data: Mapping[str, Any], history: PriceHistory) -> EntryTariff:
+    """Return the tariff of a config entry backed by its shared index and its price history."""
+    return EntryTariff(await async_acquire_tariff(hass, data), history)
@@ -0,0 +1,82 @@
+"""Upcoming periods and prices of a Tariff TD."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import TYPE_CHECKING
+
+from .const import TIMEZONE
+
+if TYPE_CHECKING:
+    from .period_calendar import TariffIndex
+
+UPCOMING_PERIODS = 6
+
+# Longest scan for the next periods, a long weekend is only P3 (or P6) for days
+MAX_SCAN = timedelta(days=14)
+
+
+@dataclass(frozen=True)
+class PeriodSpan:
+    """Span of time with the same period and price."""
+
+    start: datetime
+    period: str
+    price: float
+
+
+def period_spans(tariff: TariffIndex, now: datetime, step: timedelta, count: int) -> list[PeriodSpan]:
+    """Return the current span and at least count following ones, up to the next period change."""
+    seconds = int(step.total_seconds())
+    # Real UTC steps, so the repeated and skipped hours of DST changes are handled
+    slot = datetime.fromtimestamp(int(now.timestamp()) // seconds * seconds, UTC)
+    end = slot + MAX_SCAN
+
+    spans: list[PeriodSpan] = []
+    period_changed = False
+    while slot < end and (len(spans) <= count or not period_changed):
+        local = slot.astimezone(TIMEZONE)
+        period, price = tariff.get_period(local), tariff.get_price(local)
+        if not spans or spans[-1].period != period or spans[-1].price != price:
+            period_changed = period_changed or (bool(spans) and spans[0].period != period)
+            spans.append(PeriodSpan(local, period, price))
+        slot += step
+    return spans
+
+
+class UpcomingPeriods:
+    """Current and next spans of an entry, only rebuilt when the current one ends or the prices change."""
+
+    def __init__(self, tariff: TariffIndex, step: timedelta, count: int = UPCOMING_PERIODS) -> None:
+        """Initialise values."""
+        self._tariff = tariff
+        self._step = step
+        self._count = count
+        self._spans: list[PeriodSpan] = []
+        self._version = 0
+
+    @property
+    def spans(self) -> list[PeriodSpan]:
+        """Return the current span followed by the next ones."""
+        return self._spans
+
+    def next_spans(self) -> list[PeriodSpan]:
+        """Return the count spans after the current one."""
+        return self._spans[1 : self._count + 1]
+
+    def next_change(self) -> PeriodSpan | None:
+        """Return the first span with a different period than the current one."""
+        return next((span for span in self._spans[1:] if span.period != self._spans[0].period), None)
+
+    def next_price(self) -> PeriodSpan | None:
+        """Return the first span with a different price than the current one."""
+        return next((span for span in self._spans[1:] if span.price != self._spans[0].price), None)
+
+    def update(self, now: datetime) -> bool:
+        """Move to the span of the time, return if the spans have changed."""
+        if len(self._spans) > 1 and self._spans[0].start <= now < self._spans[1].start and self._tariff.version == self._version:
+            return False
+        self._spans = period_spans(self._tariff, now, self._step, self._count)
+        self._version = self._tariff.version
+        return True
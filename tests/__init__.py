@@ -0,0 +1 @@
+"""Tests for Tariff TD."""
@@ -0,0 +1 @@
+"""Benchmarks of the hot paths of Tariff TD."""
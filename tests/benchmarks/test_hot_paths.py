@@ -0,0 +1,139 @@
+"""Benchmarks of the state updates and the attributes of the sensors."""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from itertools import cycle
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from pytest_homeassistant_custom_component.common import mock_restore_cache_with_extra_data
+
+from homeassistant.core import State
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.json import json_bytes
+
+from custom_components.tarifa_20td.const import CONF_PRORATED, CONF_QUARTER_HOUR, DOMAIN, TIMEZONE
+
+from ..common import ENTRY_20, ENTRY_30, async_remove_entries, async_setup_entries, entry_entity, mock_entries, mock_entry
+
+if TYPE_CHECKING:
+    import asyncio
+
+    from pytest_benchmark.fixture import BenchmarkFixture
+    from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+    from homeassistant.core import HomeAssistant
+
+TARIFFS = pytest.mark.parametrize("data", [ENTRY_20, ENTRY_30], ids=["2.0", "3.0"])
+RESOLUTIONS = pytest.mark.parametrize("quarter_hour", [False, True], ids=["hourly", "quarter"])
+
+
+def noons(year: int) -> list[datetime]:
+    """Return the local noon of every day of the year."""
+    first = date(year, 1, 1)
+    return [datetime.combine(first + timedelta(days=day), time(12), TIMEZONE) for day in range((date(year + 1, 1, 1) - first).days)]
+
+
+@pytest.mark.benchmark(group="update_price")
+@RESOLUTIONS
+@TARIFFS
+def test_update_price(
+    hass: HomeAssistant, event_loop: asyncio.AbstractEventLoop, benchmark: BenchmarkFixture, data: dict[str, Any], quarter_hour: bool
+) -> None:
+    """Update the price within the same day, only the period is refreshed."""
+    entry = mock_entry(data, **{CONF_QUARTER_HOUR: quarter_hour})
+    event_loop.run_until_complete(async_setup_entries(hass, [entry]))
+    sensor = entry_entity(hass, entry, "precio_20td")
+
+    benchmark(sensor.update_price)
+
+
+@pytest.mark.benchmark(group="update_price")
+@RESOLUTIONS
+@TARIFFS
+def test_update_price_new_day(
+    hass: HomeAssistant, event_loop: asyncio.AbstractEventLoop, benchmark: BenchmarkFixture, data: dict[str, Any], quarter_hour: bool
+) -> None:
+    """Update the price on a different day each time, the day prices are rebuilt."""
+    entry = mock_entry(data, **{CONF_QUARTER_HOUR: quarter_hour})
+    event_loop.run_until_complete(async_setup_entries(hass, [entry]))
+    sensor = entry_entity(hass, entry, "precio_20td")
+    days = cycle(noons(datetime.now(tz=TIMEZONE).year))
+
+    benchmark(lambda: sensor.update_price(next(days)))
+
+
+@pytest.mark.benchmark(group="update_price_entries")
+@pytest.mark.parametrize("count", [1, 10, 100])
+def test_update_price_entries(hass: HomeAssistant, event_loop: asyncio.AbstractEventLoop, benchmark: BenchmarkFixture, count: int) -> None:
+    """Update the price of every entry, as the hourly tick does."""
+    entries = mock_entries(ENTRY_20, count)
+    event_loop.run_until_complete(async_setup_entries(hass, entries))
+    sensors = [entry_entity(hass, entry, "precio_20td") for entry in entries]
+    now = datetime.now(tz=TIMEZONE)
+
+    def update() -> None:
+        for sensor in sensors:
+            sensor.update_price(now)
+
+    benchmark(update)
+
+
+@pytest.mark.benchmark(group="attributes")
+@RESOLUTIONS
+@pytest.mark.parametrize("key", ["precio_20td", "precios_hoy", "proximos_periodos"])
+def test_attributes(
+    hass: HomeAssistant, event_loop: asyncio.AbstractEventLoop, benchmark: BenchmarkFixture, key: str, quarter_hour: bool
+) -> None:
+    """Render the attributes of a sensor as the state machine and the recorder do, with the stored sizes."""
+    entry = mock_entry(ENTRY_20, **{CONF_QUARTER_HOUR: quarter_hour})
+    event_loop.run_until_complete(async_setup_entries(hass, [entry]))
+    sensor = entry_entity(hass, entry, key)
+    state = hass.states.get(sensor.entity_id)
+    assert state is not None and state.state_info is not None
+
+    benchmark(lambda: json_bytes(sensor.extra_state_attributes))
+
+    unrecorded = state.state_info["unrecorded_attributes"]
+    benchmark.extra_info["attribute_bytes"] = len(json_bytes(state.attributes))
+    benchmark.extra_info["recorded_bytes"] = len(
+        json_bytes({name: value for name, value in state.attributes.items() if name not in unrecorded})
+    )
+
+
+@pytest.mark.benchmark(group="fixed_restore")
+@pytest.mark.parametrize("days", [1, 365])
+@pytest.mark.parametrize("prorated", [False, True], ids=["daily", "prorated"])
+def test_fixed_restore(
+    hass: HomeAssistant, event_loop: asyncio.AbstractEventLoop, benchmark: BenchmarkFixture, prorated: bool, days: int
+) -> None:
+    """Set up an entry whose fixed cost was last accrued some days ago, the missed days are added at once."""
+    entries: list[MockConfigEntry] = []
+    entity_ids: list[str] = []
+
+    def setup() -> None:
+        entry = mock_entry(ENTRY_20, **{CONF_PRORATED: prorated})
+        entry.add_to_hass(hass)
+        entity_id = (
+            er.async_get(hass)
+            .async_get_or_create("sensor", DOMAIN, f"{entry.entry_id}-coste_fijo_20td", config_entry=entry, suggested_object_id="fijo")
+            .entity_id
+        )
+        last_accrued = datetime.now(tz=TIMEZONE) - timedelta(days=days)
+        mock_restore_cache_with_extra_data(hass, [(State(entity_id, "10.0"), {"last_accrued": last_accrued.isoformat()})])
+        entries[:] = [entry]
+        entity_ids[:] = [entity_id]
+
+    def teardown() -> None:
+        state = hass.states.get(entity_ids[0])
+        assert state is not None and float(state.state) > 10.0
+        event_loop.run_until_complete(async_remove_entries(hass, entries))
+
+    benchmark.pedantic(
+        lambda: event_loop.run_until_complete(async_setup_entries(hass, entries)),
+        setup=setup,
+        teardown=teardown,
+        rounds=10,
+        warmup_rounds=1,
+    )
@@ -0,0 +1,76 @@
+"""Benchmarks of the import of the integration and of the resolution of its calendars."""
+
+from __future__ import annotations
+
+import importlib
+import json
+from pathlib import Path
+import subprocess
+import sys
+from typing import TYPE_CHECKING
+
+import pytest
+
+import custom_components
+from custom_components.tarifa_20td.const import TARIFF_20, TARIFF_30
+from custom_components.tarifa_20td.period_calendar import PeriodCalendar, decode_year, encode_year
+
+if TYPE_CHECKING:
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+PACKAGE = "custom_components.tarifa_20td"
+
+# Modules loaded by Home Assistant when the integration is set up
+MODULES = [PACKAGE, f"{PACKAGE}.config_flow", f"{PACKAGE}.sensor", f"{PACKAGE}.binary_sensor", f"{PACKAGE}.diagnostics"]
+
+# Only needed to resolve a missing year or by the services
+DEFERRED = ["tariff_td", "holidays", "numpy", "pytz"]
+
+TARIFFS = pytest.mark.parametrize("tariff_type", [TARIFF_20, TARIFF_30], ids=["2.0", "3.0"])
+
+
+def _purge() -> None:
+    for name in [name for name in sys.modules if name == PACKAGE or name.startswith(f"{PACKAGE}.")]:
+        del sys.modules[name]
+
+
+@pytest.mark.benchmark(group="import")
+def test_import(benchmark: BenchmarkFixture) -> None:
+    """Import the integration and its platforms with Home Assistant already loaded."""
+    saved = {name: module for name, module in sys.modules.items() if name == PACKAGE or name.startswith(f"{PACKAGE}.")}
+    try:
+        benchmark.pedantic(lambda: [importlib.import_module(module) for module in MODULES], setup=_purge, rounds=20)
+    finally:
+        # The other tests keep the classes of the modules imported first
+        _purge()
+        sys.modules.update(saved)
+        custom_components.tarifa_20td = saved[PACKAGE]
+
+
+def test_import_defers_engine() -> None:
+    """Importing the integration and its platforms does not load the pricing engine."""
+    code = (
+        "import importlib, json, sys\n"
+        f"for module in {MODULES!r}:\n"
+        "    importlib.import_module(module)\n"
+        f"print(json.dumps([module for module in {DEFERRED!r} if module in sys.modules]))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, cwd=Path(__file__).parents[2], text=True)
+    assert json.loads(result.stdout) == []
+
+
+@pytest.mark.benchmark(group="calendar")
+@TARIFFS
+def test_build_year(benchmark: BenchmarkFixture, tariff_type: str) -> None:
+    """Resolve the periods of a year with tariff_td, done once per year and tariff type."""
+    benchmark.pedantic(lambda: PeriodCalendar(tariff_type).year(2030), rounds=5, warmup_rounds=1)
+
+
+@pytest.mark.benchmark(group="calendar")
+@TARIFFS
+def test_decode_year(benchmark: BenchmarkFixture, tariff_type: str) -> None:
+    """Unpack a stored year, done at each startup instead of resolving it."""
+    packed = encode_year(PeriodCalendar(tariff_type).year(2030))
+    benchmark.extra_info["stored_bytes"] = len(packed)
+
+    benchmark(decode_year, 2030, packed)
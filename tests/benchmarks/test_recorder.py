@@ -0,0 +1,101 @@
+"""Benchmark of the rows and bytes written to the recorder by the price sensors."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+from pytest_homeassistant_custom_component.components.recorder.common import async_wait_recording_done
+from sqlalchemy import func
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.db_schema import StateAttributes, States
+from homeassistant.components.recorder.util import session_scope
+
+from custom_components.tarifa_20td.const import CONF_PRICE_FILE, TIMEZONE
+from custom_components.tarifa_20td.sensor import TariffTDSensor
+
+from ..common import ENTRY_20, async_setup_entries, entry_entity, mock_entry
+
+if TYPE_CHECKING:
+    import asyncio
+    from pathlib import Path
+
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+    from homeassistant.components.recorder import Recorder
+    from homeassistant.core import HomeAssistant
+
+HOURS = 7 * 24
+HOURS_PER_YEAR = 365 * 24
+
+# Monday
+START = datetime(2024, 3, 4, tzinfo=TIMEZONE)
+
+
+class RecordedTariffTDSensor(TariffTDSensor):
+    """Price sensor recording the day prices with every state, as before they were excluded."""
+
+    _unrecorded_attributes = frozenset()
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(recorder_mock: Recorder, enable_custom_integrations: None) -> None:  # pylint: disable=unused-argument
+    """Start the recorder before Home Assistant."""
+
+
+def _count(hass: HomeAssistant) -> dict[str, int]:
+    """Return the rows of the states and attributes tables and the bytes of the attributes."""
+    with session_scope(hass=hass, read_only=True) as session:
+        return {
+            "states": session.query(func.count(States.state_id)).scalar(),  # pylint: disable=not-callable
+            "state_attributes": session.query(func.count(StateAttributes.attributes_id)).scalar(),  # pylint: disable=not-callable
+            "attribute_bytes": session.query(func.coalesce(func.sum(func.length(StateAttributes.shared_attrs)), 0)).scalar(),
+        }
+
+
+def write_price_file(path: Path) -> str:
+    """Write a CSV with a different price each hour of the week, as indexed contracts have."""
+    path.write_text("".join(f"{(START + timedelta(hours=hour)).isoformat()};{0.1 + hour / 1000:.3f}\n" for hour in range(HOURS)))
+    return str(path)
+
+
+@pytest.mark.benchmark(group="recorder")
+@pytest.mark.parametrize("indexed", [False, True], ids=["fixed_prices", "indexed_prices"])
+@pytest.mark.parametrize("recorded", [True, False], ids=["day_prices_recorded", "day_prices_unrecorded"])
+def test_recorder_week(
+    hass: HomeAssistant,
+    event_loop: asyncio.AbstractEventLoop,
+    benchmark: BenchmarkFixture,
+    tmp_path: Path,
+    recorded: bool,
+    indexed: bool,
+) -> None:
+    """Write a week of hourly prices and measure what the recorder stores, extrapolated to a year.
+
+    States whose value and attributes do not change are not stored, so with fixed prices only the period changes add rows.
+    """
+    entry = mock_entry(ENTRY_20, **({CONF_PRICE_FILE: write_price_file(tmp_path / "precios.csv")} if indexed else {}))
+    with patch("custom_components.tarifa_20td.sensor.TariffTDSensor", RecordedTariffTDSensor if recorded else TariffTDSensor):
+        event_loop.run_until_complete(async_setup_entries(hass, [entry]))
+    price = entry_entity(hass, entry, "precio_20td")
+    prices_today = entry_entity(hass, entry, "precios_hoy")
+
+    async def _async_week() -> dict[str, Any]:
+        await async_wait_recording_done(hass)
+        before = await get_instance(hass).async_add_executor_job(_count, hass)
+        for hour in range(HOURS):
+            now = START + timedelta(hours=hour)
+            price.update_price(now)
+            prices_today.update_prices(now)
+        await async_wait_recording_done(hass)
+        after = await get_instance(hass).async_add_executor_job(_count, hass)
+        return {key: after[key] - before[key] for key in after}
+
+    week = benchmark.pedantic(lambda: event_loop.run_until_complete(_async_week()), rounds=1)
+
+    benchmark.extra_info.update(week)
+    benchmark.extra_info.update({f"{key}_per_year": value * HOURS_PER_YEAR // HOURS for key, value in week.items()})
+    assert week["states"] >= (HOURS if indexed else 1)
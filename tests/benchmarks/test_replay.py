@@ -0,0 +1,202 @@
+"""Replay of meter readings through the sensors with a fake clock, checked against the offline engine and tariff-td.
+
+Two weeks of readings are generated unless a CSV in the format of the invoice command is given with `--replay-csv`, and
+`--replay-days 365` replays a whole year.
+"""
+
+from __future__ import annotations
+
+from datetime import UTC, date, datetime, timedelta
+import random
+from typing import TYPE_CHECKING, Any
+
+from freezegun import api as freezegun_api
+import pytest
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+from pytest_homeassistant_custom_component.components.recorder.common import async_wait_recording_done
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.const import EVENT_STATE_CHANGED, UnitOfEnergy
+from homeassistant.core import callback
+
+from custom_components.tarifa_20td.const import CONF_ENERGY_ENTITY, CONF_TARIFF, DATA_CLOCK, DOMAIN, TARIFF_20, TIMEZONE
+from custom_components.tarifa_20td.coordinator import DAY, HOUR, QUARTER_MINUTES
+from custom_components.tarifa_20td.invoice import Reading, compute_invoices, read_csv
+
+from ..common import ENTRY_20, ENTRY_30, async_setup_entries, entry_entity_id, mock_entry
+from ..test_period_calendar import reference
+from .test_recorder import _count
+
+if TYPE_CHECKING:
+    import asyncio
+    from collections.abc import Iterator
+
+    from freezegun.api import FrozenDateTimeFactory
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+    from homeassistant.components.recorder import Recorder
+    from homeassistant.core import Event, HomeAssistant
+
+ENERGY_ENTITY = "sensor.energia_consumida"
+ENERGY_ATTRIBUTES = {"unit_of_measurement": UnitOfEnergy.KILO_WATT_HOUR, "device_class": "energy", "state_class": "total_increasing"}
+
+# The 25 hour day of the autumn DST change and All Saints on a Friday, a year has both DST changes and every holiday
+START = date(2024, 10, 21)
+DAYS = 14
+
+# The readings are published at the end of their hour, in its same period
+READING_OFFSET = timedelta(minutes=59)
+QUARTER_STEP = timedelta(minutes=QUARTER_MINUTES)
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(recorder_mock: Recorder, enable_custom_integrations: None) -> None:  # pylint: disable=unused-argument
+    """Start the recorder before Home Assistant."""
+
+
+def generated_readings(start: date, days: int) -> Iterator[Reading]:
+    """Yield hourly readings with an evening peak, every hour of the span including the 23 and 25 hour days."""
+    rng = random.Random(20)
+    moment = datetime.combine(start, datetime.min.time(), TIMEZONE).astimezone(UTC)
+    end = datetime.combine(start + timedelta(days=days), datetime.min.time(), TIMEZONE).astimezone(UTC)
+    while moment < end:
+        local = moment.astimezone(TIMEZONE)
+        yield Reading("", local, round(0.15 + (0.6 if 19 <= local.hour < 23 else 0.1) * rng.random(), 3))
+        moment += timedelta(hours=1)
+
+
+def load_readings(config: pytest.Config) -> list[Reading]:
+    """Return the readings of the CSV given in the command line, or generated ones."""
+    days = config.getoption("replay_days") or DAYS
+    if (path := config.getoption("replay_csv")) is None:
+        return list(generated_readings(START, days))
+    with open(path, encoding="utf-8-sig") as file:
+        readings = sorted(read_csv(file), key=lambda reading: reading.start)
+    end = datetime.combine(readings[0].start.date() + timedelta(days=days), datetime.min.time(), TIMEZONE)
+    return [reading for reading in readings if reading.start < end]
+
+
+def dst_days(first: date, last: date) -> int:
+    """Return the days of the span that do not have 24 hours."""
+    count = 0
+    day = first
+    while day <= last:
+        start = datetime.combine(day, datetime.min.time(), TIMEZONE)
+        end = datetime.combine(day + timedelta(days=1), datetime.min.time(), TIMEZONE)
+        count += end.astimezone(UTC) - start.astimezone(UTC) != timedelta(days=1)
+        day += timedelta(days=1)
+    return count
+
+
+@pytest.mark.benchmark(group="replay")
+@pytest.mark.parametrize("data", [ENTRY_20, ENTRY_30], ids=["2.0", "3.0"])
+def test_replay(
+    hass: HomeAssistant,
+    event_loop: asyncio.AbstractEventLoop,
+    benchmark: BenchmarkFixture,
+    freezer: FrozenDateTimeFactory,
+    request: pytest.FixtureRequest,
+    data: dict[str, Any],
+) -> None:
+    """Replay the readings firing every quarter-hour of the clock, then check the periods, the costs and the timer chain."""
+    readings = load_readings(request.config)
+    first = readings[0].start.replace(hour=0)
+    end = datetime.combine(readings[-1].start.date() + timedelta(days=1), datetime.min.time(), TIMEZONE)
+    tariff_td = reference(data[CONF_TARIFF])
+    # Holidays are off-peak all day
+    off_peak = "P3" if data[CONF_TARIFF] == TARIFF_20 else "P6"
+
+    freezer.move_to(first)
+    hass.states.async_set(ENERGY_ENTITY, "0.0", ENERGY_ATTRIBUTES)
+    entry = mock_entry(data, **{CONF_ENERGY_ENTITY: ENERGY_ENTITY})
+    event_loop.run_until_complete(async_setup_entries(hass, [entry]))
+    price = entry_entity_id(hass, entry, "precio_20td")
+    energy_cost = entry_entity_id(hass, entry, "coste_energia")
+    fixed = entry_entity_id(hass, entry, "coste_fijo_20td")
+    clock = hass.data[DOMAIN][DATA_CLOCK]
+    tariff = hass.data[DOMAIN][entry.entry_id].tariff
+
+    writes: dict[str, int] = {}
+
+    @callback
+    def _count_write(event: Event) -> None:
+        if (entity_id := event.data["entity_id"]) != ENERGY_ENTITY:
+            writes[entity_id] = writes.get(entity_id, 0) + 1
+
+    hass.bus.async_listen(EVENT_STATE_CHANGED, _count_write)
+
+    async def _async_replay() -> dict[str, Any]:
+        await async_wait_recording_done(hass)
+        before = await get_instance(hass).async_add_executor_job(_count, hass)
+        mismatches: list[tuple[datetime, str, str]] = []
+        events = 0
+        total = 0.0
+        pending = iter(readings)
+        reading = next(pending, None)
+        moment = first.astimezone(UTC)
+        # The module attribute, freezegun replaces the real functions imported by the tests
+        started = freezegun_api.real_perf_counter()
+        while moment < end:
+            moment += QUARTER_STEP
+            # The readings of the quarter are published before its boundary
+            while reading is not None and reading.start + READING_OFFSET < moment:
+                freezer.move_to(reading.start + READING_OFFSET)
+                total += reading.energy
+                hass.states.async_set(ENERGY_ENTITY, f"{total:.3f}", ENERGY_ATTRIBUTES)
+                events += 1
+                reading = next(pending, None)
+            freezer.move_to(moment)
+            async_fire_time_changed(hass, moment)
+            await hass.async_block_till_done()
+            events += 1
+            local = moment.astimezone(TIMEZONE)
+            if local.minute == 0 and (expected := tariff_td.get_period(local)) != (period := hass.states.get(price).attributes["Period"]):
+                mismatches.append((local, period, expected))
+        elapsed = freezegun_api.real_perf_counter() - started
+        await async_wait_recording_done(hass)
+        after = await get_instance(hass).async_add_executor_job(_count, hass)
+        return {
+            "events": events,
+            "events_per_second": round(events / elapsed),
+            "mismatches": mismatches,
+            **{f"recorder_{key}": after[key] - before[key] for key in after},
+        }
+
+    # The debug mode of the test loop keeps a traceback of every callback, most of the time of a replay
+    debug = event_loop.get_debug()
+    event_loop.set_debug(False)
+    try:
+        report = benchmark.pedantic(lambda: event_loop.run_until_complete(_async_replay()), rounds=1)
+    finally:
+        event_loop.set_debug(debug)
+    mismatches = report.pop("mismatches")
+
+    invoice = compute_invoices(readings, tariff, tariff.fixed_costs)[readings[0].cups]
+    hours = int((end.astimezone(UTC) - first.astimezone(UTC)) / timedelta(hours=1))
+    days = (end.date() - first.date()).days
+    holidays = sum(
+        1
+        for offset in range(days)
+        if (day := first.date() + timedelta(days=offset)).weekday() < 5
+        and tariff_td.get_period(datetime.combine(day, datetime.min.time(), TIMEZONE).replace(hour=12)) == off_peak
+    )
+    report.update(
+        {
+            "readings": len(readings),
+            "period_mismatches": len(mismatches),
+            "state_writes": sum(writes.values()),
+            "hours": hours,
+            "dst_days": dst_days(first.date(), end.date() - timedelta(days=1)),
+            "weekday_holidays": holidays,
+        }
+    )
+    benchmark.extra_info.update(report)
+
+    assert mismatches == []
+    assert float(hass.states.get(energy_cost).state) == pytest.approx(sum(invoice.cost), abs=0.01)
+    assert float(hass.states.get(fixed).state) == pytest.approx(tariff.fixed_costs.total(first.date(), end.date()), abs=0.01)
+    # Every hour and day boundary was fired on time, and each one scheduled the next
+    assert clock.drifts[HOUR].count == hours
+    assert clock.drifts[DAY].count == days
+    assert clock.drifts[HOUR].p99 == 0.0
+    assert clock.next_fire == end.astimezone(UTC) + QUARTER_STEP
@@ -0,0 +1,45 @@
+"""Benchmarks of the setup of the config entries."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+from homeassistant.config_entries import ConfigEntryState
+
+from ..common import ENTRY_20, ENTRY_30, async_remove_entries, async_setup_entries, mock_entries
+
+if TYPE_CHECKING:
+    import asyncio
+
+    from pytest_benchmark.fixture import BenchmarkFixture
+    from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+    from homeassistant.core import HomeAssistant
+
+
+@pytest.mark.benchmark(group="setup")
+@pytest.mark.parametrize("count", [1, 10, 100])
+@pytest.mark.parametrize("data", [ENTRY_20, ENTRY_30], ids=["2.0", "3.0"])
+def test_setup_entries(
+    hass: HomeAssistant, event_loop: asyncio.AbstractEventLoop, benchmark: BenchmarkFixture, data: dict[str, Any], count: int
+) -> None:
+    """Set up entries with different prices, the calendar of the tariff is shared and already stored after the warmup."""
+    entries: list[MockConfigEntry] = []
+
+    def setup() -> None:
+        entries[:] = mock_entries(data, count)
+
+    def teardown() -> None:
+        assert all(entry.state is ConfigEntryState.LOADED for entry in entries)
+        event_loop.run_until_complete(async_remove_entries(hass, entries))
+
+    benchmark.pedantic(
+        lambda: event_loop.run_until_complete(async_setup_entries(hass, entries)),
+        setup=setup,
+        teardown=teardown,
+        rounds=5 if count < 100 else 3,
+        warmup_rounds=1,
+    )
+    benchmark.extra_info["entities"] = len(hass.states.async_all())
@@ -0,0 +1,108 @@
+"""Config entries and helpers shared by the Tariff TD tests."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.entity_platform import async_get_platforms
+from homeassistant.setup import async_setup_component
+
+from custom_components.tarifa_20td.const import (
+    CONF_DIARY_COST,
+    CONF_METER_RENTAL,
+    CONF_P1,
+    CONF_P2,
+    CONF_P3,
+    CONF_P4,
+    CONF_P5,
+    CONF_P6,
+    CONF_POWER_P1,
+    CONF_POWER_P2,
+    CONF_POWER_TERM_P1,
+    CONF_POWER_TERM_P2,
+    CONF_TARIFF,
+    DOMAIN,
+    TARIFF_20,
+    TARIFF_30,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.entity import Entity
+
+ENTRY_20: dict[str, Any] = {
+    CONF_TARIFF: TARIFF_20,
+    CONF_P1: 0.2,
+    CONF_P2: 0.15,
+    CONF_P3: 0.1,
+    CONF_POWER_P1: 4.6,
+    CONF_POWER_P2: 4.6,
+    CONF_POWER_TERM_P1: 30.67,
+    CONF_POWER_TERM_P2: 1.42,
+    CONF_METER_RENTAL: 0.0266,
+    CONF_DIARY_COST: 0.0,
+}
+
+ENTRY_30: dict[str, Any] = {
+    CONF_TARIFF: TARIFF_30,
+    CONF_P1: 0.2,
+    CONF_P2: 0.18,
+    CONF_P3: 0.15,
+    CONF_P4: 0.13,
+    CONF_P5: 0.11,
+    CONF_P6: 0.09,
+    CONF_DIARY_COST: 0.5,
+}
+
+
+def mock_entry(data: dict[str, Any], **changes: Any) -> MockConfigEntry:
+    """Return a config entry of the integration with the data and the changes."""
+    return MockConfigEntry(domain=DOMAIN, data={**data, **changes}, version=2, title="Tarifa TD")
+
+
+def mock_entries(data: dict[str, Any], count: int) -> list[MockConfigEntry]:
+    """Return config entries with different prices, so each one has its own tariff index."""
+    return [mock_entry(data, **{CONF_P1: data[CONF_P1] + index / 1000}) for index in range(count)]
+
+
+async def async_setup_entries(hass: HomeAssistant, entries: Iterable[MockConfigEntry]) -> None:
+    """Add and set up the config entries."""
+    entries = list(entries)
+    for entry in entries:
+        if hass.config_entries.async_get_entry(entry.entry_id) is None:
+            entry.add_to_hass(hass)
+    if DOMAIN in hass.config.components:
+        await asyncio.gather(*(hass.config_entries.async_setup(entry.entry_id) for entry in entries))
+    else:
+        # The first setup of the integration sets up every entry already added
+        assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done()
+
+
+async def async_remove_entries(hass: HomeAssistant, entries: Iterable[MockConfigEntry]) -> None:
+    """Unload and remove the config entries."""
+    for entry in entries:
+        await hass.config_entries.async_remove(entry.entry_id)
+    await hass.async_block_till_done()
+
+
+def entry_entity_id(hass: HomeAssistant, entry: MockConfigEntry, key: str, platform: str = "sensor") -> str:
+    """Return the entity id of the entity of a config entry with the description key."""
+    entity_id = er.async_get(hass).async_get_entity_id(platform, DOMAIN, f"{entry.entry_id}-{key}")
+    assert entity_id is not None
+    return entity_id
+
+
+def entry_entity(hass: HomeAssistant, entry: MockConfigEntry, key: str, platform: str = "sensor") -> Entity:
+    """Return the entity object of a config entry with the description key."""
+    entity_id = entry_entity_id(hass, entry, key, platform)
+    for entity_platform in async_get_platforms(hass, DOMAIN):
+        if (entity := entity_platform.entities.get(entity_id)) is not None:
+            return entity
+    raise KeyError(entity_id)
@@ -0,0 +1,15 @@
+"""Fixtures of the Tariff TD tests."""
+
+import pytest
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the options of the replay of meter readings."""
+    group = parser.getgroup("replay", "replay of meter readings")
+    group.addoption("--replay-csv", help="CSV with the readings to replay, in the format of tarifa-20td-invoice")
+    group.addoption("--replay-days", type=int, help="days to replay from the first reading, 14 by default")
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations: None) -> None:  # pylint: disable=unused-argument
+    """Load the integration from custom_components in every test."""
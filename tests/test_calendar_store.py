@@ -0,0 +1,46 @@
+"""Tests of the stored calendars."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.tarifa_20td.calendar_store import STORAGE_KEY, STORAGE_VERSION, async_get_calendar, calendar_stamp
+from custom_components.tarifa_20td.const import TARIFF_20, TIMEZONE
+from custom_components.tarifa_20td.period_calendar import PeriodCalendar, encode_year
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+
+def stored(stamp: str, years: dict[int, bytearray]) -> dict[str, Any]:
+    """Return the storage of the calendars resolved with the stamp."""
+    calendars = {TARIFF_20: {str(year): encode_year(periods) for year, periods in years.items()}}
+    return {"version": STORAGE_VERSION, "minor_version": 1, "key": STORAGE_KEY, "data": {"stamp": stamp, "calendars": calendars}}
+
+
+def test_stamp_versions() -> None:
+    """The stamp changes with the version of tariff-td and of holidays."""
+    with patch("custom_components.tarifa_20td.calendar_store.version", lambda package: "1.0"):
+        first = calendar_stamp()
+    with patch("custom_components.tarifa_20td.calendar_store.version", lambda package: "2.0" if package == "holidays" else "1.0"):
+        second = calendar_stamp()
+    assert first != second
+    assert "holidays" in calendar_stamp()
+
+
+@pytest.mark.parametrize(("same_stamp", "built"), [(True, 0), (False, 2)])
+async def test_stored_years(hass: HomeAssistant, hass_storage: dict[str, Any], same_stamp: bool, built: int) -> None:
+    """Stored years are only reused if they were resolved with the same tariff-td and holidays."""
+    year = datetime.now(tz=TIMEZONE).year
+    calendar = PeriodCalendar(TARIFF_20)
+    hass_storage[STORAGE_KEY] = stored(
+        calendar_stamp() if same_stamp else "tariff-td 1.1, holidays 0.1", {year: calendar.year(year), year + 1: calendar.year(year + 1)}
+    )
+
+    with patch.object(PeriodCalendar, "_build", side_effect=calendar.year, autospec=False) as build:
+        await async_get_calendar(hass, TARIFF_20)
+    assert build.call_count == built
@@ -0,0 +1,104 @@
+"""Tests of the cheapest hours against a brute force search."""
+
+from __future__ import annotations
+
+from datetime import UTC, date, datetime, time, timedelta
+from itertools import combinations
+import random
+
+import pytest
+
+from custom_components.tarifa_20td.cheapest import CheapestWindow, cheapest_slots, cheapest_window, hourly_horizon
+from custom_components.tarifa_20td.const import TARIFF_20, TARIFF_30, TIMEZONE
+from custom_components.tarifa_20td.period_calendar import PeriodCalendar, TariffIndex
+
+from .test_period_calendar import PRICES
+
+ONE_HOUR = timedelta(hours=1)
+
+
+def brute_window(prices: list[float], length: int, first: int = 0) -> int | None:
+    """Return the earliest start from first of the contiguous window with the lowest sum."""
+    starts = range(first, len(prices) - length + 1)
+    return min(starts, key=lambda start: (round(sum(prices[start : start + length]), 9), start)) if length > 0 and starts else None
+
+
+def brute_slots(prices: list[float], count: int) -> list[int]:
+    """Return the first combination of slots, in order, with the lowest sum."""
+    return list(min(combinations(range(len(prices)), count), key=lambda slots: (round(sum(prices[slot] for slot in slots), 9), slots)))
+
+
+def random_prices(rng: random.Random, count: int) -> list[float]:
+    """Return prices with few distinct values, so there are ties."""
+    return [rng.choice((0.1, 0.15, 0.2, 0.3)) for _ in range(count)]
+
+
+def test_cheapest_window() -> None:
+    """The window of every length, longer than the prices included, is the one of the brute force search."""
+    rng = random.Random(10)
+    for count in range(1, 30):
+        prices = random_prices(rng, count)
+        for length in range(count + 2):
+            assert cheapest_window(prices, length) == brute_window(prices, length), (prices, length)
+
+
+def test_cheapest_slots() -> None:
+    """The slots of every count are the ones of the brute force search, the earliest ones on ties."""
+    rng = random.Random(11)
+    for count in range(1, 11):
+        prices = random_prices(rng, count)
+        for slots in range(1, count + 1):
+            assert cheapest_slots(prices, slots) == brute_slots(prices, slots), (prices, slots)
+
+
+@pytest.mark.parametrize("tariff_type", [TARIFF_20, TARIFF_30])
+@pytest.mark.parametrize(
+    "day",
+    # A weekday, a Friday before the weekend, and the day before the 25 hour day of the autumn DST change
+    [date(2024, 3, 5), date(2024, 3, 8), date(2024, 10, 26)],
+)
+@pytest.mark.parametrize("hours", [1, 3, 10])
+def test_window_follows_brute_force(tariff_type: str, day: date, hours: int) -> None:
+    """Hour by hour, the window is kept until it ends and then moves to the cheapest one of today and tomorrow."""
+    tariff = TariffIndex(PeriodCalendar(tariff_type), PRICES[tariff_type])
+    midnight = datetime.combine(day, time(), TIMEZONE)
+    end = datetime.combine(day + timedelta(days=2), time(), TIMEZONE)
+    starts, prices = hourly_horizon(tariff, midnight, int((end.astimezone(UTC) - midnight.astimezone(UTC)) / ONE_HOUR))
+
+    cheapest = CheapestWindow(tariff, hours)
+    # An empty window before the first hour
+    previous = (midnight, midnight)
+    # Only the hours of the first day, the next day rebuilds the candidates from its own midnight
+    for slot in range(starts.index(datetime.combine(day + timedelta(days=1), time(), TIMEZONE).astimezone(UTC))):
+        now = starts[slot] + timedelta(minutes=30)
+        cheapest.update(now)
+        if previous[0] <= now < previous[1]:
+            assert cheapest.window == previous
+            assert cheapest.is_cheap(now)
+        else:
+            first = brute_window(prices, hours, slot)
+            assert first is not None
+            assert cheapest.window == (starts[first], starts[first] + ONE_HOUR * hours), now
+        previous = cheapest.window
+
+
+def test_window_across_midnight() -> None:
+    """From the afternoon of a weekday, the cheapest 10 hours of 2.0TD start at 22:00 and end the next morning."""
+    tariff = TariffIndex(PeriodCalendar(TARIFF_20), PRICES[TARIFF_20])
+    cheapest = CheapestWindow(tariff, 10)
+
+    cheapest.update(datetime(2024, 3, 5, 15, tzinfo=TIMEZONE))
+
+    assert cheapest.window == (datetime(2024, 3, 5, 22, tzinfo=TIMEZONE), datetime(2024, 3, 6, 8, tzinfo=TIMEZONE))
+
+
+def test_window_longer_than_horizon() -> None:
+    """A window longer than today and tomorrow has no start."""
+    tariff = TariffIndex(PeriodCalendar(TARIFF_20), PRICES[TARIFF_20])
+    cheapest = CheapestWindow(tariff, 49)
+    now = datetime(2024, 3, 5, 15, tzinfo=TIMEZONE)
+
+    cheapest.update(now)
+
+    assert cheapest.window is None
+    assert not cheapest.is_cheap(now)
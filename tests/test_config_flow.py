@@ -0,0 +1,75 @@
+"""Tests of the options flow of Tariff TD."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from homeassistant.data_entry_flow import FlowResultType
+
+from custom_components.tarifa_20td.const import (
+    CONF_ENERGY_ENTITY,
+    CONF_P1,
+    CONF_P2,
+    CONF_P3,
+    CONF_P4,
+    CONF_P5,
+    CONF_P6,
+    CONF_POWER_ENTITY,
+    CONF_PRICE_FILE,
+    CONF_TARIFF,
+    DOMAIN,
+    TARIFF_20,
+    TARIFF_30,
+)
+from custom_components.tarifa_20td.price_file import PriceFileIndex
+
+from .common import ENTRY_20, ENTRY_30, async_setup_entries, mock_entry
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from homeassistant.core import HomeAssistant
+
+
+async def test_options_clear_entities(hass: HomeAssistant) -> None:
+    """Optional fields left empty replace the previous values instead of keeping them."""
+    hass.states.async_set("sensor.energia", "100.0", {"unit_of_measurement": "kWh", "device_class": "energy"})
+    hass.states.async_set("sensor.potencia", "1.2", {"unit_of_measurement": "kW", "device_class": "power"})
+    entry = mock_entry(ENTRY_30, **{CONF_ENERGY_ENTITY: "sensor.energia", CONF_POWER_ENTITY: "sensor.potencia"})
+    await async_setup_entries(hass, [entry])
+    assert hass.data[DOMAIN][entry.entry_id].meter is not None
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(result["flow_id"], {CONF_TARIFF: TARIFF_30})
+    assert result["step_id"] == "tariff30"
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {key: ENTRY_30[key] for key in (CONF_P1, CONF_P2, CONF_P3, CONF_P4, CONF_P5, CONF_P6)}
+    )
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    await hass.async_block_till_done()
+
+    assert entry.data.get(CONF_ENERGY_ENTITY) is None
+    assert entry.data.get(CONF_POWER_ENTITY) is None
+    assert entry.data.get(CONF_PRICE_FILE) is None
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    assert entry_data.meter is None
+    assert entry_data.demand is None
+
+
+async def test_options_clear_price_file(hass: HomeAssistant, tmp_path: Path) -> None:
+    """A cleared price file goes back to the prices of the periods."""
+    price_file = tmp_path / "precios.csv"
+    price_file.write_text("2020-01-01T00:00:00;0.5\n")
+    entry = mock_entry(ENTRY_20, **{CONF_PRICE_FILE: str(price_file)})
+    await async_setup_entries(hass, [entry])
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(result["flow_id"], {CONF_TARIFF: TARIFF_20})
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {key: ENTRY_20[key] for key in (CONF_P1, CONF_P2, CONF_P3)}
+    )
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    await hass.async_block_till_done()
+
+    assert entry.data.get(CONF_PRICE_FILE) is None
+    assert not isinstance(hass.data[DOMAIN][entry.entry_id].tariff.shared, PriceFileIndex)
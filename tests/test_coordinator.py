@@ -0,0 +1,56 @@
+"""Tests of the shared clock."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from custom_components.tarifa_20td.const import TIMEZONE
+from custom_components.tarifa_20td.coordinator import DAY, HOUR, QUARTER, TariffClock
+
+if TYPE_CHECKING:
+    from freezegun.api import FrozenDateTimeFactory
+
+    from homeassistant.core import HomeAssistant
+
+# The night of the autumn DST change, 02:00 comes twice
+DST_NIGHT = datetime(2024, 10, 26, 22, 50, tzinfo=TIMEZONE)
+
+
+async def test_late_fire_sends_skipped_boundaries(hass: HomeAssistant, freezer: FrozenDateTimeFactory) -> None:
+    """A fire late by hours sends every skipped hour and day boundary in order, then the latest quarter-hour."""
+    freezer.move_to(DST_NIGHT)
+    clock = TariffClock(hass)
+    fired: dict[str, list[str]] = {QUARTER: [], HOUR: [], DAY: []}
+    removes = [
+        clock.async_add_listener(boundary, lambda now, times=times: times.append(now.isoformat())) for boundary, times in fired.items()
+    ]
+
+    # The event loop was blocked from 22:50 to 01:20
+    freezer.move_to(late := datetime(2024, 10, 27, 1, 20, tzinfo=TIMEZONE))
+    async_fire_time_changed(hass, late)
+    await hass.async_block_till_done()
+
+    assert fired[HOUR] == ["2024-10-26T23:00:00+02:00", "2024-10-27T00:00:00+02:00", "2024-10-27T01:00:00+02:00"]
+    assert fired[DAY] == ["2024-10-27T00:00:00+02:00"]
+    assert fired[QUARTER] == ["2024-10-27T01:15:00+02:00"]
+    assert clock.next_fire == datetime(2024, 10, 27, 1, 30, tzinfo=TIMEZONE)
+    assert clock.drifts[HOUR].count == 3
+
+    # Blocked again across the repeated hour
+    for times in fired.values():
+        times.clear()
+    freezer.move_to(late := datetime(2024, 10, 27, 3, 5, tzinfo=TIMEZONE))
+    async_fire_time_changed(hass, late)
+    await hass.async_block_till_done()
+    for remove in removes:
+        remove()
+
+    assert fired[HOUR] == ["2024-10-27T02:00:00+02:00", "2024-10-27T02:00:00+01:00", "2024-10-27T03:00:00+01:00"]
+    assert not fired[DAY]
+    assert fired[QUARTER] == ["2024-10-27T03:00:00+01:00"]
+    assert clock.next_fire is None
+    # From the planned 01:30, with the repeated hour
+    assert clock.drift == timedelta(hours=2, minutes=35)
@@ -0,0 +1,141 @@
+"""Tests of the quarter-hour demand and the excess power penalty."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+import pytest
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from homeassistant.const import UnitOfPower
+
+from custom_components.tarifa_20td.const import TARIFF_30, TIMEZONE
+from custom_components.tarifa_20td.coordinator import TariffClock
+from custom_components.tarifa_20td.demand import DemandTracker, RollingDemand, month_number
+from custom_components.tarifa_20td.fixed_cost import POWER_KEYS
+from custom_components.tarifa_20td.period_calendar import PERIODS, PeriodCalendar, TariffIndex, entry_prices
+from custom_components.tarifa_20td.price_history import PriceHistory, entry_price_set
+from custom_components.tarifa_20td.tariff_cache import EntryTariff
+
+from .common import ENTRY_30
+
+if TYPE_CHECKING:
+    from freezegun.api import FrozenDateTimeFactory
+
+    from homeassistant.core import HomeAssistant
+
+POWER_ENTITY = "sensor.potencia"
+
+# 10 kW contracted in every period
+CONTRACTED = 10.0
+
+# A weekday of the high season, P1 from 9 to 14
+P1_QUARTER = datetime(2024, 1, 15, 11, tzinfo=TIMEZONE)
+QUARTER = timedelta(minutes=15)
+
+
+def tracker(hass: HomeAssistant, power_entity: str | None = None) -> DemandTracker:
+    """Return a demand tracker of a 3.0 TD supply with the contracted power in every period."""
+    data = {**ENTRY_30, **dict.fromkeys(POWER_KEYS, CONTRACTED)}
+    tariff = EntryTariff(TariffIndex(PeriodCalendar(TARIFF_30), entry_prices(data)), PriceHistory([entry_price_set(data, 0.0)]))
+    return DemandTracker(hass, tariff, TariffClock(hass), power_entity=power_entity)
+
+
+def test_rolling_demand() -> None:
+    """The ring holds the energy of the last 15 one-minute buckets, the newest one still filling."""
+    rolling = RollingDemand()
+    start = P1_QUARTER.timestamp()
+
+    # 1 kWh spread over a quarter-hour, a constant 4 kW
+    rolling.add(start, start + 900, 1.0)
+    assert rolling.demand(start + 900) == pytest.approx(4.0)
+    assert rolling.demand(start + 930) == pytest.approx(4.0 * 840 / 870)
+    # The first minute leaves the window as the time moves on
+    assert rolling.demand(start + 960) == pytest.approx(4.0 * 780 / 840)
+
+    # A reading with no span lands in the newest bucket and leaves the window 15 buckets later
+    rolling.add(start + 1000, start + 1000, 0.5)
+    assert rolling.demand(start + 1000) == pytest.approx((1.0 * 780 / 900 + 0.5) * 3600 / (840 + 40))
+    assert rolling.demand(start + 1000 + 900) == pytest.approx(0.0, abs=1e-9)
+
+
+def test_rolling_demand_gap() -> None:
+    """A gap longer than the window empties every bucket, later energy is counted alone."""
+    rolling = RollingDemand()
+    start = P1_QUARTER.timestamp()
+    rolling.add(start, start + 600, 2.0)
+
+    rolling.add(start + 3600, start + 3660, 0.1)
+
+    assert rolling.demand(start + 3660) == pytest.approx(0.1 * 3600 / 840)
+
+
+async def test_quarter_closed_by_clock(hass: HomeAssistant, freezer: FrozenDateTimeFactory) -> None:
+    """A quarter-hour is closed by the clock boundary with the power held since the last value."""
+    freezer.move_to(P1_QUARTER)
+    demand = tracker(hass, POWER_ENTITY)
+    calls: list[None] = []
+    remove = demand.async_add_listener(lambda: calls.append(None))
+    attributes = {"unit_of_measurement": UnitOfPower.WATT}
+
+    hass.states.async_set(POWER_ENTITY, "8000", attributes)
+    await hass.async_block_till_done()
+    for minutes in (5, 10, 15):
+        freezer.move_to(moment := P1_QUARTER + timedelta(minutes=minutes))
+        async_fire_time_changed(hass, moment)
+        await hass.async_block_till_done()
+
+    assert demand.last_demand == pytest.approx(8.0)
+    assert demand.periods[PERIODS.index("P1")].maximum == pytest.approx(8.0)
+    assert demand.periods[PERIODS.index("P1")].squared_excess == 0.0
+    assert calls
+
+    # 8 kW for 5 minutes and 12 kW for 10 minutes
+    freezer.move_to(P1_QUARTER + QUARTER + timedelta(minutes=5))
+    hass.states.async_set(POWER_ENTITY, "12000", attributes)
+    await hass.async_block_till_done()
+    freezer.move_to(moment := P1_QUARTER + 2 * QUARTER)
+    async_fire_time_changed(hass, moment)
+    await hass.async_block_till_done()
+    remove()
+
+    assert demand.last_demand == pytest.approx((8 * 5 + 12 * 10) / 15)
+    assert demand.periods[PERIODS.index("P1")].maximum == pytest.approx((8 * 5 + 12 * 10) / 15)
+    assert demand.periods[PERIODS.index("P1")].squared_excess == pytest.approx((2 / 3) ** 2)
+
+
+async def test_excess_cost(hass: HomeAssistant) -> None:
+    """Two P1 quarter-hours over the contracted 10 kW, at 13 and 14 kW, and one under it."""
+    demand = tracker(hass)
+    start = P1_QUARTER.timestamp()
+    for quarter, power in enumerate((13.0, 14.0, 9.0, 0.0)):
+        demand.add_power(start + quarter * 900, power)
+    demand.add_power(start + 4 * 900, 0.0)
+
+    period = demand.periods[PERIODS.index("P1")]
+    assert period.maximum == pytest.approx(14.0)
+    assert period.squared_excess == pytest.approx(3**2 + 4**2)
+    # Kp of P1 1.0 * tep 1.4064 €/kW * sqrt(25)
+    assert demand.excess_cost() == pytest.approx(7.032)
+
+
+async def test_month_reset(hass: HomeAssistant) -> None:
+    """The maximums start again with the first quarter-hour of the month, the last one of the month still counts in it."""
+    demand = tracker(hass)
+    start = datetime(2024, 3, 31, 23, 30, tzinfo=TIMEZONE).timestamp()
+    for quarter, power in enumerate((20.0, 5.0, 6.0, 0.0)):
+        demand.add_power(start + quarter * 900, power)
+
+    # The quarter-hour of 23:45 is closed after midnight, still in March
+    assert demand.month == month_number(start)
+    assert demand.periods[PERIODS.index("P6")].maximum == pytest.approx(20.0)
+    assert demand.excess_cost() > 0
+
+    demand.add_power(start + 4 * 900, 0.0)
+
+    assert demand.month == month_number(datetime(2024, 4, 1, tzinfo=TIMEZONE).timestamp())
+    period = demand.periods[PERIODS.index("P6")]
+    assert period.maximum == pytest.approx(6.0)
+    assert period.squared_excess == 0.0
+    assert demand.excess_cost() == 0.0
@@ -0,0 +1,72 @@
+"""Tests of the fixed costs of a price history."""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+import random
+
+import pytest
+
+from custom_components.tarifa_20td.const import TIMEZONE
+from custom_components.tarifa_20td.fixed_cost import FixedCosts, FixedTerms
+from custom_components.tarifa_20td.price_history import PriceHistory, PriceSet
+
+
+def midnight(day: date) -> float:
+    """Return the timestamp of the local midnight of the day."""
+    return datetime.combine(day, time(), TIMEZONE).timestamp()
+
+
+HISTORY = PriceHistory(
+    [
+        PriceSet(0.0, (0.2, 0.15, 0.1), FixedTerms((4.6, 4.6), (30.67, 1.42), 0.0266, 0.0127, 0.1)),
+        # Changes in the middle of a day, the day keeps the terms in force at its start
+        PriceSet(datetime(2024, 7, 10, 13, tzinfo=TIMEZONE).timestamp(), (0.2, 0.15, 0.1), FixedTerms((5.75, 5.75), (26.93, 0.69), 0.0266)),
+        PriceSet(midnight(date(2025, 3, 30)), (0.2, 0.15, 0.1), FixedTerms((3.45, 3.45), (30.67, 1.42), 0.03, 0.01, 0.2)),
+    ]
+)
+
+
+def accrued_by_day(fixed_costs: FixedCosts, start: datetime, end: datetime, prorated: bool) -> float:
+    """Return the fixed cost adding one day at a time."""
+    total = 0.0
+    day = start.astimezone(TIMEZONE).date()
+    last = end.astimezone(TIMEZONE).date()
+    while day < last or (prorated and day == last):
+        if prorated:
+            first, second = midnight(day), midnight(day + timedelta(days=1))
+            total += max(min(end.timestamp(), second) - max(start.timestamp(), first), 0) / (second - first) * fixed_costs.day(day)
+        else:
+            total += fixed_costs.day(day)
+        day += timedelta(days=1)
+    return total
+
+
+@pytest.mark.parametrize("prorated", [False, True], ids=["daily", "prorated"])
+def test_accrued(prorated: bool) -> None:
+    """The accrued cost from the prefix sums is the one of adding each day, across years, DST changes and price changes."""
+    fixed_costs = FixedCosts(HISTORY)
+    rng = random.Random(20)
+    first = datetime(2023, 1, 1, tzinfo=TIMEZONE).timestamp()
+    # DST changes, a new year and a change of prices in the middle of a day
+    moments = [
+        datetime(2024, 3, 31, 1, 30, tzinfo=TIMEZONE),
+        datetime(2024, 10, 27, 2, 30, tzinfo=TIMEZONE),
+        datetime(2024, 12, 31, 23, 59, tzinfo=TIMEZONE),
+        datetime(2025, 1, 1, tzinfo=TIMEZONE),
+        datetime(2024, 7, 10, 13, tzinfo=TIMEZONE),
+    ]
+    moments.extend(datetime.fromtimestamp(first + rng.random() * 4 * 365 * 86400, TIMEZONE) for _ in range(200))
+
+    for start in moments:
+        for end in (*moments[:5], start + timedelta(hours=rng.random() * 48), start + timedelta(days=rng.random() * 800)):
+            assert fixed_costs.accrued(start, end, prorated) == pytest.approx(accrued_by_day(fixed_costs, start, end, prorated), abs=1e-9)
+
+
+def test_total() -> None:
+    """The total of a range of days is the sum of the cost of each day."""
+    fixed_costs = FixedCosts(HISTORY)
+    first = date(2023, 12, 30)
+    for days in (0, 1, 2, 3, 366, 400, 1000):
+        end = first + timedelta(days=days)
+        assert fixed_costs.total(first, end) == pytest.approx(sum(fixed_costs.day(first + timedelta(days=day)) for day in range(days)))
@@ -0,0 +1,53 @@
+"""Tests of the invoice command."""
+
+from __future__ import annotations
+
+from pathlib import Path
+import subprocess
+import sys
+
+# Runs the command with Home Assistant missing, a None entry in sys.modules is what find_spec and import see when it is not installed
+WITHOUT_HOME_ASSISTANT = """
+import sys
+
+for name in [name for name in sys.modules if name.partition(".")[0] == "homeassistant"]:
+    del sys.modules[name]
+sys.modules["homeassistant"] = None
+
+from custom_components.tarifa_20td.invoice import main
+
+sys.exit(main(sys.argv[1:]))
+"""
+
+# Imports the integration with a broken Home Assistant module
+BROKEN_HOME_ASSISTANT = """
+import sys
+
+sys.modules["homeassistant.helpers.entity_registry"] = None
+
+import custom_components.tarifa_20td
+"""
+
+
+def test_invoice_without_home_assistant(tmp_path: Path) -> None:
+    """The invoice command imports and runs without Home Assistant."""
+    path = tmp_path / "consumo.csv"
+    path.write_text("CUPS;Fecha;Hora;Consumo_kWh\nES0001;15/01/2025;11;1,5\nES0001;15/01/2025;24;2\n")
+    result = subprocess.run(
+        [sys.executable, "-c", WITHOUT_HOME_ASSISTANT, str(path), "--tariff", "2.0", "--p1", "0.25", "--p2", "0.18", "--p3", "0.12"],
+        capture_output=True,
+        check=False,
+        cwd=Path(__file__).parents[1],
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "ES0001" in result.stdout
+
+
+def test_setup_import_error_raised() -> None:
+    """With Home Assistant installed, an import error of the setup is raised instead of leaving the integration without setup."""
+    result = subprocess.run(
+        [sys.executable, "-c", BROKEN_HOME_ASSISTANT], capture_output=True, check=False, cwd=Path(__file__).parents[1], text=True
+    )
+    assert result.returncode != 0
+    assert "homeassistant.helpers.entity_registry" in result.stderr
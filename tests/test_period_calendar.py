@@ -0,0 +1,95 @@
+"""Differential tests of the period calendar against tariff_td."""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+import threading
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+from tariff_td import Tariff20TD, Tariff30TD
+
+from custom_components.tarifa_20td.calendar_store import async_get_calendar
+from custom_components.tarifa_20td.const import TARIFF_20, TARIFF_30, TIMEZONE
+from custom_components.tarifa_20td.period_calendar import PERIODS, PeriodCalendar, TariffIndex
+
+from .common import ENTRY_20, async_setup_entries, mock_entry
+
+if TYPE_CHECKING:
+    from freezegun.api import FrozenDateTimeFactory
+    from tariff_td import TariffTD
+
+    from homeassistant.core import HomeAssistant
+
+YEARS = range(2023, 2031)
+
+PRICES = {TARIFF_20: (0.3, 0.2, 0.1), TARIFF_30: (0.6, 0.5, 0.4, 0.3, 0.2, 0.1)}
+
+
+def reference(tariff_type: str) -> TariffTD:
+    """Return the tariff_td tariff with a different price for each period."""
+    prices = PRICES[tariff_type]
+    return Tariff20TD(*prices) if tariff_type == TARIFF_20 else Tariff30TD(*prices)
+
+
+def days(year: int) -> list[date]:
+    """Return every day of the year."""
+    first = date(year, 1, 1)
+    return [first + timedelta(days=day) for day in range((date(year + 1, 1, 1) - first).days)]
+
+
+@pytest.mark.parametrize("tariff_type", [TARIFF_20, TARIFF_30])
+@pytest.mark.parametrize("year", YEARS)
+def test_periods(tariff_type: str, year: int) -> None:
+    """Every hour of the year has the period of tariff_td."""
+    calendar = PeriodCalendar(tariff_type)
+    tariff = reference(tariff_type)
+
+    mismatches = [
+        (moment, PERIODS[calendar.period_index(moment)], expected)
+        for day in days(year)
+        for hour in range(24)
+        if PERIODS[calendar.period_index(moment := datetime.combine(day, time(hour), TIMEZONE))] != (expected := tariff.get_period(moment))
+    ]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize("tariff_type", [TARIFF_20, TARIFF_30])
+@pytest.mark.parametrize("year", YEARS)
+def test_day_prices(tariff_type: str, year: int) -> None:
+    """The prices of every day of the year are the ones of tariff_td."""
+    index = TariffIndex(PeriodCalendar(tariff_type), PRICES[tariff_type])
+    tariff = reference(tariff_type)
+
+    mismatches = [
+        day
+        for day in days(year)
+        if index.get_day_prices(moment := datetime.combine(day, time(), TIMEZONE)) != tariff.get_day_prices(moment)
+    ]
+    assert mismatches == []
+
+
+async def test_next_year_prebuilt(hass: HomeAssistant, freezer: FrozenDateTimeFactory) -> None:
+    """The year after the new year is resolved in the executor on the day boundary, not by the first lookup."""
+    freezer.move_to(datetime(2029, 12, 31, 23, 50, tzinfo=TIMEZONE))
+    await async_setup_entries(hass, [mock_entry(ENTRY_20)])
+    calendar = await async_get_calendar(hass, TARIFF_20)
+    assert set(calendar.years) == {2029, 2030}
+
+    threads: list[str] = []
+    build = PeriodCalendar._build  # pylint: disable=protected-access
+
+    def _build(self: PeriodCalendar, year: int) -> bytearray:
+        threads.append(threading.current_thread().name)
+        return build(self, year)
+
+    midnight = datetime(2030, 1, 1, tzinfo=TIMEZONE)
+    with patch.object(PeriodCalendar, "_build", _build):
+        freezer.move_to(midnight)
+        async_fire_time_changed(hass, midnight)
+        await hass.async_block_till_done(wait_background_tasks=True)
+
+    assert set(calendar.years) == {2029, 2030, 2031}
+    assert threads and threading.main_thread().name not in threads
@@ -0,0 +1,72 @@
+"""Tests of the prices read from a file."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from custom_components.tarifa_20td.const import TIMEZONE
+from custom_components.tarifa_20td.price_file import PriceFile
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+DAY = datetime(2025, 10, 1, tzinfo=TIMEZONE).timestamp()
+HOUR = 3600
+QUARTER = 900
+
+# A day of hourly prices followed by quarter-hour prices, as when the market moved to 15 minutes
+HOURLY_ROWS = [(DAY + hour * HOUR, 1000.0 + hour) for hour in range(24)]
+QUARTER_ROWS = [(DAY + 24 * HOUR + quarter * QUARTER, 1004.0 + quarter) for quarter in range(8)]
+
+
+def read(tmp_path: Path, rows: list[tuple[float, float]]) -> PriceFile:
+    """Return the prices of a CSV file with the rows."""
+    path = tmp_path / "precios.csv"
+    path.write_text("".join(f"{timestamp:.0f};{price}\n" for timestamp, price in rows))
+    price_file = PriceFile(str(path))
+    assert price_file.refresh()
+    return price_file
+
+
+def test_hourly_then_quarters(tmp_path: Path) -> None:
+    """Each row lasts until the next one, the hours are averaged over their quarters."""
+    price_file = read(tmp_path, HOURLY_ROWS + QUARTER_ROWS)
+
+    assert price_file.average(DAY + 24 * HOUR, HOUR) == 1005.5
+    assert price_file.average(DAY + 25 * HOUR, HOUR) == 1009.5
+    assert price_file.get(DAY + 24 * HOUR + 2 * QUARTER) == 1006.0
+    # The last price lasts a quarter-hour like the one before it
+    assert price_file.get(DAY + 26 * HOUR) is None
+    assert price_file.average(DAY + 25 * HOUR + QUARTER, HOUR) is None
+
+
+def test_quarters_then_hourly(tmp_path: Path) -> None:
+    """Hourly rows after quarter-hour ones keep their price for the whole hour."""
+    rows = [(timestamp - 24 * HOUR, price) for timestamp, price in QUARTER_ROWS] + [
+        (timestamp + 2 * HOUR, price) for timestamp, price in HOURLY_ROWS[:-2]
+    ]
+    price_file = read(tmp_path, rows)
+
+    for minutes in (0, 15, 30, 45):
+        assert price_file.get(DAY + 3 * HOUR + minutes * 60) == 1001.0
+    assert price_file.average(DAY + 3 * HOUR, HOUR) == 1001.0
+    assert price_file.average(DAY, HOUR) == 1005.5
+
+
+def test_gap_and_append(tmp_path: Path) -> None:
+    """A missing hour has no price, and appended rows extend the last one."""
+    price_file = read(tmp_path, [HOURLY_ROWS[0], HOURLY_ROWS[2]])
+
+    assert price_file.get(DAY + HOUR + QUARTER) is None
+    assert price_file.average(DAY, 2 * HOUR) is None
+    assert price_file.average(DAY + 2 * HOUR, HOUR) == 1002.0
+
+    path = tmp_path / "precios.csv"
+    with path.open("a") as file:
+        file.writelines(f"{timestamp:.0f};{price}\n" for timestamp, price in QUARTER_ROWS[:4])
+    price_file._mtime = 0.0  # pylint: disable=protected-access
+    assert price_file.refresh()
+    # The hours between the rows still have no price
+    assert price_file.average(DAY + 23 * HOUR, 2 * HOUR) is None
+    assert price_file.average(DAY + 24 * HOUR, HOUR) == 1005.5
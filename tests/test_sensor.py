@@ -0,0 +1,182 @@
+"""Tests of the sensors of Tariff TD."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+import pytest
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from homeassistant.const import UnitOfEnergy
+from homeassistant.util import dt as dt_util
+
+from custom_components.tarifa_20td.const import CONF_ENERGY_ENTITY, CONF_P3, CONF_WINDOW_HOURS, DOMAIN, TIMEZONE
+from custom_components.tarifa_20td.coordinator import next_quarter
+
+from .common import ENTRY_20, async_setup_entries, entry_entity, entry_entity_id, mock_entry
+
+if TYPE_CHECKING:
+    from freezegun.api import FrozenDateTimeFactory
+
+    from homeassistant.core import HomeAssistant
+
+ENERGY_ENTITY = "sensor.energia_consumida"
+ENERGY_ATTRIBUTES = {"unit_of_measurement": UnitOfEnergy.KILO_WATT_HOUR, "device_class": "energy", "state_class": "total_increasing"}
+
+
+async def test_price_metrics(hass: HomeAssistant) -> None:
+    """The metrics time the rebuild of the attributes and count the writes of the price sensor."""
+    entry = mock_entry(ENTRY_20)
+    await async_setup_entries(hass, [entry])
+    metrics = hass.data[DOMAIN][entry.entry_id].metrics
+    writes = metrics.price_writes
+    assert writes >= 1
+
+    sensor = entry_entity(hass, entry, "precio_20td")
+    now = datetime.now(tz=TIMEZONE)
+    sensor.update_price(now + timedelta(days=1))
+    sensor.update_price(now + timedelta(days=1, hours=1))
+
+    assert metrics.price_writes == writes + 2
+    assert metrics.update_attributes.count == metrics.update_price.count == metrics.price_writes
+    assert metrics.update_attributes.total <= metrics.update_price.total
+    assert metrics.attribute_bytes > 0
+    assert metrics.as_dict()["update_attributes"]["count"] == metrics.price_writes
+
+
+async def test_upcoming_and_window_follow_new_prices(hass: HomeAssistant, freezer: FrozenDateTimeFactory) -> None:
+    """New prices move the next price and the cheapest window at once, not on the next hour."""
+    freezer.move_to(datetime(2025, 10, 15, 3, 30, tzinfo=TIMEZONE))
+    entry = mock_entry(ENTRY_20, **{CONF_WINDOW_HOURS: 2})
+    await async_setup_entries(hass, [entry])
+    next_price = entry_entity_id(hass, entry, "proximo_precio")
+    window_start = entry_entity_id(hass, entry, "inicio_ventana_barata")
+    cheap_now = entry_entity_id(hass, entry, "hora_barata", "binary_sensor")
+    assert float(hass.states.get(next_price).state) == 0.15
+    assert dt_util.parse_datetime(hass.states.get(window_start).state) == datetime(2025, 10, 15, 3, tzinfo=TIMEZONE)
+    assert hass.states.get(cheap_now).state == "on"
+
+    # The valley becomes the most expensive period, the current hour keeps the price in force at its start
+    hass.config_entries.async_update_entry(entry, options={**entry.data, CONF_P3: 0.3})
+    await hass.async_block_till_done()
+
+    assert float(hass.states.get(next_price).state) == 0.3
+    assert hass.states.get(next_price).attributes["start"] == datetime(2025, 10, 15, 4, tzinfo=TIMEZONE).isoformat()
+    assert dt_util.parse_datetime(hass.states.get(window_start).state) == datetime(2025, 10, 15, 8, tzinfo=TIMEZONE)
+    assert hass.states.get(cheap_now).state == "off"
+
+
+async def async_advance(hass: HomeAssistant, freezer: FrozenDateTimeFactory, moment: datetime) -> None:
+    """Move the time to the moment firing every quarter-hour on the way, as the clock sees them."""
+    now = dt_util.utcnow()
+    while now < moment:
+        now = min(next_quarter(now), moment)
+        freezer.move_to(now)
+        async_fire_time_changed(hass, now)
+        await hass.async_block_till_done()
+
+
+async def test_period_energy(hass: HomeAssistant, freezer: FrozenDateTimeFactory) -> None:
+    """The meter readings land in the counter of their period, the daily ones reset each day and the monthly ones on the 1st."""
+    # Thursday, the last day of February
+    freezer.move_to(datetime(2024, 2, 29, 9, tzinfo=TIMEZONE))
+    hass.states.async_set(ENERGY_ENTITY, "0.0", ENERGY_ATTRIBUTES)
+    entry = mock_entry(ENTRY_20, **{CONF_ENERGY_ENTITY: ENERGY_ENTITY})
+    await async_setup_entries(hass, [entry])
+
+    def counter(period: str, cycle: str) -> float:
+        return float(hass.states.get(entry_entity_id(hass, entry, f"consumo_{period}_{cycle}")).state)
+
+    def last_reset(period: str, cycle: str) -> str:
+        return hass.states.get(entry_entity_id(hass, entry, f"consumo_{period}_{cycle}")).attributes["last_reset"]
+
+    async def async_read(moment: datetime, reading: float) -> None:
+        await async_advance(hass, freezer, moment)
+        hass.states.async_set(ENERGY_ENTITY, str(reading), ENERGY_ATTRIBUTES)
+        await hass.async_block_till_done()
+
+    # P2 from 8 to 10 and from 22, P1 from 10
+    await async_read(datetime(2024, 2, 29, 9, 30, tzinfo=TIMEZONE), 1.0)
+    await async_read(datetime(2024, 2, 29, 11, tzinfo=TIMEZONE), 3.0)
+    await async_read(datetime(2024, 2, 29, 23, 30, tzinfo=TIMEZONE), 3.5)
+    assert [counter(period, "hoy") for period in ("p1", "p2", "p3")] == [2.0, 1.5, 0.0]
+    assert [counter(period, "mes") for period in ("p1", "p2", "p3")] == [2.0, 1.5, 0.0]
+    assert last_reset("p1", "mes") == datetime(2024, 2, 1, tzinfo=TIMEZONE).isoformat()
+
+    # The 1st resets both counters, P3 at night
+    await async_read(datetime(2024, 3, 1, 3, tzinfo=TIMEZONE), 4.5)
+    assert [counter(period, "hoy") for period in ("p1", "p2", "p3")] == [0.0, 0.0, 1.0]
+    assert [counter(period, "mes") for period in ("p1", "p2", "p3")] == [0.0, 0.0, 1.0]
+    assert last_reset("p1", "hoy") == last_reset("p3", "mes") == "2024-03-01T00:00:00+01:00"
+
+    # The next day, a Saturday all in P3, only resets the daily counters
+    await async_read(datetime(2024, 3, 2, 12, tzinfo=TIMEZONE), 5.0)
+    assert [counter(period, "hoy") for period in ("p1", "p2", "p3")] == [0.0, 0.0, 0.5]
+    assert [counter(period, "mes") for period in ("p1", "p2", "p3")] == [0.0, 0.0, 1.5]
+    assert last_reset("p3", "hoy") == "2024-03-02T00:00:00+01:00"
+    assert last_reset("p3", "mes") == "2024-03-01T00:00:00+01:00"
+
+
+async def test_upcoming_across_period_boundary(hass: HomeAssistant, freezer: FrozenDateTimeFactory) -> None:
+    """The next change, the next price and the next periods move forward when the current period ends."""
+    # Wednesday, P2 until 10, P1 until 14, P2 until 18, P1 until 22, P2 until midnight and P3 until 8
+    freezer.move_to(datetime(2025, 10, 15, 9, 30, tzinfo=TIMEZONE))
+    entry = mock_entry(ENTRY_20)
+    await async_setup_entries(hass, [entry])
+    next_change = entry_entity_id(hass, entry, "proximo_cambio_periodo")
+    next_price = entry_entity_id(hass, entry, "proximo_precio")
+    upcoming = entry_entity_id(hass, entry, "proximos_periodos")
+
+    assert dt_util.parse_datetime(hass.states.get(next_change).state) == datetime(2025, 10, 15, 10, tzinfo=TIMEZONE)
+    assert hass.states.get(next_change).attributes["Period"] == "P1"
+    assert float(hass.states.get(next_price).state) == 0.2
+    assert hass.states.get(upcoming).state == "P1"
+    assert [(period["start"], period["period"], period["price"]) for period in hass.states.get(upcoming).attributes["periods"]] == [
+        ("2025-10-15T10:00:00+02:00", "P1", 0.2),
+        ("2025-10-15T14:00:00+02:00", "P2", 0.15),
+        ("2025-10-15T18:00:00+02:00", "P1", 0.2),
+        ("2025-10-15T22:00:00+02:00", "P2", 0.15),
+        ("2025-10-16T00:00:00+02:00", "P3", 0.1),
+        ("2025-10-16T08:00:00+02:00", "P2", 0.15),
+    ]
+
+    await async_advance(hass, freezer, datetime(2025, 10, 15, 10, tzinfo=TIMEZONE))
+
+    assert dt_util.parse_datetime(hass.states.get(next_change).state) == datetime(2025, 10, 15, 14, tzinfo=TIMEZONE)
+    assert hass.states.get(next_change).attributes["Period"] == "P2"
+    assert float(hass.states.get(next_price).state) == 0.15
+    assert hass.states.get(next_price).attributes["start"] == "2025-10-15T14:00:00+02:00"
+    assert hass.states.get(upcoming).state == "P2"
+    assert hass.states.get(upcoming).attributes["periods"][-1]["start"] == "2025-10-16T10:00:00+02:00"
+
+
+@pytest.mark.parametrize(
+    ("saturday", "monday"),
+    [
+        # The 23 hour day of the spring DST change and the 25 hour day of the autumn one
+        (datetime(2025, 3, 29, 23, 30, tzinfo=TIMEZONE), "2025-03-31T08:00:00+02:00"),
+        (datetime(2025, 10, 25, 23, 30, tzinfo=TIMEZONE), "2025-10-27T08:00:00+01:00"),
+    ],
+    ids=["spring", "autumn"],
+)
+async def test_upcoming_across_dst(hass: HomeAssistant, freezer: FrozenDateTimeFactory, saturday: datetime, monday: str) -> None:
+    """The weekend valley ends on Monday at 8 local time, after the Sunday of a DST change."""
+    freezer.move_to(saturday)
+    entry = mock_entry(ENTRY_20)
+    await async_setup_entries(hass, [entry])
+    next_change = entry_entity_id(hass, entry, "proximo_cambio_periodo")
+    next_price = entry_entity_id(hass, entry, "proximo_precio")
+    upcoming = entry_entity_id(hass, entry, "proximos_periodos")
+    start = datetime.fromisoformat(monday)
+
+    assert dt_util.parse_datetime(hass.states.get(next_change).state) == start
+    assert float(hass.states.get(next_price).state) == 0.15
+    assert hass.states.get(next_price).attributes["start"] == monday
+    assert hass.states.get(upcoming).attributes["periods"][0] == {"start": monday, "period": "P2", "price": 0.15}
+
+    # Across the Sunday, the spans are only rebuilt when the valley ends
+    await async_advance(hass, freezer, start)
+
+    assert hass.states.get(next_price).attributes["start"] == start.replace(hour=10).isoformat()
+    assert hass.states.get(next_change).attributes["Period"] == "P1"
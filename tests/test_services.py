@@ -0,0 +1,216 @@
+"""Tests of the services of Tariff TD."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from itertools import pairwise
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from pytest_homeassistant_custom_component.components.recorder.common import async_wait_recording_done
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics, statistics_during_period
+from homeassistant.exceptions import ServiceValidationError
+
+from custom_components.tarifa_20td.const import (
+    ATTR_CONFIG_ENTRY_ID,
+    CONF_P1,
+    CONF_P2,
+    CONF_P3,
+    CONF_PRICE_FILE,
+    CONF_TARIFF,
+    DOMAIN,
+    TARIFF_20,
+    TIMEZONE,
+)
+from custom_components.tarifa_20td.fixed_cost import entry_fixed_terms
+from custom_components.tarifa_20td.period_calendar import PERIODS, entry_prices
+
+from .common import ENTRY_20, ENTRY_30, async_setup_entries, mock_entry
+from .test_period_calendar import reference
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from homeassistant.components.recorder import Recorder
+    from homeassistant.core import HomeAssistant
+
+HOURS = 48
+
+# Monday, the first day has the three periods
+START = datetime(2024, 3, 4, tzinfo=TIMEZONE)
+
+ENERGY_ID = "test:energia"
+COST_ID = f"{DOMAIN}:test_energia_cost"
+
+# Two chunks of prices, across the end of a month and the 25 hour day of the autumn DST change
+PRICES_START = datetime(2024, 10, 1, tzinfo=TIMEZONE)
+PRICES_END = datetime(2024, 11, 5, tzinfo=TIMEZONE)
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(recorder_mock: Recorder, enable_custom_integrations: None) -> None:  # pylint: disable=unused-argument
+    """Start the recorder before Home Assistant, the services read its statistics."""
+
+
+def metadata(statistic_id: str, source: str, unit: str) -> StatisticMetaData:
+    """Return the metadata of an external statistic with a sum."""
+    return StatisticMetaData(has_mean=False, has_sum=True, name=None, source=source, statistic_id=statistic_id, unit_of_measurement=unit)
+
+
+def rows(step: float) -> list[dict[str, Any]]:
+    """Return hourly rows from the hour before the start, growing by the step each hour."""
+    return [{"start": START + timedelta(hours=hour), "state": (hour + 1) * step, "sum": (hour + 1) * step} for hour in range(-1, HOURS)]
+
+
+async def test_recalculate_costs(hass: HomeAssistant) -> None:
+    """Energy in Wh is converted to kWh and the cost rows after the range keep growing from the new total."""
+    entry = mock_entry(ENTRY_20)
+    await async_setup_entries(hass, [entry])
+    # 1 kWh each hour, stored in Wh
+    async_add_external_statistics(hass, metadata(ENERGY_ID, "test", "Wh"), rows(1000.0))
+    # Previous costs of 1 € each hour
+    async_add_external_statistics(hass, metadata(COST_ID, DOMAIN, "€"), rows(1.0))
+    await async_wait_recording_done(hass)
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        "recalculate_costs",
+        {ATTR_CONFIG_ENTRY_ID: entry.entry_id, "statistic_id": ENERGY_ID, "start": START, "end": START + timedelta(days=1)},
+        blocking=True,
+        return_response=True,
+    )
+    await async_wait_recording_done(hass)
+
+    cost = sum(hass.data[DOMAIN][entry.entry_id].tariff.get_day_prices(START))
+    assert response == {"statistic_id": COST_ID, "hours": 24, "cost": pytest.approx(cost)}
+
+    stored = (
+        await get_instance(hass).async_add_executor_job(statistics_during_period, hass, START, None, {COST_ID}, "hour", None, {"sum"})
+    )[COST_ID]
+    assert len(stored) == HOURS
+    assert stored[23]["sum"] == pytest.approx(cost)
+    # The second day keeps its previous costs of 1 € each hour on top of the new total
+    assert [row["sum"] for row in stored[24:]] == pytest.approx([cost + hour for hour in range(1, 25)])
+
+
+async def test_recalculate_costs_price_file(hass: HomeAssistant, tmp_path: Path) -> None:
+    """The hours of the price file are costed with its prices, the rest with the period prices."""
+    path = tmp_path / "precios.csv"
+    path.write_text("".join(f"{(START + timedelta(hours=hour)).isoformat()};0,5\n" for hour in range(12)))
+    entry = mock_entry(ENTRY_20, **{CONF_PRICE_FILE: str(path)})
+    await async_setup_entries(hass, [entry])
+    async_add_external_statistics(hass, metadata(ENERGY_ID, "test", "Wh"), rows(1000.0))
+    await async_wait_recording_done(hass)
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        "recalculate_costs",
+        {ATTR_CONFIG_ENTRY_ID: entry.entry_id, "statistic_id": ENERGY_ID, "start": START, "end": START + timedelta(days=1)},
+        blocking=True,
+        return_response=True,
+    )
+    prices = await get_prices(hass, entry.entry_id, START, START + timedelta(days=1))
+
+    fixed = mock_entry(ENTRY_20)
+    await async_setup_entries(hass, [fixed])
+    period_prices = hass.data[DOMAIN][fixed.entry_id].tariff.get_day_prices(START)
+    assert prices["prices"] == [0.5] * 12 + period_prices[12:]
+    assert response["cost"] == pytest.approx(6 + sum(period_prices[12:]))
+
+
+async def test_compare_offers(hass: HomeAssistant) -> None:
+    """Two offers priced over the same consumption, 8 kWh in each period every weekday."""
+    await async_setup_entries(hass, [mock_entry(ENTRY_20)])
+    async_add_external_statistics(hass, metadata(ENERGY_ID, "test", "Wh"), rows(1000.0))
+    await async_wait_recording_done(hass)
+    offers = [
+        {"name": "Periodos", CONF_TARIFF: TARIFF_20, CONF_P1: 0.3, CONF_P2: 0.2, CONF_P3: 0.1},
+        {"name": "Fijo", CONF_TARIFF: TARIFF_20, CONF_P1: 0.19, CONF_P2: 0.19, CONF_P3: 0.19},
+    ]
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        "compare_offers",
+        {"statistic_id": ENERGY_ID, "start": START, "end": START + timedelta(days=2), "offers": offers},
+        blocking=True,
+        return_response=True,
+    )
+
+    # Two days of 2024, a leap year
+    fixed = 2 * entry_fixed_terms(offers[0]).daily_cost(366)
+    assert response["statistic_id"] == ENERGY_ID
+    assert (response["energy"], response["hours"], response["days"]) == (48.0, 48, 2)
+    periods, flat = response["offers"]
+    assert periods["name"] == "Periodos"
+    assert periods["periods"] == pytest.approx({"P1": 4.8, "P2": 3.2, "P3": 1.6})
+    assert periods["energy_cost"] == pytest.approx(9.6)
+    assert periods["fixed_cost"] == pytest.approx(fixed)
+    assert periods["months"] == pytest.approx({"2024-03": 9.6 + fixed})
+    assert flat["tariff"] == TARIFF_20
+    assert flat["total"] == pytest.approx(48 * 0.19 + fixed)
+    assert response["cheapest"] == 1
+
+
+async def get_prices(hass: HomeAssistant, entry_id: str, start: datetime, end: datetime, **data: Any) -> dict[str, Any]:
+    """Call get_prices and return its response."""
+    return await hass.services.async_call(
+        DOMAIN,
+        "get_prices",
+        {ATTR_CONFIG_ENTRY_ID: entry_id, "start": start, "end": end, **data},
+        blocking=True,
+        return_response=True,
+    )
+
+
+@pytest.mark.parametrize("data", [ENTRY_20, ENTRY_30], ids=["2.0", "3.0"])
+async def test_get_prices(hass: HomeAssistant, data: dict[str, Any]) -> None:
+    """Every hour of the range is returned once in order, with the period and price of tariff-td, across chunks and DST."""
+    entry = mock_entry(data)
+    await async_setup_entries(hass, [entry])
+
+    response = await get_prices(hass, entry.entry_id, PRICES_START, PRICES_END)
+
+    assert set(response) == {"timestamps", "prices", "periods"}
+    # 35 days and the extra hour of the DST change
+    hours = 35 * 24 + 1
+    assert len(response["timestamps"]) == len(response["prices"]) == len(response["periods"]) == hours
+    moments = [datetime.fromisoformat(timestamp) for timestamp in response["timestamps"]]
+    assert moments[0] == PRICES_START
+    assert all(later - earlier == timedelta(hours=1) for earlier, later in pairwise(moments))
+    assert response["timestamps"].count("2024-10-27T02:00:00+01:00") == response["timestamps"].count("2024-10-27T02:00:00+02:00") == 1
+
+    tariff_td = reference(data[CONF_TARIFF])
+    prices = dict(zip(PERIODS, entry_prices(data), strict=False))
+    assert response["periods"] == [tariff_td.get_period(moment) for moment in moments]
+    assert response["prices"] == [prices[period] for period in response["periods"]]
+
+
+async def test_get_prices_quarters(hass: HomeAssistant) -> None:
+    """The quarter-hour resolution returns four prices per hour."""
+    entry = mock_entry(ENTRY_20)
+    await async_setup_entries(hass, [entry])
+
+    hourly = await get_prices(hass, entry.entry_id, PRICES_START, PRICES_END)
+    quarters = await get_prices(hass, entry.entry_id, PRICES_START, PRICES_END, resolution="quarter")
+
+    assert len(quarters["timestamps"]) == 4 * len(hourly["timestamps"])
+    assert quarters["periods"][::4] == hourly["periods"]
+
+
+@pytest.mark.parametrize(
+    ("start", "end"),
+    [(PRICES_START, PRICES_START + timedelta(days=367)), (PRICES_START, PRICES_START), (PRICES_END, PRICES_START)],
+    ids=["longer", "empty", "reversed"],
+)
+async def test_get_prices_range(hass: HomeAssistant, start: datetime, end: datetime) -> None:
+    """The range must be after the start and at most 366 days long."""
+    entry = mock_entry(ENTRY_20)
+    await async_setup_entries(hass, [entry])
+
+    with pytest.raises(ServiceValidationError, match="366 days"):
+        await get_prices(hass, entry.entry_id, start, end)
+    # A leap year is the longest range
+    assert await get_prices(hass, entry.entry_id, datetime(2024, 1, 1, tzinfo=TIMEZONE), datetime(2025, 1, 1, tzinfo=TIMEZONE))
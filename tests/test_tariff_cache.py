@@ -0,0 +1,110 @@
+"""Tests of the tariffs shared by the config entries."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from custom_components.tarifa_20td.const import (
+    ATTR_CONFIG_ENTRY_ID,
+    CONF_P1,
+    CONF_P2,
+    CONF_P3,
+    CONF_PRICE_FILE,
+    DATA_CLOCK,
+    DATA_TARIFFS,
+    DOMAIN,
+    TIMEZONE,
+)
+from custom_components.tarifa_20td.coordinator import DAY, QUARTER
+from custom_components.tarifa_20td.period_calendar import PERIODS
+
+from .common import ENTRY_20, async_remove_entries, async_setup_entries, mock_entries, mock_entry
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from freezegun.api import FrozenDateTimeFactory
+    from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+    from homeassistant.core import HomeAssistant
+
+    from custom_components.tarifa_20td.tariff_cache import EntryTariff
+
+NOW = datetime(2025, 10, 15, 12, tzinfo=TIMEZONE)
+YESTERDAY = datetime(2025, 10, 14, tzinfo=TIMEZONE)
+
+OLD_PRICES = {"P1": 0.2, "P2": 0.15, "P3": 0.1}
+NEW_PRICES = {"P1": 0.3, "P2": 0.25, "P3": 0.2}
+EARLIER_PRICES = {"P1": 0.5, "P2": 0.4, "P3": 0.3}
+
+
+async def async_add_prices(hass: HomeAssistant, entry: MockConfigEntry, start: datetime, prices: dict[str, float]) -> None:
+    """Record the prices taking effect at the start."""
+    data: dict[str, Any] = {CONF_P1: prices["P1"], CONF_P2: prices["P2"], CONF_P3: prices["P3"]}
+    await hass.services.async_call(DOMAIN, "add_prices", {ATTR_CONFIG_ENTRY_ID: entry.entry_id, "start": start, **data}, blocking=True)
+    await hass.async_block_till_done()
+
+
+def expected_day(tariff: EntryTariff, day: datetime, change: datetime, before: dict[str, float], after: dict[str, float]) -> list[float]:
+    """Return the prices of each hour of the day, with the prices before and after the change."""
+    prices = []
+    for hour, period in enumerate(tariff.calendar.day_periods(day)):
+        prices.append((before if day.replace(hour=hour) < change else after)[PERIODS[period]])
+    return prices
+
+
+async def test_day_prices_follow_history(hass: HomeAssistant, freezer: FrozenDateTimeFactory) -> None:
+    """A day that started before the current prices mixes the prices of the history, today is the one cached by the shared index."""
+    freezer.move_to(NOW)
+    entry = mock_entry(ENTRY_20)
+    await async_setup_entries(hass, [entry])
+    tariff: EntryTariff = hass.data[DOMAIN][entry.entry_id].tariff
+    change = YESTERDAY.replace(hour=12)
+
+    await async_add_prices(hass, entry, change, NEW_PRICES)
+
+    expected = expected_day(tariff, YESTERDAY, change, OLD_PRICES, NEW_PRICES)
+    assert tariff.get_day_prices(YESTERDAY) == expected
+    assert tariff.get_day_quarter_prices(YESTERDAY) == [price for price in expected for _ in range(4)]
+    today = NOW.replace(hour=0)
+    assert tariff.get_day_prices(today) is tariff.shared.get_day_prices(today)
+    assert tariff.get_day_prices(today) == expected_day(tariff, today, today, NEW_PRICES, NEW_PRICES)
+
+    # Earlier prices only change the history, the cached days are built again
+    earlier = YESTERDAY.replace(day=13)
+    assert tariff.get_day_prices(earlier) == expected_day(tariff, earlier, earlier, OLD_PRICES, OLD_PRICES)
+    await async_add_prices(hass, entry, earlier.replace(hour=8), EARLIER_PRICES)
+    assert tariff.get_day_prices(earlier) == expected_day(tariff, earlier, earlier.replace(hour=8), OLD_PRICES, EARLIER_PRICES)
+    assert tariff.get_day_prices(YESTERDAY) == expected_day(tariff, YESTERDAY, change, EARLIER_PRICES, NEW_PRICES)
+
+
+async def test_shared_index_released(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Entries with the same tariff share one index, freed with its file listener when the last one is removed."""
+    path = tmp_path / "precios.csv"
+    path.write_text(f"{NOW.timestamp():.0f};0,5\n")
+    first, second = (mock_entry(ENTRY_20, **{CONF_PRICE_FILE: str(path)}) for _ in range(2))
+    others = mock_entries(ENTRY_20, 2)
+    await async_setup_entries(hass, [first, second, *others])
+    tariffs = hass.data[DOMAIN][DATA_TARIFFS]
+    listeners = hass.data[DOMAIN][DATA_CLOCK]._listeners  # pylint: disable=protected-access
+    shared = hass.data[DOMAIN][first.entry_id].tariff.shared
+
+    assert hass.data[DOMAIN][second.entry_id].tariff.shared is shared
+    assert len(tariffs) == 3
+    assert [tariff.references for tariff in tariffs.values() if tariff.tariff is shared] == [2]
+
+    await async_remove_entries(hass, [first])
+    assert [tariff.references for tariff in tariffs.values() if tariff.tariff is shared] == [1]
+
+    # The next year of the calendar shared by the three indexes is tracked once, next to the day listeners of the sensors
+    assert [listener for listener in listeners[DAY] if not hasattr(listener, "__self__")] == listeners[DAY][:1]
+
+    await async_remove_entries(hass, [second, *others])
+    assert not tariffs
+    assert not listeners[QUARTER]
+    assert len(listeners[DAY]) == 1
+
+    # Until Home Assistant stops
+    await hass.async_stop()
+    assert not listeners[DAY]